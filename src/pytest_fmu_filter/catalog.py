@@ -0,0 +1,541 @@
+"""
+Prebuilt catalog of FMU summaries.
+
+The catalog is an SQLite database holding one :class:`FmuSummary` per FMU,
+and the names of its variables, units, declared types and terminals, which
+are only read for the name indexes of a session. An FMU whose
+terminalsAndIcons.xml cannot be read is stored with the error, which only
+the terminal keys report. It is built and incrementally refreshed by the
+``fmu-filter-catalog build`` command and consumed by the plugin through the
+``--fmu-catalog`` option, so large FMU libraries are not re-parsed on every
+pytest run.
+
+Example:
+    $ fmu-filter-catalog build -o fmus.db path/to/library
+    $ pytest --fmu-catalog fmus.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+from pytest_fmu_filter.discovery import discover_fmus, glob_base
+from pytest_fmu_filter.md import TERMINALS_AND_ICONS, read_modelDescription
+from pytest_fmu_filter.summary import FmuDetails, FmuSummary, terminal_names
+
+SCHEMA_VERSION = "7"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fmus (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    crc INTEGER NOT NULL,
+    fmi_version TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    description TEXT,
+    author TEXT,
+    version TEXT,
+    n_variables INTEGER NOT NULL,
+    n_inputs INTEGER NOT NULL,
+    n_outputs INTEGER NOT NULL,
+    n_parameters INTEGER NOT NULL,
+    array_variables INTEGER NOT NULL,
+    n_states INTEGER NOT NULL,
+    n_event_indicators INTEGER NOT NULL,
+    platforms TEXT NOT NULL,
+    sources INTEGER NOT NULL,
+    terminals_error TEXT
+);
+CREATE TABLE IF NOT EXISTS interfaces (
+    fmu_id INTEGER NOT NULL REFERENCES fmus(id) ON DELETE CASCADE,
+    fmi_type TEXT NOT NULL,
+    model_identifier TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS variables (
+    fmu_id INTEGER NOT NULL REFERENCES fmus(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    causality TEXT
+);
+CREATE TABLE IF NOT EXISTS units (
+    fmu_id INTEGER NOT NULL REFERENCES fmus(id) ON DELETE CASCADE,
+    unit TEXT NOT NULL,
+    causality TEXT
+);
+CREATE TABLE IF NOT EXISTS declared_types (
+    fmu_id INTEGER NOT NULL REFERENCES fmus(id) ON DELETE CASCADE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terminals (
+    fmu_id INTEGER NOT NULL REFERENCES fmus(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    kind TEXT
+);
+CREATE INDEX IF NOT EXISTS interfaces_fmu ON interfaces(fmu_id);
+CREATE INDEX IF NOT EXISTS variables_fmu ON variables(fmu_id);
+CREATE INDEX IF NOT EXISTS variables_name ON variables(name);
+CREATE INDEX IF NOT EXISTS units_fmu ON units(fmu_id);
+CREATE INDEX IF NOT EXISTS declared_types_fmu ON declared_types(fmu_id);
+CREATE INDEX IF NOT EXISTS terminals_fmu ON terminals(fmu_id);
+"""
+
+
+@dataclass
+class CatalogStats:
+    """Outcome of a catalog build."""
+
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+def connect(
+    catalog_path: Union[str, Path], rebuild: bool = False
+) -> sqlite3.Connection:
+    """
+    Open a catalog, creating its tables if needed.
+
+    Args:
+        catalog_path: Path of the SQLite catalog
+        rebuild: Drop the content of a catalog with another schema version
+
+    Raises:
+        ValueError: If the catalog was written with another schema version
+    """
+    connection = sqlite3.connect(str(catalog_path))
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    row = connection.execute(
+        "SELECT value FROM meta WHERE key = 'schema_version'"
+    ).fetchone()
+    if row is not None and row[0] != SCHEMA_VERSION and rebuild:
+        connection.executescript(
+            "DROP TABLE IF EXISTS terminals; DROP TABLE IF EXISTS declared_types;"
+            " DROP TABLE IF EXISTS units;"
+            " DROP TABLE variables; DROP TABLE interfaces; DROP TABLE fmus; DROP TABLE meta;"
+        )
+        connection.executescript(SCHEMA)
+        row = None
+    if row is None:
+        connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('schema_version', ?)",
+            (SCHEMA_VERSION,),
+        )
+    elif row[0] != SCHEMA_VERSION:
+        connection.close()
+        raise ValueError(
+            f"Catalog {catalog_path} has schema version {row[0]}, expected {SCHEMA_VERSION}. Rebuild it."
+        )
+    return connection
+
+
+def metadata_crc(fmu_path: Path, is_dir: bool) -> int:
+    """
+    Return a CRC-32 over everything a summary is derived from.
+
+    That is the content of modelDescription.xml and terminalsAndIcons.xml,
+    and the names of the files below binaries/ and sources/. For archives
+    all of it comes from the zip central directory, so nothing is
+    decompressed.
+    """
+    if is_dir:
+        crc = zlib.crc32((fmu_path / "modelDescription.xml").read_bytes())
+        terminals = fmu_path / TERMINALS_AND_ICONS
+        if terminals.is_file():
+            crc = zlib.crc32(terminals.read_bytes(), crc)
+        names = sorted(
+            p.relative_to(fmu_path).as_posix()
+            for p in [
+                *(fmu_path / "binaries").glob("*/*"),
+                *(fmu_path / "sources").rglob("*"),
+            ]
+        )
+    else:
+        with zipfile.ZipFile(fmu_path, "r") as zip_ref:
+            crc = zip_ref.getinfo("modelDescription.xml").CRC
+            all_names = zip_ref.namelist()
+            if TERMINALS_AND_ICONS in all_names:
+                terminals_crc = zip_ref.getinfo(TERMINALS_AND_ICONS).CRC
+                crc = zlib.crc32(terminals_crc.to_bytes(4, "little"), crc)
+            names = sorted(
+                n for n in all_names if n.startswith(("binaries/", "sources/"))
+            )
+    return zlib.crc32("\n".join(names).encode(), crc)
+
+
+def _insert(
+    connection: sqlite3.Connection,
+    summary: FmuSummary,
+    details: FmuDetails,
+    terminals: Tuple[Tuple[str, Optional[str]], ...],
+    terminals_error: Optional[str],
+    size,
+    mtime_ns,
+    crc,
+):
+    cursor = connection.execute(
+        "INSERT INTO fmus (path, size, mtime_ns, crc, fmi_version, model_name,"
+        " description, author, version, n_variables, n_inputs, n_outputs,"
+        " n_parameters, array_variables, n_states, n_event_indicators,"
+        " platforms, sources, terminals_error)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            summary.path,
+            size,
+            mtime_ns,
+            crc,
+            summary.fmi_version,
+            summary.model_name,
+            summary.description,
+            summary.author,
+            summary.version,
+            summary.n_variables,
+            summary.n_inputs,
+            summary.n_outputs,
+            summary.n_parameters,
+            int(summary.array_variables),
+            summary.n_states,
+            summary.n_event_indicators,
+            " ".join(summary.platforms),
+            int(summary.sources),
+            terminals_error,
+        ),
+    )
+    fmu_id = cursor.lastrowid
+    connection.executemany(
+        "INSERT INTO interfaces (fmu_id, fmi_type, model_identifier) VALUES (?, ?, ?)",
+        [
+            (fmu_id, fmi_type, model_id)
+            for fmi_type, model_id in summary.interface_types
+        ],
+    )
+    connection.executemany(
+        "INSERT INTO variables (fmu_id, name, causality) VALUES (?, ?, ?)",
+        [(fmu_id, name, causality) for name, causality in details.variables],
+    )
+    connection.executemany(
+        "INSERT INTO units (fmu_id, unit, causality) VALUES (?, ?, ?)",
+        [(fmu_id, unit, causality) for unit, causality in details.units],
+    )
+    connection.executemany(
+        "INSERT INTO declared_types (fmu_id, name) VALUES (?, ?)",
+        [(fmu_id, name) for name in details.declared_types],
+    )
+    connection.executemany(
+        "INSERT INTO terminals (fmu_id, name, kind) VALUES (?, ?, ?)",
+        [(fmu_id, name, kind) for name, kind in terminals],
+    )
+
+
+def build_catalog(
+    catalog_path: Union[str, Path],
+    roots: Iterable[Union[str, Path]],
+    prune: bool = True,
+) -> CatalogStats:
+    """
+    Build or incrementally refresh a catalog.
+
+    FMUs whose size and mtime are unchanged are skipped. Otherwise the CRC of
+    their modelDescription.xml and binary names is compared and only FMUs with
+    a changed CRC are parsed again. FMUs that cannot be read are counted as
+    failed and their previous entries removed.
+
+    Args:
+        catalog_path: Path of the SQLite catalog
+        roots: FMUs, directories or glob patterns to scan
+        prune: Remove catalog entries below the roots that no longer exist
+
+    Returns:
+        CatalogStats with the number of added, updated, unchanged, removed
+        and failed FMUs
+    """
+    roots = [Path(root).resolve() for root in roots]
+    # Directories covered by the roots, glob patterns included
+    bases = [glob_base(root) for root in roots]
+    stats = CatalogStats()
+    connection = connect(catalog_path, rebuild=True)
+    try:
+        known = {
+            path: (fmu_id, size, mtime_ns, crc)
+            for fmu_id, path, size, mtime_ns, crc in connection.execute(
+                "SELECT id, path, size, mtime_ns, crc FROM fmus"
+            )
+        }
+        seen = set()
+        for fmu in discover_fmus(roots):
+            path = fmu.path
+            fmu_path = Path(path)
+            seen.add(path)
+            row = known.get(path)
+            try:
+                if row is not None and (row[1], row[2]) == (fmu.size, fmu.mtime_ns):
+                    stats.unchanged += 1
+                    continue
+
+                crc = metadata_crc(fmu_path, fmu.is_dir)
+                if row is not None and row[3] == crc:
+                    # Touched but same metadata: refresh stat only
+                    connection.execute(
+                        "UPDATE fmus SET size = ?, mtime_ns = ? WHERE id = ?",
+                        (fmu.size, fmu.mtime_ns, row[0]),
+                    )
+                    stats.unchanged += 1
+                    continue
+
+                model_description = read_modelDescription(fmu_path, fmu.is_dir)
+                summary = FmuSummary.from_model_description(path, model_description)
+                details = FmuDetails.from_model_description(model_description)
+            except Exception as e:
+                print(f"Error reading FMU {path}: {e}", file=sys.stderr)
+                stats.failed += 1
+                if row is not None:
+                    # Not selected with the metadata it had before the change
+                    connection.execute("DELETE FROM fmus WHERE id = ?", (row[0],))
+                continue
+            try:
+                terminals = terminal_names(model_description)
+                terminals_error = None
+            except Exception as e:
+                # Stored, so only the terminal keys fail for this FMU
+                print(f"Error reading terminals of FMU {path}: {e}", file=sys.stderr)
+                terminals = ()
+                terminals_error = str(e)
+
+            if row is not None:
+                connection.execute("DELETE FROM fmus WHERE id = ?", (row[0],))
+                stats.updated += 1
+            else:
+                stats.added += 1
+            _insert(
+                connection,
+                summary,
+                details,
+                terminals,
+                terminals_error,
+                fmu.size,
+                fmu.mtime_ns,
+                crc,
+            )
+
+        if prune:
+            for path, row in known.items():
+                if path in seen or not any(Path(path).is_relative_to(b) for b in bases):
+                    continue
+                if not os.path.exists(path):
+                    connection.execute("DELETE FROM fmus WHERE id = ?", (row[0],))
+                    stats.removed += 1
+
+        connection.commit()
+    finally:
+        connection.close()
+    return stats
+
+
+class Catalog:
+    """
+    Read-only view of a catalog.
+
+    The database is opened in SQLite's read-only mode, so reading a catalog
+    never writes to it and works on read-only checkouts and CI caches.
+
+    Raises:
+        FileNotFoundError: If the catalog does not exist
+        ValueError: If the file is not a catalog of the current schema version
+    """
+
+    def __init__(self, catalog_path: Union[str, Path]):
+        path = Path(catalog_path)
+        if not path.is_file():
+            raise FileNotFoundError(f"FMU catalog not found: {catalog_path}")
+        self.path = path
+        self.connection = sqlite3.connect(
+            path.resolve().as_uri() + "?mode=ro", uri=True
+        )
+        try:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'"
+            ).fetchone()
+        except sqlite3.DatabaseError:
+            row = None
+        if row is None or row[0] != SCHEMA_VERSION:
+            self.connection.close()
+            found = "no schema version" if row is None else f"schema version {row[0]}"
+            raise ValueError(
+                f"Catalog {catalog_path} has {found}, expected {SCHEMA_VERSION}. "
+                "Rebuild it."
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def summaries(self) -> List[FmuSummary]:
+        """Return all FMU summaries of the catalog, ordered by path."""
+        interfaces = {}
+        for fmu_id, fmi_type, model_id in self.connection.execute(
+            "SELECT fmu_id, fmi_type, model_identifier FROM interfaces ORDER BY rowid"
+        ):
+            interfaces.setdefault(fmu_id, []).append((fmi_type, model_id))
+
+        return [
+            FmuSummary(
+                path=path,
+                fmi_version=fmi_version,
+                model_name=model_name,
+                description=description,
+                author=author,
+                version=version,
+                interface_types=tuple(interfaces.get(fmu_id, ())),
+                n_variables=n_variables,
+                n_inputs=n_inputs,
+                n_outputs=n_outputs,
+                n_parameters=n_parameters,
+                array_variables=bool(array_variables),
+                n_states=n_states,
+                n_event_indicators=n_event_indicators,
+                platforms=tuple(platforms.split()),
+                sources=bool(sources),
+            )
+            for (
+                fmu_id,
+                path,
+                fmi_version,
+                model_name,
+                description,
+                author,
+                version,
+                n_variables,
+                n_inputs,
+                n_outputs,
+                n_parameters,
+                array_variables,
+                n_states,
+                n_event_indicators,
+                platforms,
+                sources,
+            ) in self.connection.execute(
+                "SELECT id, path, fmi_version, model_name, description, author,"
+                " version, n_variables, n_inputs, n_outputs, n_parameters,"
+                " array_variables, n_states, n_event_indicators, platforms, sources"
+                " FROM fmus ORDER BY path"
+            )
+        ]
+
+    def details(self, fmu_path: str) -> FmuDetails:
+        """
+        Return the names declared by an FMU of the catalog.
+
+        Raises:
+            KeyError: If the FMU is not in the catalog
+        """
+        fmu_id, _ = self._fmu(fmu_path)
+
+        def rows(query: str) -> List[tuple]:
+            return self.connection.execute(query, (fmu_id,)).fetchall()
+
+        return FmuDetails(
+            variables=tuple(
+                rows(
+                    "SELECT name, causality FROM variables WHERE fmu_id = ? ORDER BY rowid"
+                )
+            ),
+            units=tuple(
+                rows(
+                    "SELECT unit, causality FROM units WHERE fmu_id = ? ORDER BY rowid"
+                )
+            ),
+            declared_types=tuple(
+                name
+                for (name,) in rows(
+                    "SELECT name FROM declared_types WHERE fmu_id = ? ORDER BY rowid"
+                )
+            ),
+        )
+
+    def terminals(self, fmu_path: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+        """
+        Return the (name, terminal kind) pairs of the terminals of an FMU.
+
+        Raises:
+            KeyError: If the FMU is not in the catalog
+            ValueError: If its terminalsAndIcons.xml could not be read
+        """
+        fmu_id, terminals_error = self._fmu(fmu_path)
+        if terminals_error is not None:
+            raise ValueError(terminals_error)
+        return tuple(
+            self.connection.execute(
+                "SELECT name, kind FROM terminals WHERE fmu_id = ? ORDER BY rowid",
+                (fmu_id,),
+            )
+        )
+
+    def _fmu(self, fmu_path: str) -> Tuple[int, Optional[str]]:
+        row = self.connection.execute(
+            "SELECT id, terminals_error FROM fmus WHERE path = ?", (fmu_path,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(fmu_path)
+        return row
+
+
+def load_catalog(catalog_path: Union[str, Path]) -> List[FmuSummary]:
+    """
+    Load all FMU summaries of a catalog, ordered by path.
+
+    Raises:
+        FileNotFoundError: If the catalog does not exist
+        ValueError: If the file is not a catalog of the current schema version
+    """
+    with Catalog(catalog_path) as catalog:
+        return catalog.summaries()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the ``fmu-filter-catalog`` command."""
+    parser = argparse.ArgumentParser(
+        prog="fmu-filter-catalog",
+        description="Manage FMU catalogs for pytest-fmu-filter",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build or refresh a catalog")
+    build.add_argument(
+        "roots", nargs="+", help="FMUs, directories or glob patterns to scan"
+    )
+    build.add_argument("-o", "--output", required=True, help="Catalog path")
+    build.add_argument(
+        "--no-prune",
+        action="store_true",
+        help="Keep entries of FMUs that no longer exist",
+    )
+
+    args = parser.parse_args(argv)
+    stats = build_catalog(args.output, args.roots, prune=not args.no_prune)
+    print(
+        f"{args.output}: {stats.added} added, {stats.updated} updated, "
+        f"{stats.unchanged} unchanged, {stats.removed} removed, {stats.failed} failed"
+    )
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""
+Long-lived metadata daemon.
+
+``fmu-filter-daemon`` keeps parsed FMU metadata and filter indexes in memory
+across pytest runs and answers "which of these FMUs match this marker" over a
+Unix domain socket. FMU files are watched by polling their stat, every file of
+extracted FMU directories included; changed FMUs are parsed again. Selection runs through the same engine as in-process
+filtering, so results are identical either way.
+
+The plugin uses the daemon when its socket is reachable and falls back to
+in-process parsing otherwise, and always for markers with ``custom`` filters,
+which cannot be sent over the socket. Runs with ``--fmu-catalog`` or
+``--fmu-shared-cache`` do not use the daemon, which parses the FMUs itself and
+could answer differently than a stale catalog.
+
+Only processes of the same user talk to each other: the default socket lives
+in a directory only its owner can access, a socket of another user is neither
+connected to nor replaced, and both ends check the peer credentials where the
+platform reports them (``SO_PEERCRED``).
+
+The protocol is one JSON object per line in each direction. Requests are
+``{"op": "ping"}`` and ``{"op": "select", "paths": [...], "filters": {...}}``;
+a select answers ``{"ok": true, "matches": [...], "errors": [...]}`` with
+indices into ``paths`` and ``[index, message]`` pairs for unreadable FMUs.
+
+Example:
+    $ fmu-filter-daemon &
+    $ pytest --fmu-dir path/to/library
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pytest_fmu_filter.discovery import fmu_stat
+from pytest_fmu_filter.engine import select_entries
+from pytest_fmu_filter.session import FmuEntry, FmuSession, ModelCache
+from pytest_fmu_filter.sizes import parse_size
+
+# FMU selections kept with their indexes, by requested path list
+MAX_SESSIONS = 16
+
+
+def _uid() -> int:
+    return os.getuid() if hasattr(os, "getuid") else 0
+
+
+def default_socket_path() -> str:
+    """
+    Return the per-user default socket path of the daemon.
+
+    That is in ``$XDG_RUNTIME_DIR`` if set, otherwise in a directory of the
+    temporary directory named after the user id, which the daemon creates
+    accessible to its owner only.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "pytest-fmu-filter.sock")
+    return os.path.join(
+        tempfile.gettempdir(), f"pytest-fmu-filter-{_uid()}", "daemon.sock"
+    )
+
+
+def _check_private(directory: str) -> None:
+    """
+    Check that a directory is owned by this user and closed to everyone else.
+
+    Raises:
+        RuntimeError: If it is not
+    """
+    st = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or st.st_uid != _uid()
+        or stat.S_IMODE(st.st_mode) & 0o077
+    ):
+        raise RuntimeError(
+            f"{directory} is not a directory private to this user, refusing to use it"
+        )
+
+
+def _owned_socket(socket_path: str) -> bool:
+    """Check if a path is a socket owned by this user."""
+    try:
+        st = os.lstat(socket_path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == _uid()
+
+
+def _peer_uid(sock: socket.socket) -> Optional[int]:
+    """Return the user id of the process at the other end, None if unknown."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    return struct.unpack("3i", credentials)[1]
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        return fmu_stat(path, os.path.isdir(path))
+    except OSError:
+        return None
+
+
+class MetadataDaemon:
+    """
+    In-memory FMU metadata shared by all clients of a daemon.
+
+    Entries are keyed by absolute path together with the size and mtime they
+    were read at (of all files for extracted FMUs, see
+    :func:`~pytest_fmu_filter.discovery.fmu_stat`); an entry whose files
+    changed is replaced before it is used.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None):
+        self.models = ModelCache(memory_budget)
+        self._entries: Dict[str, Tuple[FmuEntry, Optional[Tuple[int, int]]]] = {}
+        self._sessions: OrderedDict[Tuple[str, ...], FmuSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, path: str) -> FmuEntry:
+        key = _stat_key(path)
+        cached = self._entries.get(path)
+        if cached is None or cached[1] != key:
+            if cached is not None:
+                # Indexes of sessions holding the old entry are stale
+                self.models.discard(path)
+                self._sessions.clear()
+            self._entries[path] = (FmuEntry(path, models=self.models), key)
+        return self._entries[path][0]
+
+    def _session(self, paths: List[str]) -> FmuSession:
+        entries = [self._entry(path) for path in paths]
+        key = tuple(paths)
+        session = self._sessions.get(key)
+        if session is None:
+            session = FmuSession()
+            for entry in entries:
+                session.add_entry(entry)
+            self._sessions[key] = session
+            if len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(key)
+        return session
+
+    def select(self, paths: List[str], filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Select the FMUs among ``paths`` that pass ``filters``."""
+        with self._lock:
+            session = self._session(paths)
+            errors = []
+            selected = select_entries(
+                session, filters, lambda entry, e: errors.append((entry.path, str(e)))
+            )
+        position = {path: i for i, path in enumerate(paths)}
+        return {
+            "ok": True,
+            "matches": [position[entry.path] for entry in selected],
+            "errors": [[position[path], message] for path, message in errors],
+        }
+
+    def poll(self) -> int:
+        """
+        Re-read FMUs whose files changed since they were read.
+
+        Returns:
+            The number of changed FMUs
+        """
+        with self._lock:
+            changed = [
+                path
+                for path, (_, key) in self._entries.items()
+                if _stat_key(path) != key
+            ]
+            for path in changed:
+                try:
+                    self._entry(path).summary()
+                except Exception:
+                    # Reported to clients when they select this FMU
+                    pass
+        return len(changed)
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a decoded request."""
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "select":
+            return self.select(request["paths"], request["filters"])
+        return {"ok": False, "error": f"Unknown request: {op}"}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        if _peer_uid(self.connection) not in (None, _uid()):
+            # Not answered: the metadata of this user's FMUs stays private
+            return
+        for line in self.rfile:
+            try:
+                response = self.server.metadata.handle(json.loads(line))  # type: ignore[attr-defined]
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server of a MetadataDaemon."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, metadata: MetadataDaemon):
+        directory = os.path.dirname(os.path.abspath(socket_path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        if directory == os.path.dirname(os.path.abspath(default_socket_path())):
+            _check_private(directory)
+        if os.path.lexists(socket_path):
+            if not _owned_socket(socket_path):
+                raise RuntimeError(
+                    f"{socket_path} exists and is not a socket of this user"
+                )
+            # Left behind by a daemon that did not shut down cleanly
+            client = connect(socket_path)
+            if client is not None:
+                client.close()
+                raise RuntimeError(f"A daemon is already listening on {socket_path}")
+            os.unlink(socket_path)
+        self.metadata = metadata
+        super().__init__(socket_path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):  # type: ignore[arg-type]
+            os.unlink(self.server_address)  # type: ignore[arg-type]
+
+
+class DaemonError(Exception):
+    """The daemon could not answer a request."""
+
+
+class DaemonClient:
+    """Connection of the plugin to a running daemon."""
+
+    def __init__(self, sock: socket.socket):
+        self._socket = sock
+        self._file = sock.makefile("rwb")
+
+    def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a request and return the response.
+
+        Raises:
+            DaemonError: If the daemon fails or answers with an error
+        """
+        try:
+            self._file.write(json.dumps(payload).encode() + b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        except OSError as e:
+            raise DaemonError(str(e))
+        if not line:
+            raise DaemonError("Connection closed by the daemon")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "Unknown error"))
+        return response
+
+    def select(
+        self, paths: List[str], filters: Dict[str, Any]
+    ) -> Tuple[List[int], List[Tuple[int, str]]]:
+        """
+        Ask the daemon which FMUs pass the filters.
+
+        Returns:
+            Indices of the matching paths, and (index, message) pairs of FMUs
+            that could not be read
+        """
+        response = self.request(
+            {
+                "op": "select",
+                "paths": [os.path.abspath(p) for p in paths],
+                "filters": filters,
+            }
+        )
+        return response["matches"], [(i, message) for i, message in response["errors"]]
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+
+def connect(socket_path: str, timeout: float = 1.0) -> Optional[DaemonClient]:
+    """
+    Connect to a daemon, returning None if none is reachable.
+
+    Sockets and daemons of other users are not trusted and count as not
+    reachable.
+    """
+    if not hasattr(socket, "AF_UNIX") or not _owned_socket(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        # Parsing many FMUs may take long, only connecting is bounded
+        sock.settimeout(None)
+        if _peer_uid(sock) not in (None, _uid()):
+            raise OSError(f"{socket_path} is served by another user")
+    except OSError:
+        sock.close()
+        return None
+    return DaemonClient(sock)
+
+
+def serializable(filters: Dict[str, Any]) -> bool:
+    """Check if marker filters can be sent to the daemon."""
+    try:
+        json.dumps(filters)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _poll_forever(daemon: MetadataDaemon, interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        daemon.poll()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the ``fmu-filter-daemon`` command."""
+    parser = argparse.ArgumentParser(
+        prog="fmu-filter-daemon",
+        description="Serve parsed FMU metadata to pytest-fmu-filter",
+    )
+    parser.add_argument(
+        "--socket", default=default_socket_path(), help="Unix socket path"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        help="Seconds between stat polls of the known FMUs",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        help="Memory budget for parsed model descriptions, e.g. 512M",
+    )
+    args = parser.parse_args(argv)
+
+    daemon = MetadataDaemon(args.memory_budget)
+    stop = threading.Event()
+    threading.Thread(
+        target=_poll_forever, args=(daemon, args.interval, stop), daemon=True
+    ).start()
+    with DaemonServer(args.socket, daemon) as server:
+        print(f"fmu-filter-daemon listening on {args.socket}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
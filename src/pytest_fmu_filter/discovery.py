@@ -0,0 +1,214 @@
+"""
+Discovery of FMUs in directory trees.
+
+Directories are walked with :func:`os.scandir` by a pool of threads, and the
+stat results of the directory entries are passed on with every FMU found, so
+the metadata loader does not have to stat each path again. The stat of an
+extracted FMU covers all of its files and is only computed when asked for. FMUs are yielded
+as soon as their directory has been scanned, in a deterministic order that
+does not depend on thread timing (pytest-xdist workers must all collect the
+same tests in the same order).
+"""
+
+import os
+import re
+import stat
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from glob import iglob
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+_GLOB_MAGIC = re.compile(r"[*?[]")
+
+
+@dataclass(frozen=True)
+class DiscoveredFmu:
+    """
+    An FMU found on disk.
+
+    Attributes:
+        path: Path of the FMU archive or extracted FMU directory
+        is_dir: Whether the FMU is an extracted directory
+        entry_stat: Size and modification time of an archive from its
+            directory entry, None for extracted directories
+    """
+
+    path: str
+    is_dir: bool
+    entry_stat: Optional[Tuple[int, int]] = None
+
+    @cached_property
+    def stat(self) -> Tuple[int, int]:
+        """
+        Return the size and modification time, see :func:`fmu_stat`.
+
+        For extracted directories all files are stat'ed, on first use only.
+        """
+        if self.entry_stat is not None:
+            return self.entry_stat
+        return fmu_stat(self.path, self.is_dir)
+
+    @property
+    def size(self) -> int:
+        """Size of the archive, or of all files for directories."""
+        return self.stat[0]
+
+    @property
+    def mtime_ns(self) -> int:
+        """Modification time of the archive, or the latest one of its files."""
+        return self.stat[1]
+
+
+def fmu_stat(path: str, is_dir: bool) -> Tuple[int, int]:
+    """
+    Return the size and modification time identifying the content of an FMU.
+
+    For archives this is the stat of the archive. An extracted FMU directory
+    is changed by any of its files (binaries, sources, resources, ...), so
+    its sizes are summed up and the latest modification time of its files and
+    subdirectories is taken; deleting a file updates the time of its parent.
+    """
+    if not is_dir:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    size = 0
+    mtime_ns = os.stat(path).st_mtime_ns
+    for directory, _, files in os.walk(path):
+        mtime_ns = max(mtime_ns, os.stat(directory).st_mtime_ns)
+        for name in files:
+            st = os.stat(os.path.join(directory, name))
+            size += st.st_size
+            mtime_ns = max(mtime_ns, st.st_mtime_ns)
+    return size, mtime_ns
+
+
+@dataclass
+class _ScanResult:
+    fmus: List[DiscoveredFmu]
+    # Path and (device, inode) of each subdirectory, symlinks resolved
+    subdirs: List[Tuple[str, Tuple[int, int]]]
+
+
+def _scan(directory: str) -> _ScanResult:
+    """Scan a single directory without descending into it."""
+    fmus = []
+    subdirs = []
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.name == "modelDescription.xml" and entry.is_file():
+            # The directory itself is an extracted FMU
+            return _ScanResult([DiscoveredFmu(directory, True)], [])
+    for entry in entries:
+        if entry.is_dir():
+            st = entry.stat()
+            subdirs.append((entry.path, (st.st_dev, st.st_ino)))
+        elif entry.name.endswith(".fmu") and entry.is_file():
+            st = entry.stat()
+            fmus.append(DiscoveredFmu(entry.path, False, (st.st_size, st.st_mtime_ns)))
+    return _ScanResult(fmus, subdirs)
+
+
+def _expand(roots: Iterable[Union[str, Path]]) -> Iterator[str]:
+    """
+    Expand glob patterns among the roots, keeping the other roots as given.
+
+    Of the glob matches only directories and ``.fmu`` files are kept.
+    """
+    for root in roots:
+        root = str(root)
+        if _GLOB_MAGIC.search(root):
+            yield from (
+                match
+                for match in sorted(iglob(root, recursive=True))
+                if match.endswith(".fmu") or os.path.isdir(match)
+            )
+        else:
+            yield root
+
+
+def glob_base(root: Union[str, Path]) -> Path:
+    """
+    Return the directory a root covers.
+
+    That is the root itself, or for glob patterns the path before the first
+    component with a wildcard, e.g. ``lib`` for ``lib/*/Model.fmu``.
+    """
+    path = Path(root)
+    for i, part in enumerate(path.parts):
+        if _GLOB_MAGIC.search(part):
+            return Path(*path.parts[:i])
+    return path
+
+
+def missing_roots(roots: Iterable[Union[str, Path]]) -> List[str]:
+    """Return the roots that are not glob patterns and do not exist."""
+    return [
+        str(root)
+        for root in roots
+        if not _GLOB_MAGIC.search(str(root)) and not os.path.exists(root)
+    ]
+
+
+def discover_fmus(
+    roots: Iterable[Union[str, Path]], workers: Optional[int] = None
+) -> Iterator[DiscoveredFmu]:
+    """
+    Find FMUs below the given roots.
+
+    Roots may be directories, FMUs or glob patterns (``**`` is recursive).
+    Directories are searched recursively for ``.fmu`` archives and extracted
+    FMU directories (directories holding a ``modelDescription.xml``), which
+    are not descended into. Symbolic links are followed, but every directory
+    is scanned only once, so link cycles end.
+
+    Args:
+        roots: Directories, FMU paths or glob patterns
+        workers: Number of scanning threads (default: as for ThreadPoolExecutor)
+
+    Yields:
+        DiscoveredFmu for every FMU, in depth-first order of sorted names
+
+    Raises:
+        FileNotFoundError: If a root that is not a glob pattern does not exist
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        # Directory scans in yield order; scans further down are already running
+        pending: Deque[Tuple[Optional[DiscoveredFmu], Optional[Future]]] = deque()
+        # Directories scanned or queued, by (device, inode)
+        visited = set()
+        for root in _expand(roots):
+            st = os.stat(root)
+            if stat.S_ISDIR(st.st_mode):
+                if (st.st_dev, st.st_ino) in visited:
+                    continue
+                visited.add((st.st_dev, st.st_ino))
+                pending.append((None, executor.submit(_scan, root)))
+            else:
+                pending.append(
+                    (DiscoveredFmu(root, False, (st.st_size, st.st_mtime_ns)), None)
+                )
+
+        while pending:
+            fmu, future = pending.popleft()
+            if fmu is not None:
+                yield fmu
+                continue
+            assert future is not None
+            result = future.result()
+            yield from result.fmus
+            subdirs = []
+            for subdir, key in result.subdirs:
+                if key not in visited:
+                    visited.add(key)
+                    subdirs.append(subdir)
+            pending.extendleft(
+                (None, executor.submit(_scan, subdir)) for subdir in reversed(subdirs)
+            )
+    finally:
+        # Stop scanning when the consumer stops early
+        executor.shutdown(wait=True, cancel_futures=True)
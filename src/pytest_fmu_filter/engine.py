@@ -0,0 +1,350 @@
+"""
+Filter engine of the plugin.
+
+This module holds everything that needs the modelDescription parser. It is
+imported lazily by :mod:`pytest_fmu_filter.plugin` so that pytest runs without
+``--fmus`` do not pay for it.
+"""
+
+import pathlib
+from typing import TYPE_CHECKING, Iterable, List, Optional, Set, Union
+
+import pytest
+
+from pytest_fmu_filter.md import ModelHeader, current_platform
+from pytest_fmu_filter.query import compile_query
+from pytest_fmu_filter.session import (
+    DETAIL_INDEXES,
+    TERMINAL_INDEXES,
+    ErrorCallback,
+    FmuEntry,
+    FmuSession,
+    get_session,
+)
+from pytest_fmu_filter.summary import FmuSummary
+
+if TYPE_CHECKING:
+    from pytest_fmu_filter.daemon import DaemonClient
+
+# Connection to the metadata daemon of a pytest run, None if not reachable
+daemon_key = pytest.StashKey[Optional["DaemonClient"]]()
+
+# Size-based keys answered from a counting pass: key -> (ModelCounts attribute, is_maximum)
+SIZE_KEYS = {
+    "max_variables": ("n_variables", True),
+    "min_variables": ("n_variables", False),
+    "max_states": ("n_states", True),
+    "min_states": ("n_states", False),
+    "max_event_indicators": ("n_event_indicators", True),
+    "min_event_indicators": ("n_event_indicators", False),
+}
+
+
+# Name keys answered from the session name indexes: key -> (index kind, qualifier)
+NAME_KEYS = {
+    "with_variables": ("variables", None),
+    "with_inputs": ("variables", "input"),
+    "with_outputs": ("variables", "output"),
+    "with_parameters": ("variables", "parameter"),
+    "with_units": ("units", None),
+    "with_input_units": ("units", "input"),
+    "with_output_units": ("units", "output"),
+    "with_declared_types": ("declared_types", None),
+    "has_terminal": ("terminals", None),
+    "has_terminal_kind": ("terminal_kinds", None),
+}
+
+# Keys answered from the start of modelDescription.xml, see FmuEntry.header
+HEADER_KEYS = {
+    "is_me",
+    "is_cs",
+    "is_se",
+    "name_matches",
+    "fmi_major_version",
+    "fmi_version",
+}
+
+# Keys answered from the binary names, see FmuEntry.platforms
+PLATFORM_KEYS = {"has_platform", "current_platform"}
+
+# Keys answered from the summary of the whole model, see FmuEntry.summary
+SUMMARY_KEYS = {"has_input", "has_output", "has_parameter", "has_sources", "where"}
+
+# Keys accepted by fmu_filter markers and --fmu-select
+FILTER_KEYS = {
+    *SIZE_KEYS,
+    *HEADER_KEYS,
+    *NAME_KEYS,
+    *PLATFORM_KEYS,
+    *SUMMARY_KEYS,
+    "custom",
+}
+
+
+def generate_tests(metafunc, fmu_filter):
+    """
+    Parametrize a test function with the FMUs passing its ``fmu_filter`` marker.
+
+    Args:
+        metafunc: The pytest Metafunc object of the test function
+        fmu_filter: The ``fmu_filter`` marker of the test function
+    """
+    session = get_session(metafunc.config)
+
+    def on_error(entry, e):
+        # If there's an error reading the FMU, log it and skip this FMU
+        metafunc.config.hook.pytest_warning_recorded(
+            warning_message=f"Error reading FMU {entry.path}: {e}",
+            when="setup",
+        )
+
+    selected = None
+    client = _daemon_client(metafunc.config)
+    if client is not None:
+        selected = _select_with_daemon(client, session, fmu_filter.kwargs, on_error)
+    if selected is None:
+        selected = select_entries(session, fmu_filter.kwargs, on_error)
+    if metafunc.config.getoption("fmu_order") == "heavy-first":
+        from pytest_fmu_filter.ordering import order_entries
+
+        selected = order_entries(selected)
+    filtered_fmus = [entry.path for entry in selected]
+
+    # Parametrize the test function with the filtered FMUs
+    if filtered_fmus:
+        metafunc.parametrize(
+            "fmu",
+            filtered_fmus,
+            ids=[str(pathlib.Path(m).resolve()) for m in filtered_fmus],
+        )
+    else:
+        # If no FMUs match the filter, skip the test
+        pytest.skip("No FMUs match the specified filters")
+
+
+def select_entries(
+    session: FmuSession, filter_kwargs, on_error: ErrorCallback
+) -> List[FmuEntry]:
+    """
+    Return the entries of a session passing the filters of a marker.
+
+    A ``where`` expression and the name keys (variables, units, declared
+    types, terminals) are answered for the whole FMU set from the session
+    indexes first; the other keys are then only applied to their matches, so
+    FMUs without the requested variables are never parsed.
+
+    Args:
+        session: The FMU session
+        filter_kwargs: Filter criteria from the fmu_filter marker
+        on_error: Called with entries that cannot be read
+
+    Returns:
+        The matching entries, in session order
+    """
+    # Report each unreadable FMU once, whichever index finds it first
+    reported: Set[str] = set()
+
+    def report(entry, e):
+        if entry.path not in reported:
+            reported.add(entry.path)
+            on_error(entry, e)
+
+    entries: Iterable[FmuEntry] = session
+    if "where" in filter_kwargs:
+        entries = session.query(filter_kwargs["where"], report)
+    for key, (kind, qualifier) in NAME_KEYS.items():
+        if key in filter_kwargs:
+            matches = set(
+                session.with_names(kind, filter_kwargs[key], qualifier, report)
+            )
+            entries = [entry for entry in entries if entry in matches]
+    filter_kwargs = {
+        k: v for k, v in filter_kwargs.items() if k != "where" and k not in NAME_KEYS
+    }
+
+    # Load and filter FMUs
+    selected = []
+    for entry in entries:
+        try:
+            # apply the filters
+            if apply_filters(entry, filter_kwargs):
+                # If the model passes all filters, add it to the filtered list
+                selected.append(entry)
+        except Exception as e:
+            report(entry, e)
+    return selected
+
+
+def _daemon_client(config):
+    """Return the connection to the metadata daemon, or None if not reachable."""
+    if daemon_key not in config.stash:
+        client = None
+        # The daemon parses the FMUs itself, bypassing catalogs and shared caches
+        if not (
+            config.getoption("no_fmu_daemon")
+            or config.getoption("fmu_catalog")
+            or config.getoption("fmu_shared_cache")
+        ):
+            from pytest_fmu_filter.daemon import connect, default_socket_path
+
+            client = connect(config.getoption("fmu_daemon") or default_socket_path())
+            if client is not None:
+                config.add_cleanup(client.close)
+        config.stash[daemon_key] = client
+    return config.stash[daemon_key]
+
+
+def _select_with_daemon(
+    client, session: FmuSession, filter_kwargs, on_error: ErrorCallback
+) -> Optional[List[FmuEntry]]:
+    """
+    Let the metadata daemon select the entries passing the filters.
+
+    Returns:
+        The matching entries, or None if the daemon cannot answer (e.g. for
+        ``custom`` filters) and the selection has to run in-process
+    """
+    from pytest_fmu_filter.daemon import DaemonError, serializable
+
+    if not serializable(filter_kwargs):
+        return None
+    entries = list(session)
+    try:
+        matches, errors = client.select(
+            [entry.path for entry in entries], filter_kwargs
+        )
+    except DaemonError:
+        return None
+    for i, message in errors:
+        on_error(entries[i], Exception(message))
+    return [entries[i] for i in matches]
+
+
+def apply_filters(entry: FmuEntry, filter_kwargs):
+    """
+    Apply filters to an FMU.
+
+    Size-based keys are checked first from a counting pass over the XML, which
+    can stop early once a threshold is crossed. Interface type, model name and
+    FMI version keys only need the start of the XML, platform keys add the zip
+    central directory to that. Name keys are checked against the names of the
+    FMU (see :meth:`FmuEntry.details`), which are not kept. All other keys but
+    ``custom`` are answered from the compact summary of the FMU; once one of
+    them is given, the summary is loaded first and answers the header and
+    platform keys too, so the FMU is read once. The full ModelDescription is
+    only loaded for ``custom`` filters.
+
+    Args:
+        entry: FmuEntry of the FMU
+        filter_kwargs: Filter criteria from the fmu_filter marker
+
+    Returns:
+        bool: True if the model passes all filters, False otherwise
+    """
+    size_kwargs = {k: v for k, v in filter_kwargs.items() if k in SIZE_KEYS}
+    if size_kwargs and not _check_sizes(entry, size_kwargs):
+        return False
+
+    if any(key in SUMMARY_KEYS for key in filter_kwargs):
+        # Header and platforms are taken from the summary once it is known
+        entry.summary()
+
+    # If any filter is failed, return False
+    for key, value in filter_kwargs.items():
+        if key in SIZE_KEYS:
+            continue
+        if key == "custom" and callable(value):
+            passed = value(entry.model())
+        elif key in PLATFORM_KEYS:
+            passed = _check_platforms(entry, key, value)
+        elif key in NAME_KEYS:
+            passed = _check_names(entry, key, value)
+        elif key in HEADER_KEYS:
+            passed = _check_header(entry.header(), key, value)
+        elif key in SUMMARY_KEYS:
+            passed = _check_summary(entry.summary(), key, value)
+        else:
+            raise ValueError(f"Unknown filter key: {key}")
+        if not passed:
+            return False
+
+    # If all filters passed, return True
+    return True
+
+
+def _check_flag(actual: bool, value) -> bool:
+    """Check a boolean filter: True requires the property, False its absence."""
+    if value:
+        return actual
+    return not (value is False and actual)
+
+
+def _check_header(header: Union[ModelHeader, FmuSummary], key: str, value) -> bool:
+    """Check a header filter against the header (or the summary) of an FMU."""
+    if key == "is_me":
+        return _check_flag(header.is_me(), value)
+    if key == "is_cs":
+        return _check_flag(header.is_cs(), value)
+    if key == "is_se":
+        return _check_flag(header.is_se(), value)
+    if key == "name_matches":
+        return header.name_matches(value)
+    if key == "fmi_major_version":
+        return header.fmi_version.startswith(str(value))
+    return header.fmi_version == value
+
+
+def _check_summary(summary: FmuSummary, key: str, value) -> bool:
+    """Check a summary filter against the summary of an FMU."""
+    if key == "has_input":
+        return _check_flag(summary.has_input(), value)
+    if key == "has_output":
+        return _check_flag(summary.has_output(), value)
+    if key == "has_parameter":
+        return _check_flag(summary.has_parameter(), value)
+    if key == "has_sources":
+        return _check_flag(summary.has_sources(), value)
+    return compile_query(value).matches(summary)
+
+
+def _check_names(entry: FmuEntry, key: str, value) -> bool:
+    """Check a name filter against the names declared by an FMU."""
+    kind, qualifier = NAME_KEYS[key]
+    if kind == "variables":
+        names = entry.variables()
+    elif kind in TERMINAL_INDEXES:
+        names = TERMINAL_INDEXES[kind](entry.terminals())
+    else:
+        names = DETAIL_INDEXES[kind](entry.details())
+    wanted = [value] if isinstance(value, str) else value
+    return any(
+        name in wanted and (qualifier is None or q == qualifier) for name, q in names
+    )
+
+
+def _check_platforms(entry: FmuEntry, key: str, value) -> bool:
+    """Check a platform filter against the binaries of an FMU."""
+    platforms = entry.platforms()
+    if key == "has_platform":
+        wanted = [value] if isinstance(value, str) else value
+        return any(p in wanted for p in platforms)
+    return _check_flag(current_platform(entry.header().fmi_version) in platforms, value)
+
+
+def _check_sizes(entry: FmuEntry, size_kwargs) -> bool:
+    """Check size-based filters against the model counts of an FMU."""
+    stop_after = None
+    if all(SIZE_KEYS[key][0] == "n_variables" for key in size_kwargs):
+        # Only variables are counted: stop once every threshold is decided
+        stop_after = max(
+            value if SIZE_KEYS[key][1] else value - 1
+            for key, value in size_kwargs.items()
+        )
+
+    counts = entry.counts(stop_after)
+    for key, value in size_kwargs.items():
+        attribute, is_maximum = SIZE_KEYS[key]
+        actual = getattr(counts, attribute)
+        if actual > value if is_maximum else actual < value:
+            return False
+    return True
@@ -5,13 +5,20 @@ This module provides functionality to read and parse modelDescription.xml files
 from FMUs that are compliant with FMI 2.0 and 3.0 standards.
 """
 
+import os
+import platform
 import re
+import struct
+import sys
+import weakref
 import xml.etree.ElementTree as ET
 import zipfile
-from dataclasses import dataclass, field
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 # Define namespaces for different FMI versions
 FMI_NAMESPACES = {
@@ -19,6 +26,31 @@ FMI_NAMESPACES = {
     "3.0": "http://www.fmi-standard.org/schemas/3.0",
 }
 
+# Variable elements of FMI 3.0 ModelVariables
+FMI3_VARIABLE_TYPES = (
+    "Float32",
+    "Float64",
+    "Int8",
+    "UInt8",
+    "Int16",
+    "UInt16",
+    "Int32",
+    "UInt32",
+    "Int64",
+    "UInt64",
+    "Boolean",
+    "String",
+    "Binary",
+    "Enumeration",
+)
+
+# File extensions of FMU shared libraries
+BINARY_EXTENSIONS = (".so", ".dll", ".dylib")
+
+# Secondary documents of FMI 3.0 FMUs, loaded on demand
+TERMINALS_AND_ICONS = "terminalsAndIcons/terminalsAndIcons.xml"
+BUILD_DESCRIPTION = "sources/buildDescription.xml"
+
 
 class VariableCausality(str, Enum):
     """Enumeration for variable causality types."""
@@ -66,9 +98,89 @@ class Dimension:
     value_reference: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class BaseUnit:
+    """Represents the SI base unit exponents, factor and offset of a unit."""
+
+    kg: int = 0
+    m: int = 0
+    s: int = 0
+    A: int = 0
+    K: int = 0
+    mol: int = 0
+    cd: int = 0
+    rad: int = 0
+    factor: float = 1.0
+    offset: float = 0.0
+
+
+@dataclass(frozen=True)
+class DisplayUnit:
+    """Represents a display unit of a unit."""
+
+    name: str
+    factor: float = 1.0
+    offset: float = 0.0
+    inverse: bool = False
+
+
+@dataclass(frozen=True)
+class Unit:
+    """Represents a unit definition (UnitDefinitions/Unit)."""
+
+    name: str
+    base_unit: Optional[BaseUnit] = None
+    display_units: Tuple[DisplayUnit, ...] = ()
+
+
+@dataclass(frozen=True)
+class TypeDefinition:
+    """
+    Represents a type definition (FMI 2.0 SimpleType, FMI 3.0 <Type>Type).
+
+    Attributes:
+        name: Name referenced by the declaredType of variables
+        type_name: The base type in lower case, e.g. 'real' or 'float64'
+        quantity: Physical quantity, e.g. 'Pressure'
+        unit: The unit definition, if the type has a unit
+        display_unit: Name of the default display unit
+        attributes: Other attributes of the type, e.g. min and max
+    """
+
+    name: str
+    type_name: str
+    description: Optional[str] = None
+    quantity: Optional[str] = None
+    unit: Optional[Unit] = None
+    display_unit: Optional[str] = None
+    attributes: Tuple[Tuple[str, str], ...] = ()
+
+
+# Unit and type definitions are immutable flyweights: equal definitions are
+# the same object across all variables and all models that are alive
+_interned: "weakref.WeakValueDictionary[Any, Any]" = weakref.WeakValueDictionary()
+
+
+def _intern(definition):
+    """Return the shared instance equal to ``definition``."""
+    # Keyed by field values: a key holding the instance would keep it alive
+    key = (type(definition),) + tuple(
+        getattr(definition, f.name) for f in fields(definition)
+    )
+    shared = _interned.get(key)
+    if shared is None:
+        _interned[key] = shared = definition
+    return shared
+
+
 @dataclass
 class BaseVariable:
-    """Base class for all FMI variables."""
+    """
+    Base class for all FMI variables.
+
+    ``unit`` and ``declared_type`` reference the shared definitions of the
+    model; the unit of a variable without its own unit is that of its type.
+    """
 
     name: str
     value_reference: int
@@ -76,6 +188,8 @@ class BaseVariable:
     causality: Optional[VariableCausality] = None
     variability: Optional[VariableVariability] = None
     type_name: Optional[str] = None
+    declared_type: Optional[TypeDefinition] = None
+    unit: Optional[Unit] = None
 
 
 @dataclass
@@ -93,7 +207,6 @@ class Fmi3Variable(BaseVariable):
     can_handle_multiple_set_per_time_instant: Optional[bool] = None
     intermediate_update: Optional[bool] = None
     previous: Optional[str] = None
-    declared_type: Optional[str] = None
     dimensions: List[Dimension] = field(default_factory=list)
     type_attributes: Dict[str, str] = field(default_factory=dict)
 
@@ -116,6 +229,111 @@ class DefaultExperiment:
     step_size: Optional[float] = None
 
 
+@dataclass
+class ModelCounts:
+    """
+    Sizes of a model, counted without creating variable objects.
+
+    Attributes:
+        n_variables: Number of model variables
+        n_states: Number of continuous states
+        n_event_indicators: Number of event indicators
+        truncated: Counting stopped early; n_variables is a lower bound and
+            the other counts are unknown
+    """
+
+    n_variables: int = 0
+    n_states: int = 0
+    n_event_indicators: int = 0
+    truncated: bool = False
+
+
+@dataclass
+class TerminalMemberVariable:
+    """Represents a member variable of a terminal."""
+
+    variable_name: str
+    variable_kind: str
+    member_name: Optional[str] = None
+
+
+@dataclass
+class Terminal:
+    """Represents a terminal of terminalsAndIcons.xml (FMI 3.0)."""
+
+    name: str
+    matching_rule: str
+    terminal_kind: Optional[str] = None
+    description: Optional[str] = None
+    member_variables: List[TerminalMemberVariable] = field(default_factory=list)
+    terminals: List["Terminal"] = field(default_factory=list)
+
+    def walk(self) -> Iterator["Terminal"]:
+        """Yield this terminal and all nested terminals."""
+        yield self
+        for terminal in self.terminals:
+            yield from terminal.walk()
+
+
+@dataclass
+class SourceFileSet:
+    """Represents a set of source files compiled together."""
+
+    name: Optional[str] = None
+    language: Optional[str] = None
+    compiler: Optional[str] = None
+    compiler_options: Optional[str] = None
+    source_files: List[str] = field(default_factory=list)
+    include_directories: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BuildConfiguration:
+    """Represents a build configuration of buildDescription.xml (FMI 3.0)."""
+
+    model_identifier: str
+    platform: Optional[str] = None
+    description: Optional[str] = None
+    source_file_sets: List[SourceFileSet] = field(default_factory=list)
+    libraries: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ModelHeader:
+    """
+    The root attributes and interface types of a model, read without its variables.
+
+    Answers the interface type, model name and FMI version checks of
+    ModelDescription from the start of modelDescription.xml only.
+    """
+
+    fmi_version: str
+    model_name: str
+    description: Optional[str] = None
+    author: Optional[str] = None
+    version: Optional[str] = None
+    interface_types: List[ModelInterfaceType] = field(default_factory=list)
+
+    def _has_interface(self, fmi_type: FmiType) -> bool:
+        return any(it.fmi_type == fmi_type for it in self.interface_types)
+
+    def is_me(self) -> bool:
+        """Check if the FMU supports Model Exchange."""
+        return self._has_interface(FmiType.MODEL_EXCHANGE)
+
+    def is_cs(self) -> bool:
+        """Check if the FMU supports Co-Simulation."""
+        return self._has_interface(FmiType.CO_SIMULATION)
+
+    def is_se(self) -> bool:
+        """Check if the FMU supports Scheduled Execution (FMI 3.0 only)."""
+        return self._has_interface(FmiType.SCHEDULED_EXECUTION)
+
+    def name_matches(self, pattern: str) -> bool:
+        """Check if the model name matches the given regex pattern."""
+        return re.search(pattern, self.model_name) is not None
+
+
 @dataclass
 class BaseModelDescription:
     """Base class for FMI model descriptions."""
@@ -126,6 +344,8 @@ class BaseModelDescription:
     version: Optional[str] = None
     interface_types: List[ModelInterfaceType] = field(default_factory=list)
     default_experiment: Optional[DefaultExperiment] = None
+    unit_definitions: List[Unit] = field(default_factory=list)
+    type_definitions: List[TypeDefinition] = field(default_factory=list)
     variables: List[Any] = field(default_factory=list)
 
 
@@ -154,24 +374,44 @@ class ModelDescription:
         namespace (str): The XML namespace for the FMI version
         has_inputs (bool): Whether the model has input variables
         has_outputs (bool): Whether the model has output variables
+        files (List[str]): Archive member names of the FMU, if known
+        fmu_path (Path): Path of the FMU, if read from one
     """
 
-    def __init__(self, root: ET.Element, fmi_version: str):
+    def __init__(
+        self,
+        root: ET.Element,
+        fmi_version: str,
+        files: Optional[List[str]] = None,
+        fmu_path: Optional[Path] = None,
+        members: Optional[Dict[str, zipfile.ZipInfo]] = None,
+    ):
         """
         Initialize a ModelDescription from an XML root element.
 
         Args:
             root: The root XML element of the modelDescription
             fmi_version: The FMI standard version ('2.0' or '3.0')
+            files: Archive member names of the FMU (e.g. 'binaries/linux64/model.so')
+            fmu_path: Path of the FMU archive or directory, for the secondary documents
+            members: Central directory entries of the secondary documents of an archive
         """
         self.root = root
         self.fmi_version = fmi_version
+        self.files = files if files is not None else []
+        self.fmu_path = fmu_path
+        self._members = members if members is not None else {}
+        self._terminals: Optional[List[Terminal]] = None
+        self._build_configurations: Optional[List[BuildConfiguration]] = None
         if fmi_version.startswith("1."):
             raise ValueError(
                 "FMI 1.0 is not supported. Only FMI 2.0 and 3.0 are supported."
             )
 
         self.namespace = FMI_NAMESPACES.get(fmi_version, "")
+        self._units: Dict[str, Unit] = {}
+        self._types: Dict[str, TypeDefinition] = {}
+        self._unit_index: Optional[Dict[str, List[BaseVariable]]] = None
 
         # Parse model description
         if fmi_version == "2.0":
@@ -207,6 +447,10 @@ class ModelDescription:
         # Parse default experiment
         model.default_experiment = self._parse_default_experiment()
 
+        # Parse unit and type definitions, shared by the variables
+        model.unit_definitions = self._parse_unit_definitions()
+        model.type_definitions = self._parse_fmi2_type_definitions()
+
         # Parse variables
         model.variables = self._parse_fmi2_variables()
 
@@ -236,6 +480,10 @@ class ModelDescription:
         # Parse default experiment
         model.default_experiment = self._parse_default_experiment()
 
+        # Parse unit and type definitions, shared by the variables
+        model.unit_definitions = self._parse_unit_definitions()
+        model.type_definitions = self._parse_fmi3_type_definitions()
+
         # Parse variables
         model.variables = self._parse_fmi3_variables()
 
@@ -335,6 +583,135 @@ class ModelDescription:
             step_size=step_size,
         )
 
+    def _parse_unit_definitions(self) -> List[Unit]:
+        """Parse UnitDefinitions (same structure in FMI 2.0 and 3.0)."""
+        for unit_elem in self.root.findall("./UnitDefinitions/Unit"):
+            name = unit_elem.get("name")
+            if name is None:
+                raise ValueError("Unit name is required but not found.")
+
+            base_unit = None
+            base_elem = unit_elem.find("./BaseUnit")
+            if base_elem is not None:
+                base_unit = _intern(
+                    BaseUnit(
+                        **{
+                            key: int(base_elem.get(key, "0"))
+                            for key in ("kg", "m", "s", "A", "K", "mol", "cd", "rad")
+                        },
+                        factor=float(base_elem.get("factor", "1")),
+                        offset=float(base_elem.get("offset", "0")),
+                    )
+                )
+
+            display_units = tuple(
+                _intern(
+                    DisplayUnit(
+                        name=display_elem.get("name", ""),
+                        factor=float(display_elem.get("factor", "1")),
+                        offset=float(display_elem.get("offset", "0")),
+                        inverse=display_elem.get("inverse", "false") == "true",
+                    )
+                )
+                for display_elem in unit_elem.findall("./DisplayUnit")
+            )
+            self._units[name] = _intern(Unit(name, base_unit, display_units))
+        return list(self._units.values())
+
+    def _unit(self, name: Optional[str]) -> Optional[Unit]:
+        """Return the unit definition of a unit name, also for undefined units."""
+        if name is None:
+            return None
+        unit = self._units.get(name)
+        if unit is None:
+            unit = self._units[name] = _intern(Unit(name))
+        return unit
+
+    def _type_definition(
+        self,
+        name: str,
+        type_name: str,
+        description: Optional[str],
+        attrib: Dict[str, str],
+    ) -> TypeDefinition:
+        attributes = {
+            key: value
+            for key, value in attrib.items()
+            if key not in ("name", "description", "quantity", "unit", "displayUnit")
+        }
+        return _intern(
+            TypeDefinition(
+                name=name,
+                type_name=type_name,
+                description=description,
+                quantity=attrib.get("quantity"),
+                unit=self._unit(attrib.get("unit")),
+                display_unit=attrib.get("displayUnit"),
+                attributes=tuple(sorted(attributes.items())),
+            )
+        )
+
+    def _parse_fmi2_type_definitions(self) -> List[TypeDefinition]:
+        """Parse TypeDefinitions/SimpleType for FMI 2.0."""
+        for type_elem in self.root.findall("./TypeDefinitions/SimpleType"):
+            name = type_elem.get("name")
+            if name is None:
+                raise ValueError("Type name is required but not found.")
+            # The base type is the single child element
+            for base_elem in type_elem:
+                if base_elem.tag in (
+                    "Real",
+                    "Integer",
+                    "Boolean",
+                    "String",
+                    "Enumeration",
+                ):
+                    self._types[name] = self._type_definition(
+                        name,
+                        base_elem.tag.lower(),
+                        type_elem.get("description"),
+                        base_elem.attrib,
+                    )
+                    break
+        return list(self._types.values())
+
+    def _parse_fmi3_type_definitions(self) -> List[TypeDefinition]:
+        """Parse TypeDefinitions for FMI 3.0 (Float64Type, Int32Type, ...)."""
+        type_definitions = self.root.find("./TypeDefinitions")
+        if type_definitions is None:
+            return []
+        for type_elem in type_definitions:
+            if not isinstance(type_elem.tag, str) or not type_elem.tag.endswith("Type"):
+                continue
+            name = type_elem.get("name")
+            if name is None:
+                raise ValueError("Type name is required but not found.")
+            self._types[name] = self._type_definition(
+                name,
+                type_elem.tag[: -len("Type")].lower(),
+                type_elem.get("description"),
+                type_elem.attrib,
+            )
+        return list(self._types.values())
+
+    def _declared_type(
+        self, name: Optional[str], type_name: str
+    ) -> Optional[TypeDefinition]:
+        """Return the definition of a declared type, an empty one if undefined."""
+        if name is None:
+            return None
+        declared_type = self._types.get(name)
+        if declared_type is None:
+            declared_type = self._types[name] = _intern(TypeDefinition(name, type_name))
+        return declared_type
+
+    def _variable_unit(
+        self, unit_name: Optional[str], declared_type: Optional[TypeDefinition]
+    ) -> Optional[Unit]:
+        if unit_name is not None:
+            return self._unit(unit_name)
+        return declared_type.unit if declared_type is not None else None
+
     def _parse_fmi2_variables(self) -> List[Fmi2Variable]:
         """Parse variables for FMI 2.0."""
         variables = []
@@ -373,9 +750,16 @@ class ModelDescription:
 
             # Determine type from child element
             type_name = None
+            declared_type = None
+            unit = None
             for type_elem in ["Real", "Integer", "Boolean", "String", "Enumeration"]:
-                if var.find(f"./{type_elem}") is not None:
+                type_child = var.find(f"./{type_elem}")
+                if type_child is not None:
                     type_name = type_elem.lower()
+                    declared_type = self._declared_type(
+                        type_child.get("declaredType"), type_name
+                    )
+                    unit = self._variable_unit(type_child.get("unit"), declared_type)
                     break
 
             # Create variable
@@ -386,6 +770,8 @@ class ModelDescription:
                 causality=causality,
                 variability=variability,
                 type_name=type_name,
+                declared_type=declared_type,
+                unit=unit,
                 initial=initial,
             )
 
@@ -397,31 +783,13 @@ class ModelDescription:
         """Parse variables for FMI 3.0."""
         variables = []
 
-        # FMI 3.0 variable types
-        fmi3_types = [
-            "Float32",
-            "Float64",
-            "Int8",
-            "UInt8",
-            "Int16",
-            "UInt16",
-            "Int32",
-            "UInt32",
-            "Int64",
-            "UInt64",
-            "Boolean",
-            "String",
-            "Binary",
-            "Enumeration",
-        ]
-
         # Find ModelVariables element
         model_variables = self.root.find("./ModelVariables")
         if model_variables is None:
             return variables
 
         # Process each variable type
-        for type_elem in fmi3_types:
+        for type_elem in FMI3_VARIABLE_TYPES:
             for var in model_variables.findall(f"./{type_elem}"):
                 name = var.get("name")
                 if name is None:
@@ -469,7 +837,10 @@ class ModelDescription:
                     intermediate_update = intermediate_update.lower() == "true"
 
                 previous = var.get("previous")
-                declared_type = var.get("declaredType")
+                declared_type = self._declared_type(
+                    var.get("declaredType"), type_elem.lower()
+                )
+                unit = self._variable_unit(var.get("unit"), declared_type)
 
                 # Extract type-specific attributes (like start values, min, max, etc.)
                 type_attributes = {}
@@ -515,6 +886,7 @@ class ModelDescription:
                     intermediate_update=intermediate_update,
                     previous=previous,
                     declared_type=declared_type,
+                    unit=unit,
                     dimensions=dimensions,
                     type_attributes=type_attributes,
                 )
@@ -586,39 +958,169 @@ class ModelDescription:
             for var in self.model.variables
         )
 
-    def with_inputs(self, inputs: list[str] | str) -> bool:
-        """Check if the model has input variables."""
-        if isinstance(inputs, str):
-            inputs = [inputs]
-        if not self.has_input:
-            return False
-        # Check if any of the input variable names match the provided list
+    def _with_causality(
+        self, names: list[str] | str, causality: VariableCausality
+    ) -> bool:
+        if isinstance(names, str):
+            names = [names]
         return any(
-            var.name in inputs for var in self.model.variables if hasattr(var, "name")
+            var.name in names and var.causality == causality
+            for var in self.model.variables
         )
 
+    def with_inputs(self, inputs: list[str] | str) -> bool:
+        """Check if the model has input variables with any of the given names."""
+        return self._with_causality(inputs, VariableCausality.INPUT)
+
     def with_outputs(self, outputs: list[str] | str) -> bool:
-        """Check if the model has output variables."""
-        if isinstance(outputs, str):
-            outputs = [outputs]
-        if not self.has_output:
-            return False
-        # Check if any of the output variable names match the provided list
+        """Check if the model has output variables with any of the given names."""
+        return self._with_causality(outputs, VariableCausality.OUTPUT)
+
+    def with_parameters(self, parameters: list[str] | str) -> bool:
+        """Check if the model has parameter variables with any of the given names."""
+        return self._with_causality(parameters, VariableCausality.PARAMETER)
+
+    def unit_index(self) -> Dict[str, List[BaseVariable]]:
+        """Return the variables by unit name, built on first use."""
+        if self._unit_index is None:
+            self._unit_index = {}
+            for var in self.model.variables:
+                if var.unit is not None:
+                    self._unit_index.setdefault(var.unit.name, []).append(var)
+        return self._unit_index
+
+    def _with_units(
+        self, units: list[str] | str, causality: Optional[VariableCausality] = None
+    ) -> bool:
+        if isinstance(units, str):
+            units = [units]
+        index = self.unit_index()
         return any(
-            var.name in outputs for var in self.model.variables if hasattr(var, "name")
+            causality is None or var.causality == causality
+            for unit in units
+            for var in index.get(unit, ())
         )
 
-    def with_parameters(self, parameters: list[str] | str) -> bool:
-        """Check if the model has parameter variables."""
-        if isinstance(parameters, str):
-            parameters = [parameters]
-        if not self.has_parameter:
-            return False
-        # Check if any of the parameter variable names match the provided list
+    def with_units(self, units: list[str] | str) -> bool:
+        """Check if the model has variables in any of the given units."""
+        return self._with_units(units)
+
+    def with_input_units(self, units: list[str] | str) -> bool:
+        """Check if the model has input variables in any of the given units."""
+        return self._with_units(units, VariableCausality.INPUT)
+
+    def with_output_units(self, units: list[str] | str) -> bool:
+        """Check if the model has output variables in any of the given units."""
+        return self._with_units(units, VariableCausality.OUTPUT)
+
+    def with_declared_types(self, declared_types: list[str] | str) -> bool:
+        """Check if the model has variables of any of the given declared types."""
+        if isinstance(declared_types, str):
+            declared_types = [declared_types]
         return any(
-            var.name in parameters
+            var.declared_type is not None and var.declared_type.name in declared_types
             for var in self.model.variables
-            if hasattr(var, "name")
+        )
+
+    def counts(self) -> ModelCounts:
+        """Return the number of variables, continuous states and event indicators."""
+        if self.fmi_version == "2.0":
+            n_states = len(self.root.findall("./ModelStructure/Derivatives/Unknown"))
+            n_event_indicators = int(self.root.get("numberOfEventIndicators", "0"))
+        else:
+            n_states = len(
+                self.root.findall("./ModelStructure/ContinuousStateDerivative")
+            )
+            n_event_indicators = len(
+                self.root.findall("./ModelStructure/EventIndicator")
+            )
+        return ModelCounts(
+            n_variables=len(self.model.variables),
+            n_states=n_states,
+            n_event_indicators=n_event_indicators,
+        )
+
+    def binary_platforms(self) -> List[str]:
+        """
+        Return the platforms the FMU ships a binary for.
+
+        A platform counts if ``binaries/<platform>/<modelIdentifier>`` with a
+        shared library extension exists for any of the model identifiers.
+        Only the archive member names are looked at.
+        """
+        return _binary_platforms(
+            self.files, [it.model_identifier for it in self.model.interface_types]
+        )
+
+    def _read_document(self, name: str) -> Optional[ET.Element]:
+        """
+        Parse a secondary document of the FMU, None if it has none.
+
+        Archive members are read at the offsets recorded from the central
+        directory when modelDescription.xml was read, so the archive is not
+        opened as a zip file again.
+        """
+        if self.fmu_path is None or name not in self.files:
+            return None
+        if name in self._members:
+            data = _read_member(self.fmu_path, self._members[name])
+        else:
+            data = (self.fmu_path / name).read_bytes()
+        try:
+            return ET.fromstring(data)
+        except ET.ParseError as e:
+            raise Exception(f"Error parsing {name}: {e}")
+
+    def terminals(self) -> List[Terminal]:
+        """Return the top-level terminals of terminalsAndIcons.xml, parsed on first use."""
+        if self._terminals is None:
+            root = self._read_document(TERMINALS_AND_ICONS)
+            self._terminals = (
+                [_parse_terminal(elem) for elem in root.findall("./Terminals/Terminal")]
+                if root is not None
+                else []
+            )
+        return self._terminals
+
+    def build_configurations(self) -> List[BuildConfiguration]:
+        """Return the build configurations of buildDescription.xml, parsed on first use."""
+        if self._build_configurations is None:
+            root = self._read_document(BUILD_DESCRIPTION)
+            self._build_configurations = (
+                [
+                    _parse_build_configuration(elem)
+                    for elem in root.findall("./BuildConfiguration")
+                ]
+                if root is not None
+                else []
+            )
+        return self._build_configurations
+
+    def _all_terminals(self) -> Iterator[Terminal]:
+        for terminal in self.terminals():
+            yield from terminal.walk()
+
+    def has_terminal(self, names: list[str] | str) -> bool:
+        """Check if the FMU has terminals (at any depth) with any of the given names."""
+        if isinstance(names, str):
+            names = [names]
+        return any(terminal.name in names for terminal in self._all_terminals())
+
+    def has_terminal_kind(self, kinds: list[str] | str) -> bool:
+        """Check if the FMU has terminals (at any depth) of any of the given kinds."""
+        if isinstance(kinds, str):
+            kinds = [kinds]
+        return any(
+            terminal.terminal_kind in kinds for terminal in self._all_terminals()
+        )
+
+    def has_sources(self) -> bool:
+        """Check if the FMU ships source files below sources/."""
+        return any(
+            name.startswith("sources/")
+            and name != BUILD_DESCRIPTION
+            and not name.endswith("/")
+            for name in self.files
         )
 
     def has_array_variables(self) -> bool:
@@ -632,12 +1134,16 @@ class ModelDescription:
         return False
 
 
-def read_modelDescription(fmu_path: Union[str, Path]) -> ModelDescription:
+def read_modelDescription(
+    fmu_path: Union[str, Path], is_dir: Optional[bool] = None
+) -> ModelDescription:
     """
     Read and parse the modelDescription.xml file from an FMU.
 
     Args:
         fmu_path: Path to the FMU file
+        is_dir: Whether the FMU is an extracted directory, if already known
+            (e.g. from directory scanning); skips the existence checks
 
     Returns:
         ModelDescription object containing the parsed modelDescription data
@@ -649,11 +1155,13 @@ def read_modelDescription(fmu_path: Union[str, Path]) -> ModelDescription:
     """
     fmu_path = Path(fmu_path)
 
-    if not fmu_path.exists():
-        raise FileNotFoundError(f"FMU file not found: {fmu_path}")
+    if is_dir is None:
+        if not fmu_path.exists():
+            raise FileNotFoundError(f"FMU file not found: {fmu_path}")
+        is_dir = fmu_path.is_dir()
 
     # If the path is a directory, look for modelDescription.xml directly
-    if fmu_path.is_dir():
+    if is_dir:
         md_path = fmu_path / "modelDescription.xml"
         if not md_path.exists():
             raise ValueError(f"No modelDescription.xml found in directory: {fmu_path}")
@@ -664,16 +1172,29 @@ def read_modelDescription(fmu_path: Union[str, Path]) -> ModelDescription:
         except Exception as e:
             raise Exception(f"Error parsing modelDescription.xml: {e}")
 
+        files = _list_members(fmu_path)
+        members = None
+
     # Otherwise, assume it's a zip file (standard FMU)
     else:
         try:
             with zipfile.ZipFile(fmu_path, "r") as zip_ref:
+                # Member names come from the central directory, nothing is decompressed
+                files = zip_ref.namelist()
+
                 # Check if modelDescription.xml exists in the archive
-                if "modelDescription.xml" not in zip_ref.namelist():
+                if "modelDescription.xml" not in files:
                     raise ValueError(
                         f"No modelDescription.xml found in FMU: {fmu_path}"
                     )
 
+                # Where to find the secondary documents later on
+                members = {
+                    name: zip_ref.getinfo(name)
+                    for name in (TERMINALS_AND_ICONS, BUILD_DESCRIPTION)
+                    if name in files
+                }
+
                 # Read and parse modelDescription.xml
                 with zip_ref.open("modelDescription.xml") as md_file:
                     try:
@@ -685,17 +1206,445 @@ def read_modelDescription(fmu_path: Union[str, Path]) -> ModelDescription:
             raise ValueError(f"Not a valid zip file (FMU): {fmu_path}")
 
     # Determine FMI version
-    fmi_version = root.get("fmiVersion", "")
+    fmi_version = _normalize_fmi_version(root.get("fmiVersion", ""))
+
+    # Create and return ModelDescription object
+    return ModelDescription(root, fmi_version, files, fmu_path, members)
+
+
+def _normalize_fmi_version(fmi_version: str) -> str:
+    """
+    Map an fmiVersion attribute to our simplified version scheme, '2.0' or '3.0'.
 
-    # Map the version string to our simplified version scheme
+    Raises:
+        ValueError: For FMI 1.0 and unrecognized versions
+    """
+    if fmi_version.startswith("1."):
+        raise ValueError(
+            "FMI 1.0 is not supported. Only FMI 2.0 and 3.0 are supported."
+        )
     if fmi_version.startswith("2."):
-        fmi_version = "2.0"
-    elif fmi_version.startswith("3."):
-        fmi_version = "3.0"
+        return "2.0"
+    if fmi_version.startswith("3."):
+        return "3.0"
+    raise ValueError(
+        f"Unsupported or unrecognized FMI version: {fmi_version}. Only FMI 2.0 and 3.0 are supported."
+    )
+
+
+def _list_members(fmu_dir: Path) -> List[str]:
+    """
+    List the files of an extracted FMU that are looked at as archive member names.
+
+    These are the files below binaries/<platform>/ and sources/, and the
+    terminalsAndIcons.xml.
+    """
+    files = []
+    binaries = fmu_dir / "binaries"
+    if binaries.is_dir():
+        with os.scandir(binaries) as platforms:
+            for platform_entry in platforms:
+                if not platform_entry.is_dir():
+                    continue
+                with os.scandir(platform_entry.path) as entries:
+                    for entry in entries:
+                        files.append(f"binaries/{platform_entry.name}/{entry.name}")
+    sources = fmu_dir / "sources"
+    if sources.is_dir():
+        files.extend(
+            p.relative_to(fmu_dir).as_posix()
+            for p in sorted(sources.rglob("*"))
+            if p.is_file()
+        )
+    if (fmu_dir / TERMINALS_AND_ICONS).is_file():
+        files.append(TERMINALS_AND_ICONS)
+    return files
+
+
+def _binary_platforms(
+    files: Iterable[str], model_identifiers: Iterable[str]
+) -> List[str]:
+    binaries = {
+        model_id + ext for model_id in model_identifiers for ext in BINARY_EXTENSIONS
+    }
+    platforms = set()
+    for name in files:
+        parts = name.split("/")
+        if len(parts) == 3 and parts[0] == "binaries" and parts[2] in binaries:
+            platforms.add(parts[1])
+    return sorted(platforms)
+
+
+def read_binary_platforms(
+    fmu_path: Union[str, Path],
+    model_identifiers: Iterable[str],
+    is_dir: Optional[bool] = None,
+) -> List[str]:
+    """
+    Return the platforms an FMU ships a binary for, see ModelDescription.binary_platforms.
+
+    Only the zip central directory (or the binaries/ directory of an extracted
+    FMU) is read; modelDescription.xml is not parsed, the model identifiers
+    come from the caller, e.g. from read_model_header.
+
+    Raises:
+        ValueError: If the file is not a valid zip file
+    """
+    fmu_path = Path(fmu_path)
+    if is_dir is None:
+        is_dir = fmu_path.is_dir()
+    if is_dir:
+        files = _list_members(fmu_path)
     else:
+        try:
+            with zipfile.ZipFile(fmu_path, "r") as zip_ref:
+                files = zip_ref.namelist()
+        except zipfile.BadZipFile:
+            raise ValueError(f"Not a valid zip file (FMU): {fmu_path}")
+    return _binary_platforms(files, model_identifiers)
+
+
+# Local file header: signature, versions, flags, method, time, date, crc,
+# sizes, then the lengths of the file name and extra field
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+def _read_member(fmu_path: Path, info: zipfile.ZipInfo) -> bytes:
+    """Read an archive member from its central directory entry."""
+    with open(fmu_path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(_LOCAL_HEADER.size)
+        if len(header) != _LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+            raise ValueError(f"Bad local header of {info.filename} in FMU: {fmu_path}")
+        name_length, extra_length = _LOCAL_HEADER.unpack(header)[-2:]
+        f.seek(name_length + extra_length, os.SEEK_CUR)
+        data = f.read(info.compress_size)
+
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(data, -zlib.MAX_WBITS)
+    elif info.compress_type != zipfile.ZIP_STORED:
+        # Rare in FMUs: let zipfile handle other methods
+        with zipfile.ZipFile(fmu_path) as zip_ref:
+            return zip_ref.read(info)
+    if zlib.crc32(data) != info.CRC:
+        raise ValueError(f"Bad CRC-32 of {info.filename} in FMU: {fmu_path}")
+    return data
+
+
+def _parse_terminal(elem: ET.Element) -> Terminal:
+    return Terminal(
+        name=elem.get("name", ""),
+        matching_rule=elem.get("matchingRule", ""),
+        terminal_kind=elem.get("terminalKind"),
+        description=elem.get("description"),
+        member_variables=[
+            TerminalMemberVariable(
+                variable_name=member.get("variableName", ""),
+                variable_kind=member.get("variableKind", ""),
+                member_name=member.get("memberName"),
+            )
+            for member in elem.findall("./TerminalMemberVariable")
+        ],
+        terminals=[_parse_terminal(child) for child in elem.findall("./Terminal")],
+    )
+
+
+def _parse_build_configuration(elem: ET.Element) -> BuildConfiguration:
+    return BuildConfiguration(
+        model_identifier=elem.get("modelIdentifier", ""),
+        platform=elem.get("platform"),
+        description=elem.get("description"),
+        source_file_sets=[
+            SourceFileSet(
+                name=file_set.get("name"),
+                language=file_set.get("language"),
+                compiler=file_set.get("compiler"),
+                compiler_options=file_set.get("compilerOptions"),
+                source_files=[
+                    f.get("name", "") for f in file_set.findall("./SourceFile")
+                ],
+                include_directories=[
+                    d.get("name", "") for d in file_set.findall("./IncludeDirectory")
+                ],
+            )
+            for file_set in elem.findall("./SourceFileSet")
+        ],
+        libraries=[lib.get("name", "") for lib in elem.findall("./Library")],
+    )
+
+
+def current_platform(fmi_version: str) -> str:
+    """
+    Return the binary platform name of the running interpreter.
+
+    FMI 2.0 uses names like 'linux64' or 'win32', FMI 3.0 uses platform
+    tuples like 'x86_64-linux' or 'aarch64-darwin'.
+    """
+    if sys.platform.startswith("win"):
+        system = "win" if fmi_version == "2.0" else "windows"
+    elif sys.platform == "darwin":
+        system = "darwin"
+    else:
+        system = "linux"
+
+    if fmi_version == "2.0":
+        return f"{system}{64 if sys.maxsize > 2**32 else 32}"
+
+    machine = platform.machine().lower()
+    architecture = {
+        "amd64": "x86_64",
+        "x86_64": "x86_64",
+        "arm64": "aarch64",
+        "aarch64": "aarch64",
+        "i386": "x86",
+        "i686": "x86",
+    }.get(machine, machine)
+    return f"{architecture}-{system}"
+
+
+@contextmanager
+def _open_modelDescription(
+    fmu_path: Path, is_dir: Optional[bool] = None
+) -> Iterator[IO[bytes]]:
+    """Open the modelDescription.xml of an FMU archive or directory for reading."""
+    if is_dir is None:
+        if not fmu_path.exists():
+            raise FileNotFoundError(f"FMU file not found: {fmu_path}")
+        is_dir = fmu_path.is_dir()
+
+    if is_dir:
+        md_path = fmu_path / "modelDescription.xml"
+        if not md_path.exists():
+            raise ValueError(f"No modelDescription.xml found in directory: {fmu_path}")
+        with open(md_path, "rb") as md_file:
+            yield md_file
+        return
+
+    try:
+        zip_ref = zipfile.ZipFile(fmu_path, "r")
+    except zipfile.BadZipFile:
+        raise ValueError(f"Not a valid zip file (FMU): {fmu_path}")
+    with zip_ref:
+        if "modelDescription.xml" not in zip_ref.namelist():
+            raise ValueError(f"No modelDescription.xml found in FMU: {fmu_path}")
+        with zip_ref.open("modelDescription.xml") as md_file:
+            yield md_file
+
+
+def read_model_counts(
+    fmu_path: Union[str, Path],
+    stop_after: Optional[int] = None,
+    is_dir: Optional[bool] = None,
+) -> ModelCounts:
+    """
+    Count the variables, continuous states and event indicators of an FMU.
+
+    The modelDescription.xml is streamed and elements are discarded as soon as
+    they are counted, so no variable objects are created. This is much cheaper
+    than read_modelDescription for size-based filters.
+
+    Args:
+        fmu_path: Path to the FMU file
+        stop_after: Stop counting once more than this many variables were
+            seen; the result is then marked as truncated
+        is_dir: Whether the FMU is an extracted directory, if already known
+
+    Returns:
+        ModelCounts of the model
+
+    Raises:
+        FileNotFoundError: If the FMU file does not exist
+        ValueError: If the file is not a valid FMU or does not contain a modelDescription.xml
+        Exception: For other errors during parsing
+    """
+    counts = ModelCounts()
+    fmi_version = ""
+    depth = 0
+    section = parent = None
+
+    with _open_modelDescription(Path(fmu_path), is_dir) as md_file:
+        try:
+            for event, elem in ET.iterparse(md_file, events=("start", "end")):
+                if event == "end":
+                    # Drop counted elements right away
+                    if depth in (2, 3):
+                        elem.clear()
+                    depth -= 1
+                    continue
+
+                depth += 1
+                if depth == 1:
+                    fmi_version = elem.get("fmiVersion", "")
+                    # FMI 2.0 declares the number of event indicators on the root
+                    counts.n_event_indicators = int(
+                        elem.get("numberOfEventIndicators", "0")
+                    )
+                elif depth == 2:
+                    section = elem.tag
+                elif depth == 3:
+                    parent = elem.tag
+                    if section == "ModelVariables":
+                        counts.n_variables += 1
+                        if stop_after is not None and counts.n_variables > stop_after:
+                            counts.truncated = True
+                            break
+                    elif section == "ModelStructure":
+                        # FMI 3.0 lists states and event indicators here
+                        if elem.tag == "ContinuousStateDerivative":
+                            counts.n_states += 1
+                        elif elem.tag == "EventIndicator":
+                            counts.n_event_indicators += 1
+                elif (
+                    depth == 4
+                    and section == "ModelStructure"
+                    and parent == "Derivatives"
+                    and elem.tag == "Unknown"
+                ):
+                    counts.n_states += 1
+        except ET.ParseError as e:
+            raise Exception(f"Error parsing modelDescription.xml: {e}")
+
+    if fmi_version.startswith("1."):
         raise ValueError(
-            f"Unsupported or unrecognized FMI version: {fmi_version}. Only FMI 2.0 and 3.0 are supported."
+            "FMI 1.0 is not supported. Only FMI 2.0 and 3.0 are supported."
         )
+    return counts
 
-    # Create and return ModelDescription object
-    return ModelDescription(root, fmi_version)
+
+_INTERFACE_ELEMENTS = {
+    "ModelExchange": FmiType.MODEL_EXCHANGE,
+    "CoSimulation": FmiType.CO_SIMULATION,
+    "ScheduledExecution": FmiType.SCHEDULED_EXECUTION,
+}
+
+
+def read_model_header(
+    fmu_path: Union[str, Path], is_dir: Optional[bool] = None
+) -> ModelHeader:
+    """
+    Read the root attributes and interface types of an FMU.
+
+    The modelDescription.xml is streamed only up to ModelVariables, so the
+    cost does not grow with the number of variables.
+
+    Args:
+        fmu_path: Path to the FMU file
+        is_dir: Whether the FMU is an extracted directory, if already known
+
+    Returns:
+        ModelHeader of the model
+
+    Raises:
+        FileNotFoundError: If the FMU file does not exist
+        ValueError: If the file is not a valid FMU or does not contain a modelDescription.xml
+        Exception: For other errors during parsing
+    """
+    header = None
+    fmi_version = ""
+    depth = 0
+
+    with _open_modelDescription(Path(fmu_path), is_dir) as md_file:
+        try:
+            for event, elem in ET.iterparse(md_file, events=("start", "end")):
+                if event == "end":
+                    if depth == 2:
+                        elem.clear()
+                    depth -= 1
+                    continue
+
+                depth += 1
+                if depth == 1:
+                    fmi_version = _normalize_fmi_version(elem.get("fmiVersion", ""))
+                    header = ModelHeader(
+                        fmi_version=fmi_version,
+                        model_name=elem.get("modelName", ""),
+                        description=elem.get("description", ""),
+                        author=elem.get("author", ""),
+                        version=elem.get("version", ""),
+                    )
+                elif depth == 2 and header is not None:
+                    if elem.tag == "ModelVariables":
+                        break
+                    fmi_type = _INTERFACE_ELEMENTS.get(elem.tag)
+                    if fmi_type is None:
+                        continue
+                    model_id = elem.get("modelIdentifier", "")
+                    if model_id and (
+                        fmi_type != FmiType.SCHEDULED_EXECUTION or fmi_version == "3.0"
+                    ):
+                        header.interface_types.append(
+                            ModelInterfaceType(
+                                model_identifier=model_id, fmi_type=fmi_type
+                            )
+                        )
+        except ET.ParseError as e:
+            raise Exception(f"Error parsing modelDescription.xml: {e}")
+
+    if header is None:
+        raise Exception("Error parsing modelDescription.xml: no root element")
+    return header
+
+
+def read_model_variables(
+    fmu_path: Union[str, Path], is_dir: Optional[bool] = None
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Read the name and causality of every variable of an FMU.
+
+    Like read_model_counts, the modelDescription.xml is streamed and no
+    variable objects are created. Causalities follow ModelDescription:
+    'local' if not given, None if not a known causality.
+
+    Args:
+        fmu_path: Path to the FMU file
+        is_dir: Whether the FMU is an extracted directory, if already known
+
+    Returns:
+        Pairs of (name, causality) in document order
+
+    Raises:
+        FileNotFoundError: If the FMU file does not exist
+        ValueError: If the file is not a valid FMU, or a variable has no name
+        Exception: For other errors during parsing
+    """
+    variables: List[Tuple[str, Optional[str]]] = []
+    causalities = {c.value for c in VariableCausality}
+    fmi_version = ""
+    depth = 0
+    section = None
+
+    with _open_modelDescription(Path(fmu_path), is_dir) as md_file:
+        try:
+            for event, elem in ET.iterparse(md_file, events=("start", "end")):
+                if event == "end":
+                    if depth in (2, 3):
+                        elem.clear()
+                    depth -= 1
+                    if depth == 1 and section == "ModelVariables":
+                        break
+                    continue
+
+                depth += 1
+                if depth == 1:
+                    fmi_version = _normalize_fmi_version(elem.get("fmiVersion", ""))
+                elif depth == 2:
+                    section = elem.tag
+                elif depth == 3 and section == "ModelVariables":
+                    variable_tags = (
+                        ("ScalarVariable",)
+                        if fmi_version == "2.0"
+                        else FMI3_VARIABLE_TYPES
+                    )
+                    if elem.tag not in variable_tags:
+                        continue
+                    name = elem.get("name")
+                    if name is None:
+                        raise ValueError("Variable name is required but not found.")
+                    causality = elem.get("causality", "local")
+                    variables.append(
+                        (name, causality if causality in causalities else None)
+                    )
+        except ET.ParseError as e:
+            raise Exception(f"Error parsing modelDescription.xml: {e}")
+
+    return variables
@@ -0,0 +1,122 @@
+"""
+Heavy-first ordering of FMU tests.
+
+With ``--fmu-order heavy-first`` the FMUs of every parametrization, and the
+collected FMU test items, are sorted by estimated cost, most expensive first,
+so that pytest-xdist does not pick up the biggest FMUs last and leave a single
+worker running long after the others.
+
+The cost of an item is the duration recorded for it in the pytest cache by a
+previous run. Items without a recorded duration are estimated from the archive
+size and variable count of their FMU, scaled to seconds by the items that have
+both; if no item has both, unmeasured items follow the measured ones, by their
+estimate. The order only depends on the collected items and the cache content,
+so all xdist workers collect the same order.
+
+FMU items are sorted across all modules and classes, as ``--dist load`` hands
+them out in collection order; fixtures of module or class scope may then be set
+up more than once. ``--fmu-order-scoped`` only sorts within each module or
+class instead.
+
+Durations are recorded with the FMU of the item, and those of FMUs that no
+longer exist are dropped from the cache.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pytest_fmu_filter.session import FmuEntry, FmuSession
+
+# pytest cache key of the recorded item durations: node id -> [seconds, FMU path]
+DURATIONS_KEY = "fmu_filter/fmu_durations"
+
+# Archive bytes a model variable weighs as much as in the static estimate
+VARIABLE_COST = 4096
+
+
+def static_cost(entry: FmuEntry) -> float:
+    """
+    Estimate the test cost of an FMU from its archive size and variable count.
+
+    For extracted FMU directories the size of modelDescription.xml is used.
+    FMUs that cannot be read cost nothing, their tests fail fast.
+    """
+    try:
+        path = entry.path
+        if os.path.isdir(path):
+            path = os.path.join(path, "modelDescription.xml")
+        size = os.path.getsize(path)
+        n_variables = entry.counts().n_variables
+    except Exception:
+        return 0.0
+    return float(size + n_variables * VARIABLE_COST)
+
+
+def order_entries(entries: Iterable[FmuEntry]) -> List[FmuEntry]:
+    """Sort entries by static cost, highest first, ties by path."""
+    return sorted(entries, key=lambda entry: (-static_cost(entry), entry.path))
+
+
+def item_fmu(item) -> Optional[str]:
+    """Return the FMU path a test item is parametrized with, None for other items."""
+    callspec = getattr(item, "callspec", None)
+    if callspec is None:
+        return None
+    return callspec.params.get("fmu")
+
+
+def order_items(
+    items: List,
+    session: FmuSession,
+    durations: Dict[str, float],
+    scoped: bool = False,
+) -> None:
+    """
+    Reorder FMU test items in place by cost, highest first.
+
+    Only the positions held by FMU items are refilled; other items stay where
+    they are.
+
+    Args:
+        items: The collected items
+        session: The FMU session the items were generated from
+        durations: Recorded durations in seconds by node id
+        scoped: Refill the positions of each parent (module or class) with its
+            own FMU items only, instead of sorting across all of them
+    """
+    fmus: Dict[str, str] = {}
+    groups: Dict[Any, List[int]] = {}
+    for i, item in enumerate(items):
+        path = item_fmu(item)
+        if path is not None:
+            fmus[item.nodeid] = path
+            groups.setdefault(item.parent if scoped else None, []).append(i)
+
+    costs: Dict[str, float] = {}
+    for path in fmus.values():
+        if path not in costs:
+            entry = session.entries.get(path) or FmuEntry(path, models=session.models)
+            costs[path] = static_cost(entry)
+
+    # Seconds per static cost unit, from the items with both
+    measured = [nodeid for nodeid in fmus if nodeid in durations]
+    total_cost = sum(costs[fmus[nodeid]] for nodeid in measured)
+    scale = (
+        sum(durations[nodeid] for nodeid in measured) / total_cost
+        if total_cost
+        else 0.0
+    )
+
+    def key(item) -> Tuple[int, float, str]:
+        # Seconds where known or scaled, otherwise estimates after the measured
+        if item.nodeid in durations:
+            return 0, -durations[item.nodeid], item.nodeid
+        static = costs[fmus[item.nodeid]]
+        if scale:
+            return 0, -static * scale, item.nodeid
+        return 1, -static, item.nodeid
+
+    for positions in groups.values():
+        group = sorted((items[i] for i in positions), key=key)
+        for i, item in zip(positions, group):
+            items[i] = item
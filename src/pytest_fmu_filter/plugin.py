@@ -1,8 +1,73 @@
-import pathlib
+"""
+Pytest entry point of the plugin.
+
+This module is imported by every pytest process through the ``pytest11`` entry
+point, so it only registers options and the marker. The modelDescription parser
+and the filter engine live in :mod:`pytest_fmu_filter.engine` and are imported
+on demand, once FMUs have been given.
+"""
+
+import ast
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Union
 
 import pytest
 
-from pytest_fmu_filter.md import ModelDescription, read_modelDescription
+from pytest_fmu_filter.sizes import parse_size
+
+if TYPE_CHECKING:
+    from pytest_fmu_filter.session import FmuSession
+
+# The FMU session of a pytest run, created on first use by the engine
+session_key = pytest.StashKey["FmuSession"]()
+
+
+def parse_sample(value: str) -> Union[int, float]:
+    """
+    Parse a sample size: a count such as '50', or a fraction such as '0.1' or '10%'.
+
+    Raises:
+        ValueError: If the sample size is not positive
+    """
+    if value.endswith("%"):
+        sample: Union[int, float] = float(value[:-1]) / 100
+    elif "." in value:
+        sample = float(value)
+    else:
+        sample = int(value)
+    if sample <= 0 or (isinstance(sample, float) and sample > 1):
+        raise ValueError(f"Invalid sample size: {value}")
+    return sample
+
+
+def parse_select(items: List[str]) -> Dict[str, Any]:
+    """
+    Parse ``KEY=VALUE`` filters of ``--fmu-select`` and the ``fmu_select`` ini option.
+
+    Values are Python literals (``True``, ``3``, ``['u', 'v']``); anything else
+    is taken as a string, e.g. ``name_matches=Robot.*``.
+
+    Raises:
+        pytest.UsageError: If an item is not of the form KEY=VALUE
+    """
+    filters = {}
+    for item in items:
+        key, sep, text = item.partition("=")
+        key = key.strip()
+        if not sep or not key:
+            raise pytest.UsageError(f"--fmu-select expects KEY=VALUE, got: {item}")
+        try:
+            filters[key] = ast.literal_eval(text.strip())
+        except (ValueError, SyntaxError):
+            filters[key] = text.strip()
+    return filters
+
+
+def get_select(config) -> Dict[str, Any]:
+    """Return the session-wide filters, command line entries overriding ini ones."""
+    return parse_select(
+        config.getini("fmu_select") + (config.getoption("fmu_select") or [])
+    )
 
 
 def pytest_addoption(parser):
@@ -12,15 +77,123 @@ def pytest_addoption(parser):
         help="FMU paths",
         nargs="+",
     )
+    group.addoption(
+        "--fmu-dir",
+        help="Directories or glob patterns to search recursively for FMUs",
+        nargs="+",
+        metavar="DIR",
+    )
+    group.addoption(
+        "--fmu-catalog",
+        help="FMU catalog built with 'fmu-filter-catalog build'",
+        metavar="PATH",
+    )
+    group.addoption(
+        "--fmu-daemon",
+        help="Socket of a running fmu-filter-daemon (default: the per-user socket, "
+        "used when reachable)",
+        metavar="SOCKET",
+    )
+    group.addoption(
+        "--no-fmu-daemon",
+        action="store_true",
+        help="Never use fmu-filter-daemon, always parse FMUs in-process",
+    )
+    group.addoption(
+        "--fmu-shared-cache",
+        help="Directory of a summary cache shared by concurrent pytest jobs on this host",
+        metavar="DIR",
+    )
+    group.addoption(
+        "--fmu-shared-cache-size",
+        help="Size limit of the shared cache, e.g. 256M (default: 512M); "
+        "least recently used summaries are deleted",
+        type=parse_size,
+        default=512 * 1024**2,
+        metavar="SIZE",
+    )
+    group.addoption(
+        "--fmu-select",
+        help="Session-wide fmu_filter criteria applied once before the per-test markers, "
+        "e.g. --fmu-select fmi_major_version=3 is_cs=True",
+        action="extend",
+        nargs="+",
+        metavar="KEY=VALUE",
+    )
+    parser.addini(
+        "fmu_select",
+        help="Session-wide fmu_filter criteria, one KEY=VALUE per line",
+        type="linelist",
+        default=[],
+    )
+    group.addoption(
+        "--fmu-sample",
+        help="Run against a stratified sample of the FMUs: a count (e.g. 50) "
+        "or a fraction (e.g. 0.1 or 10%%); every kind of FMU keeps at least one",
+        type=parse_sample,
+        metavar="N",
+    )
+    group.addoption(
+        "--fmu-sample-seed",
+        help="Seed of the FMU sample (default: 0)",
+        type=int,
+        default=0,
+        metavar="SEED",
+    )
+    group.addoption(
+        "--fmu-order",
+        help="Order of the FMU tests: as given (default), or heavy-first by recorded "
+        "durations or estimated cost, to balance pytest-xdist workers",
+        choices=("given", "heavy-first"),
+        default="given",
+    )
+    group.addoption(
+        "--fmu-order-scoped",
+        action="store_true",
+        help="With --fmu-order heavy-first, only reorder FMU tests within their module "
+        "or class, so fixtures of those scopes are set up once",
+    )
+    group.addoption(
+        "--fmu-watch",
+        action="store_true",
+        help="Keep running after the tests and re-run the tests of FMUs that change",
+    )
+    group.addoption(
+        "--fmu-watch-interval",
+        help="Seconds between stat polls of the FMUs in watch mode (default: 1)",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+    )
+    group.addoption(
+        "--fmu-usage",
+        action="store_true",
+        help="Report wall time, CPU time and peak RSS of the tests per FMU",
+    )
+    group.addoption(
+        "--fmu-report",
+        help="Write the per-FMU usage with model metadata to PATH, as CSV if it ends "
+        "in .csv and as JSON otherwise (implies --fmu-usage)",
+        metavar="PATH",
+    )
+    group.addoption(
+        "--fmu-memory-budget",
+        help="Memory budget for parsed model descriptions, e.g. 512M "
+        "(least recently used ones are evicted and parsed again on demand)",
+        type=parse_size,
+        metavar="SIZE",
+    )
 
 
 def pytest_generate_tests(metafunc):
     """
     Generate tests based on the FMUs in the specified directory.
     """
-    # Get commandline option for FMU paths
+    # Get commandline options for FMU paths
     fmus = metafunc.config.getoption("fmus")
-    if fmus is None:
+    fmu_dir = metafunc.config.getoption("fmu_dir")
+    fmu_catalog = metafunc.config.getoption("fmu_catalog")
+    if fmus is None and fmu_dir is None and fmu_catalog is None:
         # If no FMU paths are provided, skip the test generation
         return
 
@@ -30,116 +203,142 @@ def pytest_generate_tests(metafunc):
         # If no fmu_filter marker is defined, skip the test generation
         return
 
-    # Load and filter FMUs
-    filtered_fmus = []
-    for fmu_path in fmus:
-        try:
-            # Read the modelDescription.xml from the FMU
-            md = read_modelDescription(fmu_path)
-
-            # apply the filters
-            if _apply_filters(md, fmu_filter.kwargs):
-                # If the model passes all filters, add it to the filtered list
-                filtered_fmus.append(fmu_path)
-
-        except Exception as e:
-            # If there's an error reading the FMU, log it and skip this FMU
-            metafunc.config.hook.pytest_warning_recorded(
-                warning_message=f"Error reading FMU {fmu_path}: {e}",
-                when="setup",
+    # Deferred import: the parser is only needed once FMUs are given
+    from pytest_fmu_filter.engine import generate_tests
+
+    generate_tests(metafunc, fmu_filter)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "fmu_filter: Filter FMUs based on specific criteria.",  # avoid warning about unknown markers
+    )
+    select = get_select(config)
+    if select:
+        from pytest_fmu_filter.engine import FILTER_KEYS
+
+        for key in select:
+            if key not in FILTER_KEYS or key == "custom":
+                raise pytest.UsageError(f"--fmu-select: unknown filter key: {key}")
+    fmu_dirs = config.getoption("fmu_dir")
+    if fmu_dirs:
+        from pytest_fmu_filter.discovery import missing_roots
+
+        missing = missing_roots(fmu_dirs)
+        if missing:
+            raise pytest.UsageError(f"--fmu-dir: not found: {', '.join(missing)}")
+    if config.getoption("fmu_order") == "heavy-first":
+        config.pluginmanager.register(DurationRecorder(config), "fmu-duration-recorder")
+    if config.getoption("fmu_watch"):
+        if not any(
+            config.getoption(name) for name in ("fmus", "fmu_dir", "fmu_catalog")
+        ):
+            raise pytest.UsageError(
+                "--fmu-watch needs --fmus, --fmu-dir or --fmu-catalog"
             )
+        if getattr(config.option, "numprocesses", None):
+            raise pytest.UsageError("--fmu-watch cannot be combined with pytest-xdist")
 
-    # Parametrize the test function with the filtered FMUs
-    if filtered_fmus:
-        metafunc.parametrize(
-            "fmu",
-            filtered_fmus,
-            ids=[str(pathlib.Path(m).resolve()) for m in filtered_fmus],
-        )
-    else:
-        # If no FMUs match the filter, skip the test
-        pytest.skip("No FMUs match the specified filters")
+        from pytest_fmu_filter.watch import FmuWatch
 
+        config.pluginmanager.register(FmuWatch(config), "fmu-watch")
+    if config.getoption("fmu_usage") or config.getoption("fmu_report"):
+        from pytest_fmu_filter.resources import ResourceRecorder
 
-def _apply_filters(model_description: ModelDescription, filter_kwargs):
-    """
-    Apply filters to a model description.
+        config.pluginmanager.register(ResourceRecorder(config), "fmu-resource-recorder")
+
+
+def pytest_collection_modifyitems(session, config, items):
+    fmu_session = config.stash.get(session_key, None)
+    if fmu_session is None or config.getoption("fmu_order") != "heavy-first":
+        return
+
+    from pytest_fmu_filter.ordering import DURATIONS_KEY, order_items
 
-    Args:
-        model_description: ModelDescription object
-        filter_kwargs: Filter criteria from the fmu_filter marker
+    recorded = config.cache.get(DURATIONS_KEY, {}) if config.cache is not None else {}
+    durations = {nodeid: seconds for nodeid, (seconds, _) in recorded.items()}
+    order_items(items, fmu_session, durations, config.getoption("fmu_order_scoped"))
 
-    Returns:
-        bool: True if the model passes all filters, False otherwise
+
+class DurationRecorder:
     """
-    if model_description is None:
-        return False
-
-    # If any filter is failed, return False
-    for key, value in filter_kwargs.items():
-        if key == "is_me":
-            if value and not model_description.is_me():
-                return False
-            elif value is False and model_description.is_me():
-                return False
-        elif key == "is_cs":
-            if value and not model_description.is_cs():
-                return False
-            elif value is False and model_description.is_cs():
-                return False
-        elif key == "is_se":
-            if value and not model_description.is_se():
-                return False
-            elif value is False and model_description.is_se():
-                return False
-        elif key == "with_inputs":
-            if not model_description.with_inputs(value):
-                return False
-        elif key == "with_outputs":
-            if not model_description.with_outputs(value):
-                return False
-        elif key == "name_matches":
-            if not model_description.name_matches(value):
-                return False
-        elif key == "custom" and callable(value):
-            if not value(model_description):
-                return False
-        elif key == "has_input":
-            if value and not model_description.has_input():
-                return False
-            elif value is False and model_description.has_input():
-                return False
-        elif key == "has_output":
-            if value and not model_description.has_output():
-                return False
-            elif value is False and model_description.has_output():
-                return False
-        elif key == "has_parameter":
-            if value and not model_description.has_parameter():
-                return False
-            elif value is False and model_description.has_parameter():
-                return False
-        elif key == "with_variables":
-            if not model_description.with_variables(value):
-                return False
-        elif key == "with_parameters":
-            if not model_description.with_parameters(value):
-                return False
-        elif key == "fmi_major_version":
-            if not model_description.fmi_version.startswith(str(value)):
-                return False
-        elif key == "fmi_version":
-            if model_description.fmi_version != value:
-                return False
-        else:
-            raise ValueError(f"Unknown filter key: {key}")
-
-    # If all filters passed, return True
-    return True
+    Records the duration of every FMU test item for ``--fmu-order heavy-first``.
 
+    The FMU of an item travels with its reports, so reports of xdist workers
+    reach the controller with it, which alone writes the durations to the
+    pytest cache at the end of the run. Recorded durations of FMUs that no
+    longer exist are dropped then.
+    """
 
-def pytest_configure(config):
-    config.addinivalue_line(
-        "markers",
-        "fmu_filter: Filter FMUs based on specific criteria.",  # avoid warning about unknown markers
-    )
+    def __init__(self, config):
+        self.config = config
+        self.durations: Dict[str, List[Any]] = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item):
+        outcome = yield
+        from pytest_fmu_filter.ordering import item_fmu
+
+        fmu = item_fmu(item)
+        if fmu is not None:
+            outcome.get_result().fmu = fmu
+
+    def pytest_runtest_logreport(self, report):
+        fmu = getattr(report, "fmu", None)
+        if fmu is None:
+            return
+        seconds, _ = self.durations.get(report.nodeid, (0.0, fmu))
+        self.durations[report.nodeid] = [seconds + report.duration, fmu]
+
+    def pytest_sessionfinish(self):
+        cache = self.config.cache
+        if not self.durations or hasattr(self.config, "workerinput") or cache is None:
+            return
+
+        from pytest_fmu_filter.ordering import DURATIONS_KEY
+
+        recorded = cache.get(DURATIONS_KEY, {})
+        recorded.update(self.durations)
+        cache.set(
+            DURATIONS_KEY,
+            {
+                nodeid: [seconds, fmu]
+                for nodeid, (seconds, fmu) in recorded.items()
+                if os.path.exists(fmu)
+            },
+        )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    session = config.stash.get(session_key, None)
+    if session is None:
+        return
+
+    if session.select_info is not None:
+        kept, population = session.select_info
+        terminalreporter.write_sep("-", "fmu select")
+        terminalreporter.write_line(f"{kept} of {population} FMUs selected")
+
+    if session.sample_info is not None:
+        sampled, population, n_strata = session.sample_info
+        terminalreporter.write_sep("-", "fmu sample")
+        terminalreporter.write_line(
+            f"{sampled} of {population} FMUs from {n_strata} strata "
+            f"(seed {config.getoption('fmu_sample_seed')})"
+        )
+
+    if session.shared is not None:
+        terminalreporter.write_sep("-", "fmu shared cache")
+        terminalreporter.write_line(
+            f"{session.shared.hits} read from {session.shared.directory}, "
+            f"{session.shared.misses} parsed"
+        )
+
+    if config.getoption("fmu_memory_budget") is not None:
+        models = session.models
+        terminalreporter.write_sep("-", "fmu model cache")
+        terminalreporter.write_line(
+            f"{models.loads} loaded, {models.evictions} evicted, {models.reloads} reloaded; "
+            f"peak {models.peak / 1024**2:.1f} MiB of {models.budget / 1024**2:.1f} MiB budget"
+        )
@@ -0,0 +1,495 @@
+"""
+Declarative filter expressions for the ``where`` key of ``fmu_filter``.
+
+An expression combines comparisons on summary fields with ``and``, ``or``,
+``not`` and parentheses::
+
+    @pytest.mark.fmu_filter(where="is_cs and n_outputs > 10 and author ~ 'Acme' and fmi_version >= 3")
+
+Bare boolean fields are truth tests, ``~`` is a regex search and the other
+operators are ``==``, ``!=``, ``<``, ``<=``, ``>`` and ``>=``.
+
+Expressions are compiled once into a :class:`Query`. Over a whole FMU set the
+query is answered by :class:`FmuIndex`, which keeps per-field indexes (bitmaps
+for boolean fields, sorted arrays for numbers and inverted indexes for text)
+so a selective predicate only touches the matching FMUs.
+"""
+
+import functools
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pytest_fmu_filter.summary import FmuSummary
+
+# Queryable fields: name -> (kind, getter)
+FIELDS: Dict[str, Tuple[str, Callable[[FmuSummary], Any]]] = {
+    "model_name": ("text", lambda s: s.model_name),
+    "description": ("text", lambda s: s.description),
+    "author": ("text", lambda s: s.author),
+    "version": ("text", lambda s: s.version),
+    "fmi_version": ("number", lambda s: float(s.fmi_version)),
+    "fmi_major_version": ("number", lambda s: int(s.fmi_version.split(".")[0])),
+    "is_me": ("bool", FmuSummary.is_me),
+    "is_cs": ("bool", FmuSummary.is_cs),
+    "is_se": ("bool", FmuSummary.is_se),
+    "has_input": ("bool", FmuSummary.has_input),
+    "has_output": ("bool", FmuSummary.has_output),
+    "has_parameter": ("bool", FmuSummary.has_parameter),
+    "has_array_variables": ("bool", FmuSummary.has_array_variables),
+    "has_sources": ("bool", FmuSummary.has_sources),
+    "n_variables": ("number", lambda s: s.n_variables),
+    "n_inputs": ("number", lambda s: s.n_inputs),
+    "n_outputs": ("number", lambda s: s.n_outputs),
+    "n_parameters": ("number", lambda s: s.n_parameters),
+    "n_states": ("number", lambda s: s.n_states),
+    "n_event_indicators": ("number", lambda s: s.n_event_indicators),
+}
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+        |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+        |(?P<op>==|!=|<=|>=|<|>|~|\(|\))
+        |(?P<name>[A-Za-z_]\w*)
+    )""",
+    re.VERBOSE,
+)
+
+_KEYWORDS = {"and", "or", "not", "true", "false"}
+
+
+def _tokenize(expression: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if match is None or match.lastgroup is None:
+            raise ValueError(
+                f"Invalid filter expression {expression!r} at position {pos}"
+            )
+        pos = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "number":
+            tokens.append(
+                (
+                    "literal",
+                    float(text) if "." in text or "e" in text.lower() else int(text),
+                )
+            )
+        elif kind == "string":
+            tokens.append(("literal", re.sub(r"\\(.)", r"\1", text[1:-1])))
+        elif kind == "name" and text in ("true", "false"):
+            tokens.append(("literal", text == "true"))
+        elif kind == "name" and text in _KEYWORDS:
+            tokens.append((text, text))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+
+@dataclass(frozen=True)
+class Compare:
+    """Comparison of a field with a literal; ``op`` None is a truth test."""
+
+    field: str
+    op: Optional[str] = None
+    value: Any = None
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    operands: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    operands: Tuple["Node", ...]
+
+
+Node = Union[Compare, Not, And, Or]
+
+
+class _Parser:
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f"Invalid filter expression {self.expression!r}: {message}")
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self, kind: str) -> Any:
+        if self.peek() != kind:
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end"
+            raise self.error(f"expected {kind}, found {found!r}")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise self.error(f"unexpected {self.tokens[self.pos][1]!r}")
+        return node
+
+    def parse_or(self) -> Node:
+        operands = [self.parse_and()]
+        while self.peek() == "or":
+            self.pos += 1
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def parse_and(self) -> Node:
+        operands = [self.parse_not()]
+        while self.peek() == "and":
+            self.pos += 1
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def parse_not(self) -> Node:
+        if self.peek() == "not":
+            self.pos += 1
+            return Not(self.parse_not())
+        if self.peek() == "op" and self.tokens[self.pos][1] == "(":
+            self.pos += 1
+            node = self.parse_or()
+            if self.take("op") != ")":
+                raise self.error("expected ')'")
+            return node
+        return self.parse_compare()
+
+    def parse_compare(self) -> Node:
+        field = self.take("name")
+        if field not in FIELDS:
+            raise self.error(
+                f"unknown field {field!r}, expected one of {', '.join(FIELDS)}"
+            )
+        kind = FIELDS[field][0]
+        if self.peek() != "op" or self.tokens[self.pos][1] in "()":
+            if kind != "bool":
+                raise self.error(f"field {field!r} needs a comparison")
+            return Compare(field)
+
+        op = self.take("op")
+        value = self.take("literal")
+        if op == "~":
+            if kind != "text":
+                raise self.error(f"'~' needs a text field, got {field!r}")
+            try:
+                value = re.compile(str(value))
+            except re.error as e:
+                raise self.error(f"invalid regex {value!r}: {e}")
+        elif kind == "number":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise self.error(f"field {field!r} needs a number, got {value!r}")
+        elif kind == "bool" and (op not in ("==", "!=") or not isinstance(value, bool)):
+            raise self.error(f"field {field!r} can only be compared with true/false")
+        elif kind == "text":
+            value = str(value)
+        return Compare(field, op, value)
+
+
+def _compare(actual: Any, op: str, value: Any) -> bool:
+    if actual is None:
+        return op == "!="
+    if op == "~":
+        return value.search(actual) is not None
+    if op == "==":
+        return actual == value
+    if op == "!=":
+        return actual != value
+    if op == "<":
+        return actual < value
+    if op == "<=":
+        return actual <= value
+    if op == ">":
+        return actual > value
+    return actual >= value
+
+
+def _ids(bitmap: int) -> List[int]:
+    ids = []
+    while bitmap:
+        low = bitmap & -bitmap
+        ids.append(low.bit_length() - 1)
+        bitmap ^= low
+    return ids
+
+
+def _clear(postings: Dict[Any, int], key: Any, bit: int) -> None:
+    """Clear a bit in the posting of a key, dropping empty postings."""
+    postings[key] &= ~bit
+    if not postings[key]:
+        del postings[key]
+
+
+def _bits(ids) -> int:
+    bitmap = 0
+    for i in ids:
+        bitmap |= 1 << i
+    return bitmap
+
+
+class FmuIndex:
+    """
+    Per-field indexes over a list of FMU summaries.
+
+    FMU sets are bitmaps (Python ints) over the positions of the summaries.
+    Positions without a summary (unreadable FMUs) are in no set. Indexes are
+    built on first use of a field and updated in place by :meth:`replace`.
+    """
+
+    def __init__(self, summaries: Sequence[Optional[FmuSummary]]):
+        self.summaries = list(summaries)
+        self.all = _bits(i for i, s in enumerate(self.summaries) if s is not None)
+        self._bool: Dict[str, int] = {}
+        self._number: Dict[str, Tuple[List[float], List[int]]] = {}
+        self._text: Dict[str, Dict[Any, int]] = {}
+
+    def ids(self, bitmap: int) -> List[int]:
+        """Return the positions set in a bitmap, in ascending order."""
+        return _ids(bitmap)
+
+    def _bool_index(self, field: str) -> int:
+        if field not in self._bool:
+            getter = FIELDS[field][1]
+            self._bool[field] = _bits(
+                i for i, s in enumerate(self.summaries) if s is not None and getter(s)
+            )
+        return self._bool[field]
+
+    def _number_index(self, field: str) -> Tuple[List[float], List[int]]:
+        if field not in self._number:
+            getter = FIELDS[field][1]
+            pairs = sorted(
+                (getter(s), i) for i, s in enumerate(self.summaries) if s is not None
+            )
+            self._number[field] = ([v for v, _ in pairs], [i for _, i in pairs])
+        return self._number[field]
+
+    def _text_index(self, field: str) -> Dict[Any, int]:
+        if field not in self._text:
+            getter = FIELDS[field][1]
+            postings: Dict[Any, int] = {}
+            for i, s in enumerate(self.summaries):
+                if s is not None:
+                    value = getter(s)
+                    postings[value] = postings.get(value, 0) | (1 << i)
+            self._text[field] = postings
+        return self._text[field]
+
+    def replace(self, i: int, summary: Optional[FmuSummary]) -> None:
+        """
+        Replace the summary at a position, updating the built field indexes.
+
+        Args:
+            i: Position of the FMU
+            summary: Its new summary, None if it cannot be read
+        """
+        old = self.summaries[i]
+        self.summaries[i] = summary
+        bit = 1 << i
+        self.all &= ~bit
+        if summary is not None:
+            self.all |= bit
+        for field in self._bool:
+            self._bool[field] &= ~bit
+            if summary is not None and FIELDS[field][1](summary):
+                self._bool[field] |= bit
+        for field, (values, ids) in self._number.items():
+            if old is not None:
+                j = ids.index(i)
+                del values[j], ids[j]
+            if summary is not None:
+                value = FIELDS[field][1](summary)
+                j = bisect_right(values, value)
+                values.insert(j, value)
+                ids.insert(j, i)
+        for field, postings in self._text.items():
+            getter = FIELDS[field][1]
+            if old is not None:
+                _clear(postings, getter(old), bit)
+            if summary is not None:
+                value = getter(summary)
+                postings[value] = postings.get(value, 0) | bit
+
+    def lookup(self, node: Compare) -> int:
+        """Return the bitmap of FMUs satisfying a single comparison."""
+        kind = FIELDS[node.field][0]
+        if kind == "bool":
+            bitmap = self._bool_index(node.field)
+            if node.op is None or (node.op == "==") == node.value:
+                return bitmap
+            return self.all & ~bitmap
+
+        if kind == "number":
+            values, ids = self._number_index(node.field)
+            lo, hi = bisect_left(values, node.value), bisect_right(values, node.value)
+            if node.op == "==":
+                return _bits(ids[lo:hi])
+            if node.op == "!=":
+                return self.all & ~_bits(ids[lo:hi])
+            if node.op == "<":
+                return _bits(ids[:lo])
+            if node.op == "<=":
+                return _bits(ids[:hi])
+            if node.op == ">":
+                return _bits(ids[hi:])
+            return _bits(ids[lo:])
+
+        # Text: compare each distinct value once; truth tests are bool-only
+        assert node.op is not None
+        bitmap = 0
+        for value, postings in self._text_index(node.field).items():
+            if _compare(value, node.op, node.value):
+                bitmap |= postings
+        return bitmap
+
+
+class NameIndex:
+    """
+    Inverted index from names to the FMUs declaring them.
+
+    Like FmuIndex, FMU sets are bitmaps over the positions of the FMUs. Names
+    are added as (name, qualifier) pairs, e.g. variable names with their
+    causality or terminal names with their kind. Every name has a posting for
+    any qualifier and one per qualifier, so the ``with_variables``/
+    ``with_inputs``/... keys over a whole FMU set are unions and intersections
+    of bitmaps.
+    """
+
+    def __init__(self, names: Iterable[Iterable[Tuple[str, Optional[str]]]] = ()):
+        self._names: Dict[str, int] = {}
+        self._qualified: Dict[Tuple[str, Optional[str]], int] = {}
+        self.all = 0
+        for fmu_names in names:
+            self.add(fmu_names)
+
+    def add(
+        self, names: Iterable[Tuple[str, Optional[str]]], i: Optional[int] = None
+    ) -> int:
+        """
+        Add the names of an FMU and return its position.
+
+        Args:
+            names: (name, qualifier) pairs of the FMU
+            i: Position of the FMU, by default the one after the last added
+        """
+        if i is None:
+            i = self.all.bit_length()
+        bit = 1 << i
+        for name, qualifier in names:
+            self._names[name] = self._names.get(name, 0) | bit
+            key = (name, qualifier)
+            self._qualified[key] = self._qualified.get(key, 0) | bit
+        self.all |= bit
+        return i
+
+    def remove(self, i: int) -> None:
+        """Remove the names of the FMU at a position."""
+        bit = 1 << i
+        for name in [name for name, bitmap in self._names.items() if bitmap & bit]:
+            _clear(self._names, name, bit)
+        for key in [key for key, bitmap in self._qualified.items() if bitmap & bit]:
+            _clear(self._qualified, key, bit)
+        self.all &= ~bit
+
+    def ids(self, bitmap: int) -> List[int]:
+        """Return the positions set in a bitmap, in ascending order."""
+        return _ids(bitmap)
+
+    def lookup(
+        self, names: Union[str, Iterable[str]], qualifier: Optional[str] = None
+    ) -> int:
+        """
+        Return the bitmap of FMUs declaring any of the names.
+
+        Args:
+            names: Name or names
+            qualifier: Only count names with this qualifier, e.g. a causality
+        """
+        if isinstance(names, str):
+            names = [names]
+        bitmap = 0
+        for name in names:
+            if qualifier is None:
+                bitmap |= self._names.get(name, 0)
+            else:
+                bitmap |= self._qualified.get((name, qualifier), 0)
+        return bitmap
+
+
+class Query:
+    """
+    A compiled filter expression.
+
+    Attributes:
+        expression: The source expression
+        root: The parsed expression tree
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.root = _Parser(expression).parse()
+
+    def matches(self, summary: FmuSummary) -> bool:
+        """Evaluate the expression for a single FMU."""
+        return self._matches(self.root, summary)
+
+    def _matches(self, node: Node, summary: FmuSummary) -> bool:
+        if isinstance(node, And):
+            return all(self._matches(n, summary) for n in node.operands)
+        if isinstance(node, Or):
+            return any(self._matches(n, summary) for n in node.operands)
+        if isinstance(node, Not):
+            return not self._matches(node.operand, summary)
+        actual = FIELDS[node.field][1](summary)
+        if node.op is None:
+            return bool(actual)
+        return _compare(actual, node.op, node.value)
+
+    def select(self, index: FmuIndex) -> int:
+        """Evaluate the expression over an index and return the matching bitmap."""
+        return self._select(self.root, index, index.all)
+
+    def _select(self, node: Node, index: FmuIndex, candidates: int) -> int:
+        # Operands of 'and' narrow the candidates of the following ones, and
+        # evaluation stops as soon as no candidate is left
+        if isinstance(node, And):
+            for operand in node.operands:
+                candidates = self._select(operand, index, candidates)
+                if not candidates:
+                    break
+            return candidates
+        if isinstance(node, Or):
+            bitmap = 0
+            for operand in node.operands:
+                bitmap |= self._select(operand, index, candidates & ~bitmap)
+            return bitmap
+        if isinstance(node, Not):
+            return candidates & ~self._select(node.operand, index, candidates)
+        return candidates & index.lookup(node)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_query(expression: str) -> Query:
+    """
+    Compile a filter expression, reusing earlier compilations.
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+    return Query(expression)
@@ -0,0 +1,238 @@
+"""
+Per-FMU resource accounting of the test phase.
+
+With ``--fmu-usage`` (or ``--fmu-report PATH``) the wall time, CPU time and
+peak resident set size of every test item parametrized with an FMU are
+recorded and added up per FMU, together with the outcomes of its items. The
+terminal summary lists the most expensive FMUs; ``--fmu-report`` writes all
+of them as JSON, or as CSV if the path ends in ``.csv``. Both are joined with
+the model metadata of the FMU (FMI version, interface types, variable
+counts), to show which model properties drive the test cost.
+
+Peak RSS is the high-water mark of the process (``getrusage``), which only
+ever grows: ``max_rss`` is the mark once the items of an FMU finished and
+``rss_growth`` how much its items raised it. It is not available on Windows.
+
+Under pytest-xdist each worker measures its own items and sends the numbers
+with the test reports (``user_properties``), and the controller adds them up.
+"""
+
+import csv
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from pytest_fmu_filter.ordering import item_fmu
+from pytest_fmu_filter.query import FIELDS
+from pytest_fmu_filter.session import FmuEntry, get_session
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+# Name of the user property carrying the usage of an item from xdist workers
+USAGE_PROPERTY = "fmu_usage"
+
+# Model fields joined to the usage of every FMU, besides the FMI version
+METADATA_FIELDS = (
+    "model_name",
+    "is_me",
+    "is_cs",
+    "is_se",
+    "n_variables",
+    "n_inputs",
+    "n_outputs",
+    "n_parameters",
+    "n_states",
+    "n_event_indicators",
+)
+
+# FMUs listed in the terminal summary, all of them with -v
+SUMMARY_ROWS = 10
+
+
+def max_rss() -> Optional[int]:
+    """Return the peak resident set size of this process in bytes, None if unknown."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@dataclass
+class FmuUsage:
+    """
+    Resources used by the test items of one FMU.
+
+    Attributes:
+        path: The FMU path the items are parametrized with
+        tests: Number of items
+        passed: Items that passed
+        failed: Items that failed in any phase
+        skipped: Items that were skipped (or xfailed)
+        wall_time: Wall time of setup, call and teardown in seconds
+        cpu_time: CPU time of the process during the items in seconds
+        max_rss: Peak RSS of the process after the items in bytes
+        rss_growth: Increase of the peak RSS during the items in bytes
+    """
+
+    path: str
+    tests: int = 0
+    passed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    max_rss: Optional[int] = None
+    rss_growth: Optional[int] = None
+
+    def add(self, outcome: str, usage: Dict[str, Any]) -> None:
+        """Add one item with its outcome and the usage measured for it."""
+        self.tests += 1
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        self.wall_time += usage["wall_time"]
+        self.cpu_time += usage["cpu_time"]
+        if usage["max_rss"] is not None:
+            self.max_rss = max(self.max_rss or 0, usage["max_rss"])
+            self.rss_growth = (self.rss_growth or 0) + usage["rss_growth"]
+
+
+def metadata(entry: FmuEntry) -> Dict[str, Any]:
+    """Return the model metadata joined to the usage of an FMU, empty if unreadable."""
+    try:
+        summary = entry.summary()
+    except Exception:
+        return {}
+    return {
+        "fmi_version": summary.fmi_version,
+        **{field: FIELDS[field][1](summary) for field in METADATA_FIELDS},
+    }
+
+
+class ResourceRecorder:
+    """Plugin measuring the FMU test items and reporting the usage per FMU."""
+
+    def __init__(self, config):
+        self.config = config
+        self.usages: Dict[str, FmuUsage] = {}
+        self._start: Dict[str, tuple] = {}
+        self._local: Dict[str, Dict[str, Any]] = {}
+        self._outcomes: Dict[str, str] = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item):
+        if item_fmu(item) is not None:
+            self._start[item.nodeid] = (
+                time.perf_counter(),
+                time.process_time(),
+                max_rss(),
+            )
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        start = self._start.get(item.nodeid)
+        if call.when == "teardown" and start is not None:
+            del self._start[item.nodeid]
+            wall, cpu, rss = start
+            end_rss = max_rss()
+            usage = {
+                "fmu": item_fmu(item),
+                "wall_time": time.perf_counter() - wall,
+                "cpu_time": time.process_time() - cpu,
+                "max_rss": end_rss,
+                "rss_growth": end_rss - rss if end_rss is not None else None,
+            }
+            if hasattr(self.config, "workerinput"):
+                # Copied into the teardown report, which reaches the controller
+                item.user_properties.append((USAGE_PROPERTY, usage))
+            else:
+                self._local[item.nodeid] = usage
+        yield
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed:
+            self._outcomes[report.nodeid] = "failed"
+        elif report.skipped and report.nodeid not in self._outcomes:
+            self._outcomes[report.nodeid] = "skipped"
+        if report.when != "teardown":
+            return
+
+        outcome = self._outcomes.pop(report.nodeid, "passed")
+        usage = self._local.pop(report.nodeid, None) or dict(
+            report.user_properties
+        ).get(USAGE_PROPERTY)
+        if usage is not None:
+            if usage["fmu"] not in self.usages:
+                self.usages[usage["fmu"]] = FmuUsage(usage["fmu"])
+            self.usages[usage["fmu"]].add(outcome, usage)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Return the usage of every FMU joined with its metadata, by wall time."""
+        session = get_session(self.config)
+        rows = []
+        for usage in sorted(self.usages.values(), key=lambda u: (-u.wall_time, u.path)):
+            entry = session.entries.get(usage.path) or FmuEntry(
+                usage.path, models=session.models
+            )
+            rows.append({**asdict(usage), **metadata(entry)})
+        return rows
+
+    def pytest_sessionfinish(self):
+        path = self.config.getoption("fmu_report")
+        if path is None or hasattr(self.config, "workerinput"):
+            return
+        write_report(path, self.rows())
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if hasattr(self.config, "workerinput") or not self.usages:
+            return
+        rows = self.rows()
+        shown = rows if self.config.getoption("verbose") > 0 else rows[:SUMMARY_ROWS]
+        terminalreporter.write_sep("-", "fmu usage")
+        terminalreporter.write_line(
+            f"{'wall s':>8} {'cpu s':>8} {'rss MiB':>8} {'+MiB':>7} "
+            f"{'tests':>5} {'fail':>4} {'vars':>6} {'fmi':>3}  model"
+        )
+        for row in shown:
+            terminalreporter.write_line(
+                f"{row['wall_time']:8.2f} {row['cpu_time']:8.2f} "
+                f"{_mib(row['max_rss'], 8)} {_mib(row['rss_growth'], 7)} "
+                f"{row['tests']:5d} {row['failed']:4d} {row.get('n_variables', '-'):>6} "
+                f"{row.get('fmi_version', '-'):>3}  {row.get('model_name') or row['path']}"
+            )
+        if len(shown) < len(rows):
+            terminalreporter.write_line(
+                f"... {len(rows) - len(shown)} more FMUs (-v shows all)"
+            )
+
+
+def _mib(size: Optional[int], width: int) -> str:
+    return f"{size / 1024**2:{width}.1f}" if size is not None else "-".rjust(width)
+
+
+def write_report(path: str, rows: List[Dict[str, Any]]) -> None:
+    """
+    Write the usage report, as CSV if the path ends in '.csv' and as JSON otherwise.
+
+    Args:
+        path: Path of the report file
+        rows: Rows of :meth:`ResourceRecorder.rows`
+    """
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if not path.lower().endswith(".csv"):
+            json.dump(rows, f, indent=2)
+            return
+        fieldnames = list(FmuUsage.__dataclass_fields__) + [
+            "fmi_version",
+            *METADATA_FIELDS,
+        ]
+        writer = csv.DictWriter(f, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,90 @@
+"""
+Stratified sampling of the FMUs of a session.
+
+For fast smoke runs, ``--fmu-sample`` keeps a deterministic subset of the
+FMUs. The FMUs are grouped into strata by the features the filters look at
+(FMI version, interface types, array variables and input/output/parameter
+presence) and every non-empty stratum keeps at least one representative, so
+rare kinds of models are not lost the way they are with a random subset.
+"""
+
+import random
+from typing import Dict, Hashable, List, Sequence, Tuple, Union
+
+from pytest_fmu_filter.session import FmuEntry
+
+
+def stratum(entry: FmuEntry) -> Hashable:
+    """
+    Return the stratum of an FMU.
+
+    FMUs that cannot be read form a stratum of their own, so the error is
+    still reported for one of them.
+    """
+    try:
+        summary = entry.summary()
+    except Exception:
+        return ()
+    return (
+        summary.fmi_version,
+        summary.is_me(),
+        summary.is_cs(),
+        summary.is_se(),
+        summary.has_array_variables(),
+        summary.has_input(),
+        summary.has_output(),
+        summary.has_parameter(),
+    )
+
+
+def _allocate(sizes: Sequence[int], total: int) -> List[int]:
+    """Split ``total`` over strata: one each, the rest proportionally to size."""
+    counts = [1] * len(sizes)
+    spare = [size - 1 for size in sizes]
+    extra = min(max(0, total - len(sizes)), sum(spare))
+    if extra:
+        quotas = [n * extra / sum(spare) for n in spare]
+        for i, quota in enumerate(quotas):
+            counts[i] += int(quota)
+        # Hand out what is left by largest remainder
+        order = sorted(
+            range(len(sizes)),
+            key=lambda i: (quotas[i] - int(quotas[i]), sizes[i]),
+            reverse=True,
+        )
+        for i in order[: len(sizes) + extra - sum(counts)]:
+            counts[i] += 1
+    return counts
+
+
+def sample_entries(
+    entries: Sequence[FmuEntry], size: Union[int, float], seed: int = 0
+) -> Tuple[List[FmuEntry], int]:
+    """
+    Draw a stratified sample of FMUs.
+
+    Args:
+        entries: The FMUs to sample from
+        size: Number of FMUs to keep if an int, the fraction to keep (at
+            most 1) if a float
+        seed: Seed of the random selection within each stratum
+
+    Returns:
+        The sampled entries in their original order, and the number of strata.
+        More than ``size`` entries are returned if there are more strata.
+    """
+    if isinstance(size, float):
+        size = max(1, round(len(entries) * size))
+    size = int(size)
+
+    strata: Dict[Hashable, List[int]] = {}
+    for i, entry in enumerate(entries):
+        strata.setdefault(stratum(entry), []).append(i)
+
+    # Strata in order of first appearance keep the result independent of hashing
+    groups = list(strata.values())
+    rng = random.Random(seed)
+    chosen = []
+    for group, count in zip(groups, _allocate([len(g) for g in groups], size)):
+        chosen.extend(rng.sample(group, count))
+    return [entries[i] for i in sorted(chosen)], len(groups)
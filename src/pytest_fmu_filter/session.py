@@ -0,0 +1,691 @@
+"""
+Per-session store of FMU metadata.
+
+Every FMU known to a pytest session is represented by one :class:`FmuEntry`.
+Entries load their metadata on first use and keep it for the rest of the
+session, so each FMU is parsed at most once no matter how many tests filter
+on it.
+"""
+
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from pytest_fmu_filter.md import (
+    ModelCounts,
+    ModelDescription,
+    ModelHeader,
+    read_binary_platforms,
+    read_model_counts,
+    read_model_header,
+    read_model_variables,
+    read_modelDescription,
+)
+from pytest_fmu_filter.plugin import get_select, session_key
+from pytest_fmu_filter.query import FmuIndex, NameIndex, compile_query
+from pytest_fmu_filter.summary import FmuDetails, FmuSummary, terminal_names
+
+if TYPE_CHECKING:
+    from pytest_fmu_filter.catalog import Catalog
+    from pytest_fmu_filter.shared_cache import SharedCache
+
+ErrorCallback = Callable[["FmuEntry", Exception], None]
+
+# Name indexes built from FmuDetails: kind -> (name, qualifier) pairs of an FMU
+DETAIL_INDEXES: Dict[
+    str, Callable[[FmuDetails], Iterable[Tuple[str, Optional[str]]]]
+] = {
+    "units": lambda details: details.units,
+    "declared_types": lambda details: ((name, None) for name in details.declared_types),
+}
+
+# Name indexes built from FmuEntry.terminals(), by the same pattern
+TERMINAL_INDEXES: Dict[
+    str,
+    Callable[
+        [Sequence[Tuple[str, Optional[str]]]], Iterable[Tuple[str, Optional[str]]]
+    ],
+] = {
+    "terminals": lambda terminals: terminals,
+    "terminal_kinds": lambda terminals: (
+        (kind, None) for _, kind in terminals if kind is not None
+    ),
+}
+
+NameGroup = Tuple[
+    List[str], Callable[["FmuEntry"], List[Iterable[Tuple[str, Optional[str]]]]]
+]
+
+
+def _name_group(kind: str) -> NameGroup:
+    """Return the name index kinds built together with a kind, and their loader."""
+    if kind == "variables":
+        return [kind], lambda entry: [entry.variables()]
+    if kind in TERMINAL_INDEXES:
+
+        def terminals(entry):
+            names = entry.terminals()
+            return [get(names) for get in TERMINAL_INDEXES.values()]
+
+        return list(TERMINAL_INDEXES), terminals
+
+    def details(entry):
+        names = entry.details()
+        return [get(names) for get in DETAIL_INDEXES.values()]
+
+    return list(DETAIL_INDEXES), details
+
+
+# Rough memory use of a parsed model, from tracemalloc measurements: XML
+# element plus variable object per variable, XML element for everything else
+VARIABLE_BYTES = 900
+ELEMENT_BYTES = 200
+
+
+def estimate_size(model_description: ModelDescription) -> int:
+    """Estimate the memory held by a parsed model description, in bytes."""
+    n_variables = len(model_description.model.variables)
+    n_elements = sum(1 for _ in model_description.root.iter())
+    return (
+        n_variables * VARIABLE_BYTES + max(n_elements - n_variables, 0) * ELEMENT_BYTES
+    )
+
+
+class ModelCache:
+    """
+    Least-recently-used cache of full model descriptions.
+
+    Summaries stay with their entries for the whole session; only the full
+    ModelDescription objects live here and are evicted, oldest first, once
+    their estimated size exceeds the budget. Evicted models are parsed again
+    on the next access. The most recently used model is always kept.
+
+    Attributes:
+        budget: Memory budget in bytes, None for no limit
+        size: Estimated size of the cached models in bytes
+        peak: Highest size after eviction
+        loads: Number of models parsed
+        evictions: Number of models evicted
+        reloads: Number of models parsed again after eviction
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.size = 0
+        self.peak = 0
+        self.loads = 0
+        self.evictions = 0
+        self.reloads = 0
+        self._models: OrderedDict[str, Tuple[ModelDescription, int]] = OrderedDict()
+        self._evicted: Set[str] = set()
+
+    def get(self, path: str, load: Callable[[], ModelDescription]) -> ModelDescription:
+        """Return the model of an FMU, loading it with ``load`` if not cached."""
+        cached = self._models.get(path)
+        if cached is not None:
+            self._models.move_to_end(path)
+            return cached[0]
+
+        model = load()
+        self.loads += 1
+        if path in self._evicted:
+            self.reloads += 1
+        size = estimate_size(model)
+        self._models[path] = (model, size)
+        self.size += size
+        self._evict()
+        self.peak = max(self.peak, self.size)
+        return model
+
+    def discard(self, path: str) -> None:
+        """Drop the model of an FMU, e.g. because its file changed."""
+        cached = self._models.pop(path, None)
+        if cached is not None:
+            self.size -= cached[1]
+
+    def _evict(self) -> None:
+        if self.budget is None:
+            return
+        while self.size > self.budget and len(self._models) > 1:
+            path, (_, size) = self._models.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            self._evicted.add(path)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+class FmuEntry:
+    """
+    An FMU known to the session.
+
+    Attributes:
+        path: The FMU path as given on the command line or in the catalog
+        is_dir: Whether the FMU is an extracted directory, if already known
+    """
+
+    def __init__(
+        self,
+        path: str,
+        summary: Optional[FmuSummary] = None,
+        is_dir: Optional[bool] = None,
+        models: Optional[ModelCache] = None,
+        shared: Optional["SharedCache"] = None,
+        catalog: Optional["Catalog"] = None,
+    ):
+        self.path = path
+        self.is_dir = is_dir
+        self._summary = summary
+        self._models = models if models is not None else ModelCache()
+        self._shared = shared
+        self._catalog = catalog
+        self._counts: Optional[ModelCounts] = None
+        self._header: Optional[ModelHeader] = None
+        self._platforms: Optional[List[str]] = None
+        self._error: Optional[Exception] = None
+
+    def model(self) -> ModelDescription:
+        """
+        Return the full model description, parsing the FMU if it is not cached.
+
+        Raises:
+            Exception: The error raised by the parser, re-raised on every call
+        """
+        if self._error is not None:
+            raise self._error
+        try:
+            return self._models.get(self.path, self._load)
+        except Exception as e:
+            self._error = e
+            raise
+
+    def _load(self) -> ModelDescription:
+        return read_modelDescription(self.path, self.is_dir)
+
+    def counts(self, stop_after: Optional[int] = None) -> ModelCounts:
+        """
+        Return the model sizes, counting them from the XML stream if needed.
+
+        Args:
+            stop_after: Counting may stop once more than this many variables
+                were seen, in which case the result is truncated
+        """
+        if self._summary is not None:
+            return self._summary.counts()
+        if self._error is not None:
+            raise self._error
+
+        counts = self._counts
+        if counts is None or (
+            # A truncated count only answers thresholds below what it has seen
+            counts.truncated
+            and (stop_after is None or stop_after >= counts.n_variables)
+        ):
+            try:
+                counts = read_model_counts(self.path, stop_after, self.is_dir)
+            except Exception as e:
+                self._error = e
+                raise
+            self._counts = counts
+        return counts
+
+    def header(self) -> Union[ModelHeader, FmuSummary]:
+        """
+        Return the root attributes and interface types of the FMU.
+
+        The summary is returned if available; otherwise only the start of
+        modelDescription.xml is read.
+        """
+        if self._summary is not None:
+            return self._summary
+        if self._error is not None:
+            raise self._error
+        if self._header is None:
+            try:
+                self._header = read_model_header(self.path, self.is_dir)
+            except Exception as e:
+                self._error = e
+                raise
+        return self._header
+
+    def platforms(self) -> Sequence[str]:
+        """
+        Return the platforms the FMU ships a binary for.
+
+        Taken from the summary if available; otherwise the model identifiers
+        come from the header and the binaries from the zip central directory,
+        so nothing but the start of modelDescription.xml is decompressed.
+        """
+        if self._summary is not None:
+            return self._summary.platforms
+        if self._platforms is None:
+            header = self.header()
+            assert isinstance(header, ModelHeader)
+            try:
+                self._platforms = read_binary_platforms(
+                    self.path,
+                    [it.model_identifier for it in header.interface_types],
+                    self.is_dir,
+                )
+            except Exception as e:
+                self._error = e
+                raise
+        return self._platforms
+
+    def variables(self) -> Sequence[Tuple[str, Optional[str]]]:
+        """
+        Return the (name, causality) pairs of the variables.
+
+        Taken from the catalog if available, otherwise streamed from the XML
+        without loading the model. Not kept, as the names of all FMUs of a
+        large session would take more memory than the name indexes.
+        """
+        if self._catalog is not None:
+            return self._catalog.details(self.path).variables
+        if self._error is not None:
+            raise self._error
+        try:
+            return read_model_variables(self.path, self.is_dir)
+        except Exception as e:
+            self._error = e
+            raise
+
+    def details(self) -> FmuDetails:
+        """
+        Return the names of the variables, units and declared types.
+
+        Taken from the catalog or the shared cache if available, otherwise
+        collected from the full model description. Not kept, see
+        :meth:`variables`.
+        """
+        if self._catalog is not None:
+            return self._catalog.details(self.path)
+        if self._shared is None:
+            return FmuDetails.from_model_description(self.model())
+        if self._error is not None:
+            raise self._error
+        try:
+            return self._shared.details(self.path, self.is_dir, self._load_all)
+        except Exception as e:
+            self._error = e
+            raise
+
+    def terminals(self) -> Sequence[Tuple[str, Optional[str]]]:
+        """
+        Return the (name, terminal kind) pairs of all terminals.
+
+        Taken from the catalog if available, otherwise read from
+        terminalsAndIcons.xml of the full model description. Errors reading
+        that document are raised here only, so the FMU stays readable for
+        the other keys. Not kept, see :meth:`variables`.
+        """
+        if self._catalog is not None:
+            return self._catalog.terminals(self.path)
+        return terminal_names(self.model())
+
+    def summary(self) -> FmuSummary:
+        """
+        Return the compact summary, parsing the FMU if none is available.
+
+        With a shared cache, the summary is taken from the cache if another
+        process has stored it already.
+        """
+        if self._summary is None:
+            if self._shared is not None:
+                if self._error is not None:
+                    raise self._error
+                try:
+                    self._summary = self._shared.summary(
+                        self.path, self.is_dir, self._load_all
+                    )
+                except Exception as e:
+                    self._error = e
+                    raise
+            else:
+                self._summary = self._summarize()
+        return self._summary
+
+    def _summarize(self) -> FmuSummary:
+        return FmuSummary.from_model_description(self.path, self.model())
+
+    def _load_all(self) -> Tuple[FmuSummary, FmuDetails]:
+        model = self.model()
+        return (
+            FmuSummary.from_model_description(self.path, model),
+            FmuDetails.from_model_description(model),
+        )
+
+
+class FmuSession:
+    """
+    The FMUs of a pytest session.
+
+    Attributes:
+        entries: Entries by path: --fmus in command line order, then FMUs found
+            by --fmu-dir, then catalog entries
+        models: Cache of the full model descriptions
+        shared: Host-wide summary cache, if any
+        catalogs: Catalogs the entries were added from, open until :meth:`close`
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str] = (),
+        memory_budget: Optional[int] = None,
+        shared: Optional["SharedCache"] = None,
+    ):
+        self.entries: Dict[str, FmuEntry] = {}
+        self.models = ModelCache(memory_budget)
+        self.shared = shared
+        self.catalogs: List["Catalog"] = []
+        # (kept, population) once --fmu-select was applied
+        self.select_info: Optional[Tuple[int, int]] = None
+        # (sampled, population, strata) once sampled
+        self.sample_info: Optional[Tuple[int, int, int]] = None
+        # Entries by position in the indexes, in session order
+        self._positions: List[FmuEntry] = []
+        self._index: Optional[FmuIndex] = None
+        # Errors of unreadable entries by position
+        self._failed: Dict[int, Exception] = {}
+        self._queries: Dict[str, List[FmuEntry]] = {}
+        # Kind -> (index, errors by position), shared by the kinds built together
+        self._name_indexes: Dict[str, Tuple[NameIndex, Dict[int, Exception]]] = {}
+        for path in paths:
+            self.add(path)
+
+    def add(
+        self,
+        path: str,
+        summary: Optional[FmuSummary] = None,
+        is_dir: Optional[bool] = None,
+        catalog: Optional["Catalog"] = None,
+    ) -> FmuEntry:
+        """Add an FMU unless already known and return its entry."""
+        entry = self.entries.get(path)
+        if entry is None:
+            entry = self.add_entry(
+                FmuEntry(path, summary, is_dir, self.models, self.shared, catalog)
+            )
+        return entry
+
+    def add_entry(self, entry: FmuEntry) -> FmuEntry:
+        """Add an existing entry, e.g. one shared with another session."""
+        if entry.path not in self.entries:
+            self.entries[entry.path] = entry
+            self._invalidate()
+        return self.entries[entry.path]
+
+    def add_directories(self, roots: Iterable[str]) -> None:
+        """Add the FMUs found below directories or glob patterns."""
+        from pytest_fmu_filter.discovery import discover_fmus
+
+        for fmu in discover_fmus(roots):
+            self.add(fmu.path, is_dir=fmu.is_dir)
+
+    def add_catalog(self, catalog_path: str) -> None:
+        """
+        Add all FMUs of a catalog built by ``fmu-filter-catalog``.
+
+        The catalog stays open to answer the name indexes.
+        """
+        from pytest_fmu_filter.catalog import Catalog
+
+        catalog = Catalog(catalog_path)
+        self.catalogs.append(catalog)
+        for summary in catalog.summaries():
+            self.add(summary.path, summary, catalog=catalog)
+
+    def close(self) -> None:
+        """Close the catalogs of the session."""
+        for catalog in self.catalogs:
+            catalog.close()
+        self.catalogs = []
+
+    def index(self, on_error: Optional[ErrorCallback] = None) -> FmuIndex:
+        """
+        Return the field index over all FMUs, summarizing them on first use.
+
+        FMUs that cannot be read are left out of the index and passed to
+        ``on_error`` on every call.
+        """
+        if self._index is None:
+            self._failed = {}
+            summaries: List[Optional[FmuSummary]] = []
+            for i, entry in enumerate(self._indexed()):
+                try:
+                    summaries.append(entry.summary())
+                except Exception as e:
+                    self._failed[i] = e
+                    summaries.append(None)
+            self._index = FmuIndex(summaries)
+        self._report(self._failed, on_error)
+        return self._index
+
+    def query(
+        self, expression: str, on_error: Optional[ErrorCallback] = None
+    ) -> List[FmuEntry]:
+        """
+        Return the entries matching a ``where`` expression, in session order.
+
+        Raises:
+            ValueError: If the expression is invalid
+        """
+        query = compile_query(expression)
+        index = self.index(on_error)
+        if expression not in self._queries:
+            self._queries[expression] = [
+                self._positions[i] for i in index.ids(query.select(index))
+            ]
+        return self._queries[expression]
+
+    def name_index(
+        self, kind: str, on_error: Optional[ErrorCallback] = None
+    ) -> NameIndex:
+        """
+        Return an inverted name index over all FMUs, built on first use.
+
+        The ``variables`` index holds (name, causality) pairs; they come from
+        the catalog or are streamed from the XML, no ModelDescription is
+        loaded. The kinds of :data:`DETAIL_INDEXES` are built together from
+        :meth:`FmuEntry.details`, those of :data:`TERMINAL_INDEXES` from
+        :meth:`FmuEntry.terminals`. FMUs that cannot be read are left out of
+        the index and passed to ``on_error`` on every call.
+        """
+        if kind not in self._name_indexes:
+            kinds, names = _name_group(kind)
+            indexes = [NameIndex() for _ in kinds]
+            failed: Dict[int, Exception] = {}
+            for i, entry in enumerate(self._indexed()):
+                try:
+                    fmu_names = names(entry)
+                except Exception as e:
+                    failed[i] = e
+                    continue
+                for index, kind_names in zip(indexes, fmu_names):
+                    index.add(kind_names, i)
+            for group_kind, index in zip(kinds, indexes):
+                self._name_indexes[group_kind] = (index, failed)
+        index, failed = self._name_indexes[kind]
+        self._report(failed, on_error)
+        return index
+
+    def _indexed(self) -> List[FmuEntry]:
+        if not self._positions:
+            self._positions = list(self)
+        return self._positions
+
+    def _report(
+        self, failed: Dict[int, Exception], on_error: Optional[ErrorCallback]
+    ) -> None:
+        if on_error is not None:
+            for i, e in sorted(failed.items()):
+                on_error(self._positions[i], e)
+
+    def with_names(
+        self,
+        kind: str,
+        names: Union[str, Iterable[str]],
+        qualifier: Optional[str] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> List[FmuEntry]:
+        """
+        Return the entries declaring any of the names, in session order.
+
+        Args:
+            kind: ``variables`` or a kind of :data:`DETAIL_INDEXES` or
+                :data:`TERMINAL_INDEXES`
+            names: Name or names
+            qualifier: Only count names with this qualifier, e.g. a causality
+            on_error: Called with entries that cannot be read
+        """
+        index = self.name_index(kind, on_error)
+        return [self._positions[i] for i in index.ids(index.lookup(names, qualifier))]
+
+    def refresh(self, path: str) -> FmuEntry:
+        """
+        Replace the entry of a changed FMU by a new one.
+
+        Metadata of the old entry, e.g. from a catalog, is dropped; the other
+        entries keep theirs. Built indexes are updated in place, reading only
+        the new entry.
+        """
+        old = self.entries[path]
+        self.models.discard(path)
+        entry = FmuEntry(path, None, old.is_dir, self.models, self.shared)
+        self.entries[path] = entry
+        if not self._positions:
+            return entry
+
+        i = self._positions.index(old)
+        self._positions[i] = entry
+        if self._index is not None:
+            self._failed.pop(i, None)
+            try:
+                summary = entry.summary()
+            except Exception as e:
+                self._failed[i] = e
+                summary = None
+            self._index.replace(i, summary)
+            for expression in self._queries:
+                self._queries[expression] = [
+                    self._positions[j]
+                    for j in self._index.ids(
+                        compile_query(expression).select(self._index)
+                    )
+                ]
+        updated = set()
+        for kind in list(self._name_indexes):
+            if kind in updated:
+                continue
+            kinds, names = _name_group(kind)
+            updated.update(kinds)
+            indexes = [self._name_indexes[group_kind][0] for group_kind in kinds]
+            failed = self._name_indexes[kind][1]
+            failed.pop(i, None)
+            for index in indexes:
+                index.remove(i)
+            try:
+                fmu_names = names(entry)
+            except Exception as e:
+                failed[i] = e
+                continue
+            for index, kind_names in zip(indexes, fmu_names):
+                index.add(kind_names, i)
+        return entry
+
+    def restrict(self, entries: Iterable[FmuEntry]) -> None:
+        """Keep only the given entries, in the given order."""
+        self.entries = {entry.path: entry for entry in entries}
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        self._positions = []
+        self._index = None
+        self._queries.clear()
+        self._name_indexes.clear()
+
+    def select(self, filter_kwargs: Dict[str, Any]) -> None:
+        """
+        Keep only the FMUs passing session-wide filters (``--fmu-select``).
+
+        FMUs are selected as for markers, see
+        :func:`pytest_fmu_filter.engine.select_entries`. FMUs that cannot be
+        read are kept, so their errors are reported by the tests as without
+        the prefilter.
+
+        Raises:
+            ValueError: If a filter key is unknown
+        """
+        from pytest_fmu_filter.engine import FILTER_KEYS, select_entries
+
+        for key in filter_kwargs:
+            if key not in FILTER_KEYS:
+                raise ValueError(f"Unknown filter key: {key}")
+
+        population = len(self)
+        failed = set()
+        selected = set(
+            select_entries(self, filter_kwargs, lambda entry, e: failed.add(entry))
+        )
+        kept = [entry for entry in self if entry in selected or entry in failed]
+        self.restrict(kept)
+        self.select_info = (len(kept), population)
+
+    def sample(self, size: Union[int, float], seed: int = 0) -> None:
+        """Keep a stratified sample of the FMUs, see :mod:`pytest_fmu_filter.sampling`."""
+        from pytest_fmu_filter.sampling import sample_entries
+
+        population = len(self)
+        sampled, n_strata = sample_entries(list(self), size, seed)
+        self.restrict(sampled)
+        self.sample_info = (len(sampled), population, n_strata)
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def get_session(config) -> FmuSession:
+    """Return the FMU session of a pytest config, creating it on first use."""
+    session = config.stash.get(session_key, None)
+    if session is None:
+        shared = None
+        shared_dir = config.getoption("fmu_shared_cache")
+        if shared_dir is not None:
+            from pytest_fmu_filter.shared_cache import SharedCache
+
+            shared = SharedCache(shared_dir, config.getoption("fmu_shared_cache_size"))
+        session = FmuSession(
+            config.getoption("fmus") or [],
+            config.getoption("fmu_memory_budget"),
+            shared,
+        )
+        config.add_cleanup(session.close)
+        fmu_dirs = config.getoption("fmu_dir")
+        if fmu_dirs:
+            session.add_directories(fmu_dirs)
+        catalog_path = config.getoption("fmu_catalog")
+        if catalog_path is not None:
+            session.add_catalog(catalog_path)
+        select = get_select(config)
+        if select:
+            session.select(select)
+        sample = config.getoption("fmu_sample")
+        if sample is not None:
+            session.sample(sample, config.getoption("fmu_sample_seed"))
+        config.stash[session_key] = session
+    return session
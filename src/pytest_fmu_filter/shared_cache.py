@@ -0,0 +1,248 @@
+"""
+Host-wide cache of FMU summaries shared by concurrent pytest jobs.
+
+Many pytest jobs on one host often test the same FMU store. With
+``--fmu-shared-cache DIR`` they share the summaries of the FMUs they read:
+every summary, with the names for the session indexes, is a JSON file named
+after a hash of the FMU path, size, mtime and the summary format. Files are written to a temporary name and renamed
+into place, so readers never see partial entries. Each key has a lock file;
+the first job to miss an entry parses the FMU while the others wait on the
+lock and then read its result, instead of all parsing at once.
+
+The cache is bounded: once its entries exceed the size limit, the least
+recently used ones (by mtime, touched on every hit) are deleted.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from pytest_fmu_filter.discovery import fmu_stat
+from pytest_fmu_filter.summary import FmuDetails, FmuSummary
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Bumped whenever the stored summary format changes
+FORMAT_VERSION = "5"
+
+ENTRY_SUFFIX = ".json"
+LOCK_SUFFIX = ".lock"
+
+
+def _try_lock(fd: int, blocking: bool) -> bool:
+    if os.name == "nt":
+        # LK_LOCK only retries for 10 seconds, keep waiting
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(fd: int) -> None:
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _locked(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold an exclusive lock on ``path``, creating the lock file if needed.
+
+    Lock files of evicted entries are deleted while locked, so a lock only
+    counts once the locked file is still the one at ``path``.
+
+    Yields:
+        Whether the lock was acquired (always True when blocking)
+    """
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if not _try_lock(fd, blocking):
+                yield False
+                return
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and os.path.samestat(current, os.fstat(fd)):
+                try:
+                    yield True
+                finally:
+                    _unlock(fd)
+                return
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+
+class SharedCache:
+    """
+    Directory of JSON entries shared between processes.
+
+    Attributes:
+        directory: The cache directory, created if missing
+        max_size: Size limit of the entries in bytes, None for no limit
+        hits: Number of entries read from the cache by this process
+        misses: Number of entries created by this process
+    """
+
+    def __init__(self, directory: Union[str, Path], max_size: Optional[int] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def _read(self, entry_path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            # Missing, evicted meanwhile, or left corrupt by a crashed writer
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return value
+
+    def _write(self, entry_path: Path, value: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str, create: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the entry of ``key``, creating it with ``create`` on a miss.
+
+        Concurrent callers for the same key wait for the first one to create
+        the entry. Exceptions of ``create`` are raised and nothing is stored.
+        """
+        entry_path = self.directory / (key + ENTRY_SUFFIX)
+        value = self._read(entry_path)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        with _locked(self.directory / (key + LOCK_SUFFIX)):
+            value = self._read(entry_path)
+            if value is not None:
+                self.hits += 1
+                return value
+            value = create()
+            self._write(entry_path, value)
+            self.misses += 1
+        self.evict()
+        return value
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the size limit is met."""
+        if self.max_size is None:
+            return
+        with _locked(
+            self.directory / (".evict" + LOCK_SUFFIX), blocking=False
+        ) as acquired:
+            if not acquired:
+                # Another process is evicting already
+                return
+            entries = []
+            for item in os.scandir(self.directory):
+                if item.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        st = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime_ns, item.name, st.st_size))
+            size = sum(entry[2] for entry in entries)
+            for _, name, entry_size in sorted(entries):
+                if size <= self.max_size:
+                    break
+                key = name[: -len(ENTRY_SUFFIX)]
+                lock_path = self.directory / (key + LOCK_SUFFIX)
+                with _locked(lock_path, blocking=False) as locked:
+                    if not locked:
+                        # Being created right now, hence not least recently used
+                        continue
+                    try:
+                        os.unlink(self.directory / name)
+                    except FileNotFoundError:
+                        pass
+                    try:
+                        os.unlink(lock_path)
+                    except OSError:
+                        # Windows does not delete open files
+                        pass
+                size -= entry_size
+
+    def _fmu(
+        self,
+        path: str,
+        is_dir: Optional[bool],
+        load: Callable[[], Tuple[FmuSummary, FmuDetails]],
+    ) -> Dict[str, Any]:
+        absolute = os.path.abspath(path)
+        if is_dir is None:
+            is_dir = os.path.isdir(absolute)
+        size, mtime_ns = fmu_stat(absolute, is_dir)
+        key = hashlib.sha256(
+            f"{FORMAT_VERSION}\0{absolute}\0{size}\0{mtime_ns}".encode()
+        ).hexdigest()
+
+        def create() -> Dict[str, Any]:
+            summary, details = load()
+            return {"summary": summary.to_dict(), "details": details.to_dict()}
+
+        return self.get(key, create)
+
+    def summary(
+        self,
+        path: str,
+        is_dir: Optional[bool],
+        load: Callable[[], Tuple[FmuSummary, FmuDetails]],
+    ) -> FmuSummary:
+        """
+        Return the summary of an FMU, loading and storing it on a miss.
+
+        Entries are keyed by the absolute path of the FMU and its size and
+        mtime (over all files for directories, see
+        :func:`~pytest_fmu_filter.discovery.fmu_stat`), so changed FMUs are
+        read again. ``load`` returns the summary together
+        with the details, which are stored in the same entry.
+        """
+        data = self._fmu(path, is_dir, load)["summary"]
+        # Stored with the path of the job that created it
+        return FmuSummary.from_dict({**data, "path": path})
+
+    def details(
+        self,
+        path: str,
+        is_dir: Optional[bool],
+        load: Callable[[], Tuple[FmuSummary, FmuDetails]],
+    ) -> FmuDetails:
+        """Return the details of an FMU, loading and storing them on a miss."""
+        return FmuDetails.from_dict(self._fmu(path, is_dir, load)["details"])
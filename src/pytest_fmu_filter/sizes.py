@@ -0,0 +1,29 @@
+"""
+Memory sizes given on the command line.
+
+Shared by the pytest options and the ``fmu-filter-daemon`` command, which
+must not import the pytest plugin.
+"""
+
+import math
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a memory size such as '512M', '2GB' or '1048576' into bytes.
+
+    Raises:
+        ValueError: If the size is not understood or not positive
+    """
+    text = value.strip().upper().removesuffix("B").removesuffix("I")
+    unit = text[-1:] if text[-1:] in _SIZE_UNITS else ""
+    try:
+        number = float(text[: len(text) - len(unit)])
+    except ValueError:
+        raise ValueError(f"Invalid memory size: {value}")
+    size = int(number * _SIZE_UNITS[unit]) if math.isfinite(number) else 0
+    if size <= 0:
+        raise ValueError(f"Memory size must be positive: {value}")
+    return size
@@ -0,0 +1,237 @@
+"""
+Compact per-FMU metadata used by the filters.
+
+A :class:`FmuSummary` holds the handful of facts the ``fmu_filter`` keys look
+at, without the XML tree or the variable objects of a full
+:class:`~pytest_fmu_filter.md.ModelDescription`. It only has counts and flags,
+so its size does not grow with the model: summaries are cheap to keep for
+every FMU of a session and can be stored in a catalog.
+
+The names of variables, units and declared types are :class:`FmuDetails`.
+They are not kept per FMU but fed into the inverted indexes of the session,
+see :class:`pytest_fmu_filter.query.NameIndex`. Terminals come from a
+document of their own and are only read by :func:`terminal_names` when a
+terminal key asks for them.
+"""
+
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from pytest_fmu_filter.md import (
+    FmiType,
+    ModelCounts,
+    ModelDescription,
+    VariableCausality,
+    current_platform,
+)
+
+
+def _causality(var) -> Optional[str]:
+    return var.causality.value if var.causality else None
+
+
+@dataclass(frozen=True)
+class FmuSummary:
+    """
+    Filter-relevant metadata of one FMU.
+
+    Attributes:
+        path: Path of the FMU archive or extracted FMU directory
+        fmi_version: The FMI standard version ('2.0' or '3.0')
+        model_name: The model name
+        interface_types: Pairs of (fmi_type, model_identifier)
+        n_variables: Number of model variables
+        n_inputs: Number of input variables
+        n_outputs: Number of output variables
+        n_parameters: Number of parameter variables
+        array_variables: Whether the model has array variables (FMI 3.0 only)
+        n_states: Number of continuous states
+        n_event_indicators: Number of event indicators
+        platforms: Platforms the FMU ships a binary for
+        sources: Whether the FMU ships source files
+    """
+
+    path: str
+    fmi_version: str
+    model_name: str
+    description: Optional[str] = None
+    author: Optional[str] = None
+    version: Optional[str] = None
+    interface_types: Tuple[Tuple[str, str], ...] = ()
+    n_variables: int = 0
+    n_inputs: int = 0
+    n_outputs: int = 0
+    n_parameters: int = 0
+    array_variables: bool = False
+    n_states: int = 0
+    n_event_indicators: int = 0
+    platforms: Tuple[str, ...] = ()
+    sources: bool = False
+
+    @classmethod
+    def from_model_description(
+        cls, path: str, model_description: ModelDescription
+    ) -> "FmuSummary":
+        """Summarize a parsed model description."""
+        model = model_description.model
+        counts = model_description.counts()
+        causalities = [_causality(var) for var in model.variables]
+        return cls(
+            path=path,
+            fmi_version=model_description.fmi_version,
+            model_name=model.model_name,
+            description=model.description,
+            author=model.author,
+            version=model.version,
+            interface_types=tuple(
+                (it.fmi_type.value, it.model_identifier) for it in model.interface_types
+            ),
+            n_variables=len(causalities),
+            n_inputs=causalities.count(VariableCausality.INPUT.value),
+            n_outputs=causalities.count(VariableCausality.OUTPUT.value),
+            n_parameters=causalities.count(VariableCausality.PARAMETER.value),
+            array_variables=model_description.has_array_variables(),
+            n_states=counts.n_states,
+            n_event_indicators=counts.n_event_indicators,
+            platforms=tuple(model_description.binary_platforms()),
+            sources=model_description.has_sources(),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the summary as a JSON-serializable dict."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FmuSummary":
+        """Create a summary from the output of :meth:`to_dict`."""
+        return cls(
+            **{
+                **data,
+                "interface_types": tuple(tuple(it) for it in data["interface_types"]),
+                "platforms": tuple(data["platforms"]),
+            }
+        )
+
+    def counts(self) -> ModelCounts:
+        """Return the number of variables, continuous states and event indicators."""
+        return ModelCounts(
+            n_variables=self.n_variables,
+            n_states=self.n_states,
+            n_event_indicators=self.n_event_indicators,
+        )
+
+    def _has_interface(self, fmi_type: FmiType) -> bool:
+        return any(it == fmi_type.value for it, _ in self.interface_types)
+
+    def is_me(self) -> bool:
+        """Check if the FMU supports Model Exchange."""
+        return self._has_interface(FmiType.MODEL_EXCHANGE)
+
+    def is_cs(self) -> bool:
+        """Check if the FMU supports Co-Simulation."""
+        return self._has_interface(FmiType.CO_SIMULATION)
+
+    def is_se(self) -> bool:
+        """Check if the FMU supports Scheduled Execution (FMI 3.0 only)."""
+        return self._has_interface(FmiType.SCHEDULED_EXECUTION)
+
+    def name_matches(self, pattern: str) -> bool:
+        """Check if the model name matches the given regex pattern."""
+        return re.search(pattern, self.model_name) is not None
+
+    def has_input(self) -> bool:
+        """Check if the model has input variables."""
+        return self.n_inputs > 0
+
+    def has_output(self) -> bool:
+        """Check if the model has output variables."""
+        return self.n_outputs > 0
+
+    def has_parameter(self) -> bool:
+        """Check if the model has parameter variables."""
+        return self.n_parameters > 0
+
+    def has_array_variables(self) -> bool:
+        """Check if the FMU has any array variables (dimensions)."""
+        return self.array_variables
+
+    def has_platform(self, platforms: list[str] | str) -> bool:
+        """Check if the FMU ships a binary for any of the given platforms."""
+        if isinstance(platforms, str):
+            platforms = [platforms]
+        return any(p in platforms for p in self.platforms)
+
+    def has_current_platform(self) -> bool:
+        """Check if the FMU ships a binary for the running interpreter."""
+        return current_platform(self.fmi_version) in self.platforms
+
+    def has_sources(self) -> bool:
+        """Check if the FMU ships source files below sources/."""
+        return self.sources
+
+
+@dataclass(frozen=True)
+class FmuDetails:
+    """
+    Names declared by one FMU, for the name indexes of a session.
+
+    Attributes:
+        variables: Pairs of (name, causality) for every model variable
+        units: Pairs of (unit name, causality) of the variables in each unit
+        declared_types: Names of the declared types used by variables
+    """
+
+    variables: Tuple[Tuple[str, Optional[str]], ...] = ()
+    units: Tuple[Tuple[str, Optional[str]], ...] = ()
+    declared_types: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_model_description(
+        cls, model_description: ModelDescription
+    ) -> "FmuDetails":
+        """Collect the names of a parsed model description."""
+        model = model_description.model
+        units = {
+            (unit, _causality(var))
+            for unit, variables in model_description.unit_index().items()
+            for var in variables
+        }
+        declared_types = {
+            var.declared_type.name
+            for var in model.variables
+            if var.declared_type is not None
+        }
+        return cls(
+            variables=tuple((var.name, _causality(var)) for var in model.variables),
+            units=tuple(sorted(units, key=lambda pair: (pair[0], str(pair[1])))),
+            declared_types=tuple(sorted(declared_types)),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the details as a JSON-serializable dict."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FmuDetails":
+        """Create details from the output of :meth:`to_dict`."""
+        return cls(
+            variables=tuple(tuple(var) for var in data["variables"]),
+            units=tuple(tuple(unit) for unit in data["units"]),
+            declared_types=tuple(data["declared_types"]),
+        )
+
+
+def terminal_names(
+    model_description: ModelDescription,
+) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """
+    Return the (name, terminal kind) pairs of all terminals, nested ones included.
+
+    Reads terminalsAndIcons.xml (FMI 3.0 only) on first use.
+    """
+    return tuple(
+        (terminal.name, terminal.terminal_kind)
+        for top in model_description.terminals()
+        for terminal in top.walk()
+    )
@@ -0,0 +1,221 @@
+"""
+Watch mode re-running the tests of changed FMUs.
+
+With ``--fmu-watch`` pytest does not exit after the test run. It keeps the FMU
+session with its parsed metadata, and polls the stat (size, mtime and inode)
+of the session FMUs. When FMUs change, only those are read again and checked
+against ``--fmu-select``. The test functions that were parametrized with FMUs
+are parametrized again, so their ``fmu_filter`` markers are evaluated against
+the new metadata, and only their items of the changed FMUs run. Nothing else
+is collected again. Stop watching with Ctrl+C.
+
+Limits:
+    - Only the FMUs of the session are watched. FMUs left out by
+      ``--fmu-select`` or ``--fmu-sample`` at the start, and new files below
+      ``--fmu-dir``, are not picked up. A watched FMU that no longer passes
+      ``--fmu-select`` is left out until a later change lets it pass again.
+    - Only test functions that had FMU items in the first run are
+      parametrized again. A function none of the FMUs matched at the start
+      needs a restart, and so do edits to the test files.
+
+Polling only needs ``os.stat`` and works on every platform and file system,
+including network mounts without change notifications. For extracted FMU
+directories every file is stat'ed, so changes to binaries or resources are
+seen as well. A change is reported once the stat of the FMU stayed the same
+for one interval, so FMUs that are still being written are not read half-way.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pytest
+
+from pytest_fmu_filter.discovery import fmu_stat
+from pytest_fmu_filter.ordering import item_fmu
+from pytest_fmu_filter.plugin import get_select
+from pytest_fmu_filter.session import FmuEntry, FmuSession, get_session
+
+StatKey = Optional[Tuple[int, int, int]]
+
+
+def stat_key(path: str) -> StatKey:
+    """
+    Return the size, mtime and inode of an FMU, None if it does not exist.
+
+    For extracted FMU directories the size and mtime cover all of their
+    files, see :func:`pytest_fmu_filter.discovery.fmu_stat`.
+    """
+    try:
+        size, mtime_ns = fmu_stat(path, os.path.isdir(path))
+        return size, mtime_ns, os.stat(path).st_ino
+    except OSError:
+        return None
+
+
+class FmuWatcher:
+    """
+    Detects changed FMUs by polling their stat.
+
+    Attributes:
+        interval: Seconds between polls in :meth:`wait`
+    """
+
+    def __init__(self, paths: Iterable[str], interval: float = 1.0):
+        self.interval = interval
+        self._keys: Dict[str, StatKey] = {path: stat_key(path) for path in paths}
+        # Stat of changed FMUs not reported yet, as seen by the last poll
+        self._pending: Dict[str, StatKey] = {}
+
+    def poll(self) -> List[str]:
+        """
+        Return the FMUs that changed since they were last reported.
+
+        An FMU is reported by the first poll that sees the same changed stat
+        as the poll before it. Deleted FMUs are reported as changed, and again
+        once they reappear.
+        """
+        changed = []
+        for path, key in self._keys.items():
+            current = stat_key(path)
+            if current == key:
+                self._pending.pop(path, None)
+            elif path in self._pending and self._pending[path] == current:
+                del self._pending[path]
+                self._keys[path] = current
+                changed.append(path)
+            else:
+                self._pending[path] = current
+        return changed
+
+    def wait(self) -> List[str]:
+        """Poll every interval until FMUs changed and return them."""
+        while True:
+            time.sleep(self.interval)
+            changed = self.poll()
+            if changed:
+                return changed
+
+
+class FmuWatch:
+    """Plugin re-running the tests of changed FMUs after the test run."""
+
+    def __init__(self, config):
+        self.config = config
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        outcome = yield
+        if outcome.excinfo is not None or session.shouldfail or session.shouldstop:
+            return
+
+        fmu_session = get_session(self.config)
+        # All watched entries in session order, including left out ones
+        watched = {entry.path: entry for entry in fmu_session}
+        functions = fmu_functions(session.items)
+        watcher = FmuWatcher(watched, self.config.getoption("fmu_watch_interval"))
+        reporter = self.config.pluginmanager.get_plugin("terminalreporter")
+        while True:
+            if reporter is not None:
+                reporter.write_sep("-", f"fmu watch: watching {len(watched)} FMUs")
+            try:
+                changed = watcher.wait()
+            except KeyboardInterrupt:
+                return
+            left_out = refresh(fmu_session, watched, changed, get_select(self.config))
+
+            items = reparametrize(functions, set(changed) - left_out)
+            # Deselection (-k, -m) and ordering, for the new items only
+            self.config.hook.pytest_collection_modifyitems(
+                session=session, config=self.config, items=items
+            )
+            if reporter is not None:
+                note = f", {len(left_out)} left out by --fmu-select" if left_out else ""
+                reporter.write_sep(
+                    "=",
+                    f"fmu watch: {len(changed)} FMUs changed{note}, "
+                    f"running {len(items)} tests",
+                )
+            for i, item in enumerate(items):
+                nextitem = items[i + 1] if i + 1 < len(items) else None
+                item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+                if session.shouldfail:
+                    raise session.Failed(session.shouldfail)
+                if session.shouldstop:
+                    raise session.Interrupted(session.shouldstop)
+
+
+def refresh(
+    fmu_session: FmuSession,
+    watched: Dict[str, FmuEntry],
+    changed: List[str],
+    select: Dict,
+) -> Set[str]:
+    """
+    Read changed FMUs again and check them against ``--fmu-select``.
+
+    Args:
+        fmu_session: The FMU session, restricted to the FMUs passing the
+            selection in the order of ``watched``
+        watched: All watched entries by path, updated with the new entries
+        changed: Paths of the changed FMUs
+        select: Filters of ``--fmu-select``, empty if none
+
+    Returns:
+        Paths of the changed FMUs left out by the selection
+    """
+    for path in changed:
+        fmu_session.add_entry(watched[path])
+        watched[path] = fmu_session.refresh(path)
+    if not select:
+        return set()
+
+    check = FmuSession()
+    for path in changed:
+        check.add_entry(watched[path])
+    check.select(select)
+    left_out = set(changed) - set(check.entries)
+    fmu_session.restrict(
+        entry
+        for path, entry in watched.items()
+        if path in fmu_session.entries and path not in left_out
+    )
+    return left_out
+
+
+def fmu_functions(items: List[pytest.Item]) -> List[pytest.Function]:
+    """Return one item per test function parametrized with FMUs, in item order."""
+    functions: Dict[Tuple[str, str], pytest.Function] = {}
+    for item in items:
+        if isinstance(item, pytest.Function) and item_fmu(item) is not None:
+            assert item.parent is not None
+            functions.setdefault((item.parent.nodeid, item.originalname), item)
+    return list(functions.values())
+
+
+def reparametrize(
+    functions: List[pytest.Function], paths: Set[str]
+) -> List[pytest.Function]:
+    """
+    Parametrize test functions again and return their items of the given FMUs.
+
+    Only ``pytest_generate_tests`` runs, for these functions alone; the
+    collection hooks are not fired again.
+
+    Args:
+        functions: One item per test function, see :func:`fmu_functions`
+        paths: Paths of the FMUs to return items for
+    """
+    items = []
+    if not paths:
+        return items
+    for function in functions:
+        parent = function.parent
+        assert isinstance(parent, (pytest.Module, pytest.Class))
+        try:
+            new = list(parent._genfunctions(function.originalname, function.function))
+        except pytest.skip.Exception:
+            # No FMU matches the marker any more
+            continue
+        items.extend(item for item in new if item_fmu(item) in paths)
+    return items
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import pathlib
+import sqlite3
+import zipfile
+
+import pytest
+
+from pytest_fmu_filter.catalog import Catalog, build_catalog, load_catalog, main
+
+from .utils import make_fmu, make_model_description
+
+
+def make_library(root: pathlib.Path) -> list[pathlib.Path]:
+    return [
+        make_fmu(
+            root / "a" / "Feedthrough.fmu",
+            make_model_description(
+                "Feedthrough", variables=[("u", "input"), ("y", "output")]
+            ),
+        ),
+        make_fmu(
+            root / "b" / "Stair.fmu",
+            make_model_description(
+                "Stair", "3.0", ("CoSimulation",), [("counter", "output")]
+            ),
+        ),
+    ]
+
+
+def test_build_and_load_catalog(tmp_path):
+    make_library(tmp_path / "lib")
+    catalog = tmp_path / "fmus.db"
+
+    stats = build_catalog(catalog, [tmp_path / "lib"])
+    assert (stats.added, stats.updated, stats.unchanged) == (2, 0, 0)
+
+    summaries = {pathlib.Path(s.path).name: s for s in load_catalog(catalog)}
+    assert summaries["Feedthrough.fmu"].fmi_version == "2.0"
+    assert (
+        summaries["Feedthrough.fmu"].is_me()
+        and summaries["Feedthrough.fmu"].has_input()
+    )
+    assert summaries["Stair.fmu"].is_cs() and not summaries["Stair.fmu"].is_me()
+    assert summaries["Stair.fmu"].n_outputs == 1
+
+    # Names are only read per FMU, for the session indexes
+    with Catalog(catalog) as c:
+        details = c.details(summaries["Stair.fmu"].path)
+    assert details.variables == (("counter", "output"),)
+
+
+def test_incremental_rebuild(tmp_path):
+    feedthrough, stair = make_library(tmp_path / "lib")
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, [tmp_path / "lib"])
+
+    # Touching an FMU without changing its modelDescription.xml does not re-parse it
+    os.utime(stair, ns=(0, 0))
+    make_fmu(feedthrough, make_model_description("Feedthrough2"))
+    stats = build_catalog(catalog, [tmp_path / "lib"])
+    assert (stats.added, stats.updated, stats.unchanged) == (0, 1, 1)
+
+    stair.unlink()
+    stats = build_catalog(catalog, [tmp_path / "lib"])
+    assert stats.removed == 1
+    assert [s.model_name for s in load_catalog(catalog)] == ["Feedthrough2"]
+
+
+def test_rebuild_unreadable_fmu(tmp_path):
+    feedthrough, _ = make_library(tmp_path / "lib")
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, [tmp_path / "lib"])
+
+    # The old metadata of an FMU that became unreadable is not kept
+    make_fmu(feedthrough, "<fmiModelDescription")
+    stats = build_catalog(catalog, [tmp_path / "lib"])
+    assert (stats.failed, stats.updated) == (1, 0)
+    assert [s.model_name for s in load_catalog(catalog)] == ["Stair"]
+    stats = build_catalog(catalog, [tmp_path / "lib"])
+    assert (stats.failed, stats.unchanged) == (1, 1)
+
+
+def test_prune_glob_root(tmp_path):
+    feedthrough, stair = make_library(tmp_path / "lib")
+    catalog = tmp_path / "fmus.db"
+    pattern = str(tmp_path / "lib" / "*" / "*.fmu")
+    assert build_catalog(catalog, [pattern]).added == 2
+
+    stair.unlink()
+    stats = build_catalog(catalog, [pattern])
+    assert (stats.removed, stats.unchanged) == (1, 1)
+    assert [s.path for s in load_catalog(catalog)] == [str(feedthrough)]
+
+
+def test_load_catalog_read_only(tmp_path):
+    make_library(tmp_path / "lib")
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, [tmp_path / "lib"])
+
+    digest = hashlib.sha256(catalog.read_bytes()).hexdigest()
+    assert len(load_catalog(catalog)) == 2
+    assert hashlib.sha256(catalog.read_bytes()).hexdigest() == digest
+
+    # Other databases are rejected, not turned into an empty catalog
+    other = tmp_path / "other.db"
+    sqlite3.connect(other).close()
+    with pytest.raises(ValueError, match="no schema version"):
+        load_catalog(other)
+    assert other.stat().st_size == 0
+
+
+def test_catalog_option(pytester, tmp_path):
+    make_library(tmp_path / "lib")
+    catalog = tmp_path / "fmus.db"
+    assert main(["build", "-o", str(catalog), str(tmp_path / "lib")]) == 0
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_input=True)
+        def test_has_input(fmu):
+            assert fmu.endswith("Feedthrough.fmu")
+
+        @pytest.mark.fmu_filter(is_cs=True)
+        def test_is_cs(fmu):
+            pass
+
+        @pytest.mark.fmu_filter(with_outputs="counter")
+        def test_with_outputs(fmu):
+            assert fmu.endswith("Stair.fmu")
+    """)
+
+    # Names come from the catalog, so the FMUs are not needed
+    for fmu in (tmp_path / "lib").rglob("*.fmu"):
+        fmu.unlink()
+    result = pytester.runpytest("--fmu-catalog", str(catalog), "-v")
+    result.assert_outcomes(passed=4)
+
+
+def test_rebuild_extracted_fmu(tmp_path):
+    """Any file of an extracted FMU counts, not only modelDescription.xml."""
+    with zipfile.ZipFile(
+        make_fmu(tmp_path / "Tank.fmu", make_model_description("Tank"))
+    ) as zip_ref:
+        zip_ref.extractall(tmp_path / "lib" / "Tank")
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, [tmp_path / "lib"])
+    assert load_catalog(catalog)[0].platforms == ()
+
+    binaries = tmp_path / "lib" / "Tank" / "binaries" / "linux64"
+    binaries.mkdir(parents=True)
+    (binaries / "Tank.so").write_bytes(b"")
+    stats = build_catalog(catalog, [tmp_path / "lib"])
+    assert (stats.updated, stats.unchanged) == (1, 0)
+    assert load_catalog(catalog)[0].platforms == ("linux64",)
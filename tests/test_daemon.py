@@ -0,0 +1,182 @@
+import os
+import pathlib
+import stat
+import tempfile
+import threading
+
+import pytest
+
+from pytest_fmu_filter.catalog import build_catalog
+from pytest_fmu_filter.daemon import (
+    DaemonServer,
+    MetadataDaemon,
+    connect,
+    default_socket_path,
+)
+from pytest_fmu_filter.engine import select_entries
+from pytest_fmu_filter.session import FmuSession
+
+from .utils import make_fmu, make_model_description
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def daemon_socket(tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    server = DaemonServer(socket_path, MetadataDaemon())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fmus(tmp_path):
+    return [
+        str(
+            make_fmu(
+                tmp_path / "Feedthrough.fmu",
+                make_model_description("Feedthrough", variables=[("u", "input")]),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "Stair.fmu",
+                make_model_description("Stair", "3.0", ("CoSimulation",)),
+            )
+        ),
+        str(tmp_path / "Missing.fmu"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {"is_me": True},
+        {"has_input": False},
+        {"where": "is_cs and fmi_version >= 3"},
+        {"max_variables": 0},
+    ],
+)
+def test_daemon_matches_in_process(daemon_socket, fmus, filters):
+    client = connect(daemon_socket)
+    assert client is not None
+
+    local_errors = []
+    expected = select_entries(
+        FmuSession(fmus),
+        filters,
+        lambda entry, e: local_errors.append((entry.path, str(e))),
+    )
+
+    # Asked twice: the second answer comes from the daemon's memory
+    for _ in range(2):
+        matches, errors = client.select(fmus, filters)
+        assert [fmus[i] for i in matches] == [entry.path for entry in expected]
+        assert [(fmus[i], message) for i, message in errors] == local_errors
+    client.close()
+
+
+def test_daemon_sees_changed_fmus(daemon_socket, fmus):
+    client = connect(daemon_socket)
+    assert client is not None
+    assert client.select(fmus[:2], {"has_input": True})[0] == [0]
+
+    make_fmu(
+        pathlib.Path(fmus[1]),
+        make_model_description("Stair", variables=[("u", "input"), ("v", "input")]),
+    )
+    os.utime(fmus[1], ns=(1, 1))
+    assert client.select(fmus[:2], {"has_input": True})[0] == [0, 1]
+    client.close()
+
+
+def test_daemon_sees_edits_in_extracted_fmus(daemon_socket, tmp_path):
+    extracted = tmp_path / "Extracted"
+    extracted.mkdir()
+    description = extracted / "modelDescription.xml"
+    description.write_text(
+        make_model_description("Extracted", variables=[("u", "input")])
+    )
+    paths = [str(extracted)]
+    client = connect(daemon_socket)
+    assert client is not None
+    assert client.select(paths, {"has_input": True})[0] == [0]
+
+    # Edited in place: the stat of the directory itself does not change
+    description.write_text(make_model_description("Extracted"))
+    assert select_entries(FmuSession(paths), {"has_input": True}, print) == []
+    assert client.select(paths, {"has_input": True})[0] == []
+    client.close()
+
+
+def test_plugin_uses_daemon_or_falls_back(pytester, daemon_socket, fmus, tmp_path):
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_input=True)
+        def test_has_input(fmu):
+            assert fmu.endswith("Feedthrough.fmu")
+
+        @pytest.mark.fmu_filter(custom=lambda md: md.is_cs())
+        def test_custom(fmu):
+            pass
+    """)
+
+    for socket_path in (daemon_socket, str(tmp_path / "unreachable.sock")):
+        result = pytester.runpytest(
+            "--fmus", *fmus[:2], "--fmu-daemon", socket_path, "-v"
+        )
+        result.assert_outcomes(passed=3)
+
+
+def test_default_socket_is_private(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    socket_path = default_socket_path()
+    assert os.path.dirname(socket_path) != str(tmp_path)
+
+    server = DaemonServer(socket_path, MetadataDaemon())
+    server.server_close()
+    assert stat.S_IMODE(os.stat(os.path.dirname(socket_path)).st_mode) == 0o700
+
+    # A directory others can write to is not used
+    os.chmod(os.path.dirname(socket_path), 0o777)
+    with pytest.raises(RuntimeError, match="not a directory private"):
+        DaemonServer(socket_path, MetadataDaemon())
+
+
+def test_foreign_files_are_not_replaced(tmp_path):
+    socket_path = tmp_path / "daemon.sock"
+    socket_path.write_text("not a socket")
+
+    assert connect(str(socket_path)) is None
+    with pytest.raises(RuntimeError, match="not a socket of this user"):
+        DaemonServer(str(socket_path), MetadataDaemon())
+    assert socket_path.read_text() == "not a socket"
+
+
+def test_plugin_skips_daemon_with_catalog(pytester, daemon_socket, fmus, tmp_path):
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, fmus[:2])
+    # The catalog is stale: Stair gained an input since
+    make_fmu(
+        pathlib.Path(fmus[1]),
+        make_model_description("Stair", variables=[("u", "input")]),
+    )
+    os.utime(fmus[1], ns=(1, 1))
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_input=True)
+        def test_has_input(fmu):
+            assert fmu.endswith("Feedthrough.fmu")
+    """)
+
+    result = pytester.runpytest(
+        "--fmu-catalog", str(catalog), "--fmu-daemon", daemon_socket, "-v"
+    )
+    result.assert_outcomes(passed=1)
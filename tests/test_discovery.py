@@ -0,0 +1,122 @@
+import os
+import pathlib
+import zipfile
+
+import pytest
+
+from pytest_fmu_filter import discovery
+from pytest_fmu_filter.discovery import discover_fmus, fmu_stat
+
+from .utils import make_fmu, make_model_description
+
+
+def make_tree(root: pathlib.Path) -> None:
+    make_fmu(root / "b" / "Stair.fmu", make_model_description("Stair"))
+    make_fmu(
+        root / "a" / "deep" / "er" / "VanDerPol.fmu",
+        make_model_description("VanDerPol"),
+    )
+    make_fmu(root / "a" / "Dahlquist.fmu", make_model_description("Dahlquist"))
+    (root / "a" / "notes.txt").write_text("not an FMU")
+    with zipfile.ZipFile(
+        make_fmu(root / "tmp.fmu", make_model_description("Extracted"))
+    ) as zip_ref:
+        zip_ref.extractall(root / "a" / "Extracted")
+    (root / "a" / "Extracted" / "nested.fmu").write_text("not descended into")
+
+
+def relative(root, fmus):
+    return [pathlib.Path(fmu.path).relative_to(root).as_posix() for fmu in fmus]
+
+
+def test_discover_directory(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+
+    # Only the directory entries are stat'ed while discovering
+    walked = []
+    monkeypatch.setattr(
+        discovery, "fmu_stat", lambda path, is_dir: walked.append(path) or (0, 0)
+    )
+    fmus = list(discover_fmus([tmp_path], workers=4))
+    assert walked == []
+    monkeypatch.undo()
+    assert relative(tmp_path, fmus) == [
+        "tmp.fmu",
+        "a/Dahlquist.fmu",
+        "a/Extracted",
+        "a/deep/er/VanDerPol.fmu",
+        "b/Stair.fmu",
+    ]
+
+    # Stat results are passed on, covering every file of extracted FMUs on use
+    extracted = fmus[2]
+    assert extracted.is_dir
+    assert (extracted.size, extracted.mtime_ns) == fmu_stat(extracted.path, True)
+    st = os.stat(tmp_path / "a" / "Extracted" / "modelDescription.xml")
+    assert extracted.size == st.st_size + len("not descended into")
+    assert not fmus[1].is_dir and fmus[1].size == os.stat(fmus[1].path).st_size
+
+    # The order does not depend on the number of threads
+    assert list(discover_fmus([tmp_path], workers=1)) == fmus
+
+
+def test_discover_glob(tmp_path):
+    make_tree(tmp_path)
+
+    fmus = discover_fmus([str(tmp_path / "a" / "**" / "*.fmu"), tmp_path / "b"])
+    assert relative(tmp_path, fmus) == [
+        "a/Dahlquist.fmu",
+        "a/Extracted/nested.fmu",
+        "a/deep/er/VanDerPol.fmu",
+        "b/Stair.fmu",
+    ]
+
+    # Only directories and FMUs among the matches
+    fmus = discover_fmus([str(tmp_path / "a" / "*")])
+    assert relative(tmp_path, fmus) == [
+        "a/Dahlquist.fmu",
+        "a/Extracted",
+        "a/deep/er/VanDerPol.fmu",
+    ]
+
+
+def test_discover_symlink_loop(tmp_path):
+    make_tree(tmp_path)
+    os.symlink(tmp_path, tmp_path / "b" / "loop", target_is_directory=True)
+    os.symlink(tmp_path / "a" / "deep", tmp_path / "b" / "deep")
+
+    fmus = discover_fmus([tmp_path])
+    assert relative(tmp_path, fmus) == [
+        "tmp.fmu",
+        "a/Dahlquist.fmu",
+        "a/Extracted",
+        "a/deep/er/VanDerPol.fmu",
+        "b/Stair.fmu",
+    ]
+
+
+def test_fmu_dir_option(pytester, tmp_path):
+    make_fmu(
+        tmp_path / "lib" / "x" / "Feedthrough.fmu",
+        make_model_description("Feedthrough", variables=[("u", "input")]),
+    )
+    make_fmu(tmp_path / "lib" / "y" / "Stair.fmu", make_model_description("Stair"))
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_input=True)
+        def test_has_input(fmu):
+            assert fmu.endswith("Feedthrough.fmu")
+
+        @pytest.mark.fmu_filter(is_me=True)
+        def test_is_me(fmu):
+            pass
+    """)
+
+    result = pytester.runpytest("--fmu-dir", str(tmp_path / "lib"), "-v")
+    result.assert_outcomes(passed=3)
+
+    result = pytester.runpytest("--fmu-dir", str(tmp_path / "missing"))
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(["*--fmu-dir: not found: *missing"])
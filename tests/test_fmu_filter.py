@@ -1,4 +1,4 @@
-from .utils import download_reference_fmus
+from .utils import download_reference_fmus, make_fmu, make_model_description
 
 
 def test_invalid_fmu_filter_key(pytester):
@@ -132,3 +132,218 @@ def test_should_skip(pytester, tmpdir):
     # Pass downloaded FMUs to runpytest
     result = pytester.runpytest("--fmus", *fmu_paths, "-v")
     assert result.ret == 5
+
+
+def test_size_filters(pytester, tmp_path):
+    """Size-based keys are answered from the model counts."""
+    small = make_fmu(
+        tmp_path / "Small.fmu",
+        make_model_description(
+            "Small",
+            variables=[("x", "local")],
+            attributes='numberOfEventIndicators="1"',
+        ),
+    )
+    large = make_fmu(
+        tmp_path / "Large.fmu",
+        make_model_description(
+            "Large", "3.0", variables=[(f"x{i}", "local") for i in range(20)]
+        ),
+    )
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(max_variables=10)
+        def test_max_variables(fmu):
+            assert fmu.endswith("Small.fmu")
+
+        @pytest.mark.fmu_filter(min_variables=10, is_cs=True)
+        def test_min_variables(fmu):
+            assert fmu.endswith("Large.fmu")
+
+        @pytest.mark.fmu_filter(min_event_indicators=1)
+        def test_min_event_indicators(fmu):
+            assert fmu.endswith("Small.fmu")
+
+        @pytest.mark.fmu_filter(max_states=0, where="n_variables > 1")
+        def test_max_states(fmu):
+            assert fmu.endswith("Large.fmu")
+    """)
+
+    result = pytester.runpytest("--fmus", str(small), str(large), "-v")
+    result.assert_outcomes(passed=4)
+
+
+def test_platform_filters(pytester, tmp_path):
+    """Platform keys look for binaries of the model identifiers."""
+    from pytest_fmu_filter.md import current_platform
+
+    linux = make_fmu(
+        tmp_path / "Linux.fmu",
+        make_model_description("Linux"),
+        {"binaries/linux64/Linux.so": b"", "binaries/win64/Other.dll": b""},
+    )
+    windows = make_fmu(
+        tmp_path / "Windows.fmu",
+        make_model_description("Windows", "3.0"),
+        {
+            f"binaries/{current_platform('3.0')}/Windows.txt": b"",
+            "binaries/x86_64-windows/Windows.dll": b"",
+        },
+    )
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_platform="linux64")
+        def test_linux(fmu):
+            assert fmu.endswith("Linux.fmu")
+
+        @pytest.mark.fmu_filter(has_platform=["win64", "x86_64-windows"])
+        def test_windows(fmu):
+            assert fmu.endswith("Windows.fmu")
+    """)
+
+    result = pytester.runpytest("--fmus", str(linux), str(windows), "-v")
+    result.assert_outcomes(passed=2)
+
+
+def test_unit_filters(pytester, tmp_path):
+    """Unit and declared-type keys, also answered from a catalog."""
+    from pytest_fmu_filter.catalog import build_catalog
+
+    from .test_md import FMI2_UNITS, FMI3_UNITS
+
+    make_fmu(tmp_path / "lib" / "Tank2.fmu", FMI2_UNITS)
+    make_fmu(tmp_path / "lib" / "Tank3.fmu", FMI3_UNITS)
+    make_fmu(
+        tmp_path / "lib" / "Plain.fmu",
+        make_model_description("Plain", variables=[("y", "output")]),
+    )
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, [tmp_path / "lib"])
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(with_input_units="Pa")
+        def test_pressure_inputs(fmu):
+            assert "Tank" in fmu
+
+        @pytest.mark.fmu_filter(with_output_units=["K", "degC"], with_declared_types="Pressure")
+        def test_temperature_outputs(fmu):
+            assert "Tank" in fmu
+    """)
+
+    for options in (
+        ["--fmu-dir", str(tmp_path / "lib")],
+        ["--fmu-catalog", str(catalog)],
+    ):
+        result = pytester.runpytest(*options)
+        result.assert_outcomes(passed=4)
+
+
+def test_terminal_and_source_filters(pytester, tmp_path):
+    """Terminal and source keys, also answered from a catalog."""
+    from pytest_fmu_filter.catalog import build_catalog
+
+    from .test_md import BUILD_DESCRIPTION, FMI3_UNITS, TERMINALS
+
+    make_fmu(
+        tmp_path / "lib" / "Tank.fmu",
+        FMI3_UNITS,
+        {"terminalsAndIcons/terminalsAndIcons.xml": TERMINALS},
+    )
+    make_fmu(
+        tmp_path / "lib" / "Source.fmu",
+        FMI3_UNITS,
+        {"sources/buildDescription.xml": BUILD_DESCRIPTION, "sources/tank.c": ""},
+    )
+    catalog = tmp_path / "fmus.db"
+    build_catalog(catalog, [tmp_path / "lib"])
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_terminal="flange", has_terminal_kind="org.example.Bus")
+        def test_terminals(fmu):
+            assert fmu.endswith("Tank.fmu")
+
+        @pytest.mark.fmu_filter(has_sources=True)
+        def test_sources(fmu):
+            assert fmu.endswith("Source.fmu")
+    """)
+
+    for options in (
+        ["--fmu-dir", str(tmp_path / "lib")],
+        ["--fmu-catalog", str(catalog)],
+    ):
+        result = pytester.runpytest(*options)
+        result.assert_outcomes(passed=2)
+
+
+def test_fmu_select(pytester):
+    """Session-wide filters prune the FMU set before the markers."""
+    # Inside the rootdir, so that the ini file below applies
+    tmp_path = pytester.path / "fmus"
+    fmus = [
+        str(
+            make_fmu(
+                tmp_path / "Cs3.fmu",
+                make_model_description(
+                    "Cs3", "3.0", ("CoSimulation",), [("u", "input")]
+                ),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "Me3.fmu",
+                make_model_description(
+                    "Me3", "3.0", ("ModelExchange",), [("u", "input")]
+                ),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "Cs2.fmu",
+                make_model_description(
+                    "Cs2", "2.0", ("CoSimulation",), [("u", "input")]
+                ),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "Plain3.fmu",
+                make_model_description("Plain3", "3.0", ("CoSimulation",)),
+            )
+        ),
+    ]
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_input=True)
+        def test_inputs(fmu):
+            assert fmu.endswith("Cs3.fmu")
+    """)
+
+    result = pytester.runpytest(
+        "--fmus", *fmus, "--fmu-select", "fmi_major_version=3", "is_cs=True"
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*fmu select*", "2 of 4 FMUs selected"])
+
+    # Same from the ini file, with the command line adding to it
+    pytester.makeini("""
+        [pytest]
+        fmu_select =
+            fmi_major_version=3
+            name_matches=^(Cs|Me)
+    """)
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-select", "is_cs=True")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["1 of 4 FMUs selected"])
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-select", "is_fast=True")
+    result.stderr.fnmatch_lines(["*--fmu-select: unknown filter key: is_fast"])
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+# Modules the plugin entry point must not pull in on its own
+HEAVY_MODULES = [
+    "pytest_fmu_filter.md",
+    "pytest_fmu_filter.engine",
+    "xml.etree.ElementTree",
+]
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """
+    Run ``statement`` in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        Mapping of imported module name to its cumulative import time in us.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_plugin_import_is_light():
+    """The pytest11 entry point must not import the parser or the filter engine."""
+    times = import_times("import pytest; import pytest_fmu_filter.plugin")
+
+    assert "pytest_fmu_filter.plugin" in times
+    for module in HEAVY_MODULES:
+        assert module not in times
+
+
+def test_plugin_import_time_budget():
+    """Importing the entry point on top of pytest stays within a small budget."""
+    times = import_times("import pytest; import pytest_fmu_filter.plugin")
+
+    # Generous bound (in us) to catch regressions such as a top-level parser import
+    assert times["pytest_fmu_filter.plugin"] < 20_000
@@ -1,8 +1,16 @@
 import pathlib
+import zipfile
+
 import pytest
 
-from pytest_fmu_filter.md import read_modelDescription
-from tests.utils import download_reference_fmu
+from pytest_fmu_filter.md import (
+    read_model_counts,
+    read_model_header,
+    read_model_variables,
+    read_modelDescription,
+)
+from pytest_fmu_filter.summary import FmuDetails
+from tests.utils import download_reference_fmu, make_fmu, make_model_description
 
 
 @pytest.mark.parametrize(
@@ -32,3 +40,242 @@ def test_has_input(reference_fmu, tmpdir):
     # assert x is not None
     # assert x.start_time == pytest.approx(0.0, abs=1e-6)
     # assert x.stop_time == pytest.approx(3.0, abs=1e-6)
+
+
+FMI2_STRUCTURE = (
+    "<ModelStructure><Derivatives>"
+    '<Unknown index="2"/><Unknown index="4"/>'
+    "</Derivatives></ModelStructure>"
+)
+FMI3_STRUCTURE = (
+    "<ModelStructure>"
+    '<ContinuousStateDerivative valueReference="1"/>'
+    '<EventIndicator valueReference="2"/><EventIndicator valueReference="3"/>'
+    "</ModelStructure>"
+)
+
+
+@pytest.mark.parametrize(
+    "fmi_version, extra, attributes",
+    [
+        ("2.0", FMI2_STRUCTURE, 'numberOfEventIndicators="3"'),
+        ("3.0", FMI3_STRUCTURE, ""),
+    ],
+)
+def test_read_model_counts(fmi_version, extra, attributes, tmp_path):
+    variables = [(f"x{i}", "local") for i in range(5)]
+    filename = make_fmu(
+        tmp_path / "Model.fmu",
+        make_model_description(
+            "Model",
+            fmi_version,
+            variables=variables,
+            extra=extra,
+            attributes=attributes,
+        ),
+    )
+
+    counts = read_model_counts(filename)
+    assert counts == read_modelDescription(filename).counts()
+    assert counts.n_variables == 5
+    assert counts.n_states == (2 if fmi_version == "2.0" else 1)
+    assert counts.n_event_indicators == (3 if fmi_version == "2.0" else 2)
+    assert not counts.truncated
+
+    # Counting stops as soon as the threshold is crossed
+    counts = read_model_counts(filename, stop_after=2)
+    assert counts.truncated
+    assert counts.n_variables == 3
+
+
+def test_binary_platforms(tmp_path):
+    files = {
+        "binaries/linux64/Model.so": b"",
+        "binaries/darwin64/Model.dylib": b"",
+        "binaries/win64/Other.dll": b"",
+        "binaries/win32/README.txt": b"",
+    }
+    filename = make_fmu(tmp_path / "Model.fmu", make_model_description("Model"), files)
+    assert read_modelDescription(filename).binary_platforms() == ["darwin64", "linux64"]
+
+    # Extracted FMUs give the same result
+    extracted = tmp_path / "Model"
+    with zipfile.ZipFile(filename) as zip_ref:
+        zip_ref.extractall(extracted)
+    assert read_modelDescription(extracted).binary_platforms() == [
+        "darwin64",
+        "linux64",
+    ]
+
+
+FMI2_UNITS = """<?xml version="1.0" encoding="UTF-8"?>
+<fmiModelDescription fmiVersion="2.0" modelName="Tank" guid="{0}">
+  <ModelExchange modelIdentifier="Tank"/>
+  <UnitDefinitions>
+    <Unit name="Pa"><BaseUnit kg="1" m="-1" s="-2"/><DisplayUnit name="bar" factor="1e-5"/></Unit>
+    <Unit name="K"><BaseUnit K="1"/></Unit>
+  </UnitDefinitions>
+  <TypeDefinitions>
+    <SimpleType name="Pressure"><Real quantity="Pressure" unit="Pa" min="0"/></SimpleType>
+  </TypeDefinitions>
+  <ModelVariables>
+    <ScalarVariable name="p_in" valueReference="0" causality="input"><Real declaredType="Pressure"/></ScalarVariable>
+    <ScalarVariable name="p_out" valueReference="1" causality="output"><Real declaredType="Pressure"/></ScalarVariable>
+    <ScalarVariable name="T" valueReference="2" causality="output"><Real unit="K"/></ScalarVariable>
+  </ModelVariables>
+</fmiModelDescription>"""
+
+FMI3_UNITS = """<?xml version="1.0" encoding="UTF-8"?>
+<fmiModelDescription fmiVersion="3.0" modelName="Tank" instantiationToken="{0}">
+  <ModelExchange modelIdentifier="Tank"/>
+  <UnitDefinitions>
+    <Unit name="Pa"><BaseUnit kg="1" m="-1" s="-2"/><DisplayUnit name="bar" factor="1e-5"/></Unit>
+    <Unit name="K"><BaseUnit K="1"/></Unit>
+  </UnitDefinitions>
+  <TypeDefinitions>
+    <Float64Type name="Pressure" quantity="Pressure" unit="Pa" min="0"/>
+  </TypeDefinitions>
+  <ModelVariables>
+    <Float64 name="p_in" valueReference="0" causality="input" declaredType="Pressure"/>
+    <Float64 name="p_out" valueReference="1" causality="output" declaredType="Pressure"/>
+    <Float64 name="T" valueReference="2" causality="output" unit="K"/>
+  </ModelVariables>
+</fmiModelDescription>"""
+
+
+@pytest.mark.parametrize("model_description", [FMI2_UNITS, FMI3_UNITS])
+def test_unit_and_type_definitions(model_description, tmp_path):
+    md = read_modelDescription(make_fmu(tmp_path / "Tank.fmu", model_description))
+    p_in, p_out, temperature = md.model.variables
+
+    pressure = p_in.declared_type
+    assert (pressure.name, pressure.quantity, pressure.unit.name) == (
+        "Pressure",
+        "Pressure",
+        "Pa",
+    )
+    assert (
+        pressure.unit.base_unit.kg == 1
+        and pressure.unit.display_units[0].factor == 1e-5
+    )
+    assert dict(pressure.attributes) == {"min": "0"}
+
+    # Variables share the definitions of the model instead of copies
+    assert p_out.declared_type is pressure
+    assert p_in.unit is p_out.unit is pressure.unit
+    assert temperature.declared_type is None and temperature.unit.name == "K"
+
+    # ... and so do models read again
+    other = read_modelDescription(make_fmu(tmp_path / "Tank2.fmu", model_description))
+    assert other.model.variables[0].declared_type is pressure
+
+    assert sorted(md.unit_index()) == ["K", "Pa"]
+    assert md.with_input_units("Pa") and not md.with_input_units("K")
+    assert md.with_output_units(["K"]) and md.with_units("K")
+    assert md.with_declared_types("Pressure") and not md.with_declared_types(
+        "Temperature"
+    )
+
+
+def test_read_model_header(tmp_path):
+    md = make_model_description(
+        "Model", "3.0", ("CoSimulation", "ScheduledExecution"), [("u", "input")]
+    )
+    header = read_model_header(make_fmu(tmp_path / "Model.fmu", md))
+    assert (header.fmi_version, header.model_name) == ("3.0", "Model")
+    assert header.is_cs() and header.is_se() and not header.is_me()
+
+    # Nothing after the start of ModelVariables is read
+    broken = md.replace("</ModelVariables>", "<Float64 name=")
+    header = read_model_header(make_fmu(tmp_path / "Broken.fmu", broken))
+    assert header.name_matches("^Mod")
+    with pytest.raises(Exception):
+        read_modelDescription(tmp_path / "Broken.fmu")
+
+
+@pytest.mark.parametrize("fmi_version, expected", [("3.0.1", "3.0"), ("2.0.4", "2.0")])
+def test_patch_versions(fmi_version, expected, tmp_path):
+    md = make_model_description(
+        "Model", fmi_version, ("CoSimulation", "ScheduledExecution"), [("u", "input")]
+    )
+    fmu = make_fmu(tmp_path / "Model.fmu", md)
+
+    header = read_model_header(fmu)
+    assert header.fmi_version == read_modelDescription(fmu).fmi_version == expected
+    assert header.is_se() == (expected == "3.0")
+    assert read_model_variables(fmu) == [("u", "input")]
+
+    with pytest.raises(ValueError, match="FMI 1.0 is not supported"):
+        read_model_header(
+            make_fmu(tmp_path / "Old.fmu", md.replace(fmi_version, "1.0"))
+        )
+
+
+@pytest.mark.parametrize("model_description", [FMI2_UNITS, FMI3_UNITS])
+def test_read_model_variables(model_description, tmp_path):
+    filename = make_fmu(tmp_path / "Tank.fmu", model_description)
+    details = FmuDetails.from_model_description(read_modelDescription(filename))
+
+    variables = read_model_variables(filename)
+    assert variables == [("p_in", "input"), ("p_out", "output"), ("T", "output")]
+    assert sorted(variables) == sorted(details.variables)
+
+
+TERMINALS = """<?xml version="1.0" encoding="UTF-8"?>
+<fmiTerminalsAndIcons fmiVersion="3.0">
+  <Terminals>
+    <Terminal name="bus" matchingRule="bus" terminalKind="org.example.Bus">
+      <TerminalMemberVariable variableName="p_in" memberName="p" variableKind="signal"/>
+      <Terminal name="flange" matchingRule="plug" terminalKind="org.example.Flange"/>
+    </Terminal>
+  </Terminals>
+</fmiTerminalsAndIcons>"""
+
+BUILD_DESCRIPTION = """<?xml version="1.0" encoding="UTF-8"?>
+<fmiBuildDescription fmiVersion="3.0">
+  <BuildConfiguration modelIdentifier="Tank">
+    <SourceFileSet language="C99"><SourceFile name="tank.c"/><IncludeDirectory name="include"/></SourceFileSet>
+  </BuildConfiguration>
+</fmiBuildDescription>"""
+
+
+def test_secondary_documents(tmp_path, monkeypatch):
+    files = {
+        "terminalsAndIcons/terminalsAndIcons.xml": TERMINALS,
+        "sources/buildDescription.xml": BUILD_DESCRIPTION,
+        "sources/tank.c": "",
+    }
+    filename = make_fmu(tmp_path / "Tank.fmu", FMI3_UNITS, files)
+    md = read_modelDescription(filename)
+
+    # Sections are read at the recorded offsets, without reopening the zip
+    def no_zipfile(*args, **kwargs):
+        raise AssertionError("zip reopened")
+
+    monkeypatch.setattr(zipfile, "ZipFile", no_zipfile)
+    (bus,) = md.terminals()
+    assert md.terminals() is md.terminals()
+    assert (bus.terminal_kind, bus.member_variables[0].variable_name) == (
+        "org.example.Bus",
+        "p_in",
+    )
+    assert [t.name for t in bus.walk()] == ["bus", "flange"]
+    assert md.has_terminal("flange") and md.has_terminal_kind(["org.example.Bus"])
+    assert not md.has_terminal("other")
+    (configuration,) = md.build_configurations()
+    assert configuration.source_file_sets[0].source_files == ["tank.c"]
+    assert md.has_sources()
+    monkeypatch.undo()
+
+    # Same for extracted FMUs, and nothing for FMUs without the documents
+    extracted = tmp_path / "Tank"
+    with zipfile.ZipFile(filename) as zip_ref:
+        zip_ref.extractall(extracted)
+    md = read_modelDescription(extracted)
+    assert md.has_terminal_kind("org.example.Flange") and md.has_sources()
+    md = read_modelDescription(make_fmu(tmp_path / "Plain.fmu", FMI3_UNITS))
+    assert (
+        md.terminals() == []
+        and md.build_configurations() == []
+        and not md.has_sources()
+    )
@@ -0,0 +1,171 @@
+import json
+import os
+from types import SimpleNamespace
+
+from pytest_fmu_filter.ordering import DURATIONS_KEY, item_fmu, order_items
+from pytest_fmu_filter.session import FmuSession
+
+from .utils import make_fmu, make_model_description
+
+
+def make_fmus(root):
+    return [
+        str(
+            make_fmu(
+                root / f"M{n}.fmu",
+                make_model_description(
+                    f"M{n}", variables=[(f"x{i}", "local") for i in range(n)]
+                ),
+            )
+        )
+        for n in (1, 50, 10)
+    ]
+
+
+def test_heavy_first_by_estimate(pytester, tmp_path):
+    fmus = make_fmus(tmp_path)
+
+    pytester.makepyfile("""
+        import pytest
+
+        def test_first():
+            pass
+
+        @pytest.mark.fmu_filter(is_me=True)
+        def test_me(fmu):
+            pass
+    """)
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-order", "heavy-first", "-v")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        ["*test_first PASSED*", "*M50.fmu*", "*M10.fmu*", "*M1.fmu*"]
+    )
+
+    # Default order is the given one
+    result = pytester.runpytest("--fmus", *fmus, "-v")
+    result.stdout.fnmatch_lines(
+        ["*test_first PASSED*", "*M1.fmu*", "*M50.fmu*", "*M10.fmu*"]
+    )
+
+
+def test_heavy_first_by_recorded_durations(pytester, tmp_path):
+    fmus = make_fmus(tmp_path)
+
+    pytester.makepyfile("""
+        import time
+        import pytest
+
+        @pytest.mark.fmu_filter(is_me=True)
+        def test_me(fmu):
+            if fmu.endswith("M1.fmu"):
+                time.sleep(0.2)
+    """)
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-order", "heavy-first", "-v")
+    result.stdout.fnmatch_lines(["*M50.fmu*", "*M10.fmu*", "*M1.fmu*"])
+
+    # The slow small FMU is recorded and now runs first
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-order", "heavy-first", "-v")
+    result.assert_outcomes(passed=3)
+    assert "M1.fmu" in [line for line in result.outlines if "PASSED" in line][0]
+
+
+def test_heavy_first_across_scopes(pytester, tmp_path):
+    fmus = make_fmus(tmp_path)
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(is_me=True)
+        def test_light(fmu):
+            pass
+
+        class TestHeavy:
+            @pytest.mark.fmu_filter(is_me=True)
+            def test_me(self, fmu):
+                pass
+    """)
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-order", "heavy-first", "-v")
+    result.assert_outcomes(passed=6)
+    # Sorted across the module and the class
+    result.stdout.fnmatch_lines(
+        [
+            "*TestHeavy::test_me*M50.fmu*",
+            "*::test_light*M50.fmu*",
+            "*TestHeavy::test_me*M10.fmu*",
+            "*::test_light*M10.fmu*",
+            "*TestHeavy::test_me*M1.fmu*",
+            "*::test_light*M1.fmu*",
+        ]
+    )
+
+    # Within the module and the class only, by estimate again
+    result = pytester.runpytest(
+        "--fmus",
+        *fmus,
+        "--fmu-order",
+        "heavy-first",
+        "--fmu-order-scoped",
+        "--cache-clear",
+        "-v",
+    )
+    result.stdout.fnmatch_lines(
+        [
+            "*::test_light*M50.fmu*",
+            "*::test_light*M10.fmu*",
+            "*::test_light*M1.fmu*",
+            "*TestHeavy::test_me*M50.fmu*",
+            "*TestHeavy::test_me*M10.fmu*",
+            "*TestHeavy::test_me*M1.fmu*",
+        ]
+    )
+
+
+def test_estimates_follow_measured_without_scale(tmp_path):
+    small, heavy, _ = make_fmus(tmp_path)
+    missing = str(tmp_path / "Missing.fmu")
+    items = [
+        SimpleNamespace(
+            nodeid=f"t[{path}]",
+            parent=None,
+            callspec=SimpleNamespace(params={"fmu": path}),
+        )
+        for path in (small, heavy, missing)
+    ]
+    session = FmuSession([small, heavy, missing])
+
+    # Scaled to seconds by the small FMU: the heavy one is estimated longer
+    order_items(items, session, {f"t[{small}]": 1.0})
+    assert [item_fmu(item) for item in items] == [heavy, small, missing]
+
+    # Only the unreadable FMU is measured, so nothing converts the estimates
+    order_items(items, session, {f"t[{missing}]": 0.01})
+    assert [item_fmu(item) for item in items] == [missing, heavy, small]
+
+
+def test_durations_of_removed_fmus_are_pruned(pytester):
+    # Below the rootdir, which holds the cache
+    fmus = make_fmus(pytester.mkdir("fmus"))
+
+    pytester.makepyfile("""
+        import pytest
+
+        def test_plain():
+            pass
+
+        @pytest.mark.fmu_filter(is_me=True)
+        def test_me(fmu):
+            pass
+    """)
+
+    pytester.runpytest("--fmus", *fmus, "--fmu-order", "heavy-first")
+    durations = pytester.path / ".pytest_cache" / "v" / DURATIONS_KEY
+    recorded = json.loads(durations.read_text())
+    assert sorted(fmu for _, fmu in recorded.values()) == sorted(fmus)
+
+    os.unlink(fmus[0])
+    pytester.runpytest("--fmus", *fmus[1:], "--fmu-order", "heavy-first")
+    recorded = json.loads(durations.read_text())
+    assert sorted(fmu for _, fmu in recorded.values()) == sorted(fmus[1:])
@@ -0,0 +1,137 @@
+import pytest
+
+from pytest_fmu_filter.query import FmuIndex, Query
+from pytest_fmu_filter.summary import FmuSummary
+
+from .utils import make_fmu, make_model_description
+
+SUMMARIES = [
+    FmuSummary(
+        path="a.fmu",
+        fmi_version="2.0",
+        model_name="Feedthrough",
+        author="Acme Corp",
+        interface_types=(("me", "a"), ("cs", "a")),
+        n_variables=2,
+        n_inputs=1,
+        n_outputs=1,
+    ),
+    FmuSummary(
+        path="b.fmu",
+        fmi_version="3.0",
+        model_name="Stair",
+        author="Acme Corp",
+        interface_types=(("cs", "b"),),
+        n_variables=12,
+        n_outputs=12,
+    ),
+    FmuSummary(
+        path="c.fmu",
+        fmi_version="3.0",
+        model_name="Clocks",
+        interface_types=(("se", "c"),),
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("is_cs", ["a.fmu", "b.fmu"]),
+        ("not is_cs", ["c.fmu"]),
+        (
+            "is_cs and n_outputs > 10 and author ~ 'Acme' and fmi_version >= 3",
+            ["b.fmu"],
+        ),
+        ("fmi_major_version == 2 or is_se", ["a.fmu", "c.fmu"]),
+        ("(is_me or is_se) and not has_input", ["c.fmu"]),
+        ("author != 'Acme Corp'", ["c.fmu"]),
+        ('model_name == "Stair"', ["b.fmu"]),
+        ("n_variables <= 2 and is_cs == true", ["a.fmu"]),
+        ("has_output == false", ["c.fmu"]),
+    ],
+)
+def test_select_matches_scan(expression, expected):
+    query = Query(expression)
+    index = FmuIndex(SUMMARIES)
+
+    selected = [SUMMARIES[i].path for i in index.ids(query.select(index))]
+    assert selected == expected
+    # The indexed plan and the per-FMU evaluation agree
+    assert [s.path for s in SUMMARIES if query.matches(s)] == expected
+
+
+def test_replace_matches_rebuild():
+    expressions = [
+        "is_cs",
+        "n_outputs > 1",
+        "author ~ 'Acme'",
+        "model_name == 'Clocks'",
+    ]
+    index = FmuIndex(SUMMARIES)
+    for expression in expressions:
+        Query(expression).select(index)
+
+    # Updated in place: the same answers as an index built from scratch
+    changed = FmuSummary(
+        path="b.fmu",
+        fmi_version="2.0",
+        model_name="Clocks",
+        interface_types=(("me", "b"),),
+        n_outputs=2,
+    )
+    for summaries in (
+        [SUMMARIES[0], changed, SUMMARIES[2]],
+        [SUMMARIES[0], None, SUMMARIES[2]],
+        SUMMARIES,
+    ):
+        index.replace(1, summaries[1])
+        rebuilt = FmuIndex(summaries)
+        for expression in expressions:
+            query = Query(expression)
+            assert query.select(index) == query.select(rebuilt), expression
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "",
+        "is_cs and",
+        "unknown > 1",
+        "n_outputs",
+        "is_cs > 1",
+        "n_outputs ~ '1'",
+        "(is_cs",
+    ],
+)
+def test_invalid_expression(expression):
+    with pytest.raises(ValueError):
+        Query(expression)
+
+
+def test_where_marker(pytester, tmp_path):
+    fmus = [
+        make_fmu(
+            tmp_path / "Feedthrough.fmu",
+            make_model_description("Feedthrough", variables=[("u", "input")]),
+        ),
+        make_fmu(
+            tmp_path / "Stair.fmu",
+            make_model_description("Stair", "3.0", ("CoSimulation",)),
+        ),
+    ]
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(where="is_cs and not has_input")
+        def test_where(fmu):
+            assert fmu.endswith("Stair.fmu")
+
+        @pytest.mark.fmu_filter(where="is_cs", has_input=True)
+        def test_where_and_keys(fmu):
+            assert fmu.endswith("Feedthrough.fmu")
+    """)
+
+    result = pytester.runpytest("--fmus", *map(str, fmus), "-v")
+    result.assert_outcomes(passed=2)
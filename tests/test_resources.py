@@ -0,0 +1,75 @@
+import csv
+import json
+
+from .utils import make_fmu, make_model_description
+
+
+def test_usage_report(pytester, tmp_path):
+    fmus = [
+        str(
+            make_fmu(
+                tmp_path / "Fast.fmu",
+                make_model_description("Fast", "2.0", ("CoSimulation",)),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "Slow.fmu",
+                make_model_description(
+                    "Slow", "3.0", ("ModelExchange",), [("u", "input"), ("y", "output")]
+                ),
+            )
+        ),
+    ]
+
+    pytester.makepyfile("""
+        import time
+        import pytest
+
+        def test_plain():
+            pass
+
+        @pytest.mark.fmu_filter()
+        def test_sleep(fmu):
+            if "Slow" in fmu:
+                time.sleep(0.2)
+
+        @pytest.mark.fmu_filter()
+        def test_fail(fmu):
+            assert "Slow" not in fmu
+    """)
+
+    report = tmp_path / "usage.json"
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-report", str(report))
+    result.assert_outcomes(passed=4, failed=1)
+    # Slowest FMU first
+    result.stdout.fnmatch_lines(
+        ["*fmu usage*", "*wall s*model", "*     2    1      2 3.0  Slow", "*Fast"]
+    )
+
+    slow, fast = json.loads(report.read_text())
+    assert slow["path"] == fmus[1] and slow["wall_time"] >= 0.2 > fast["wall_time"]
+    assert (slow["tests"], slow["passed"], slow["failed"], fast["passed"]) == (
+        2,
+        1,
+        1,
+        2,
+    )
+    assert (slow["fmi_version"], slow["is_me"], slow["n_inputs"], fast["is_cs"]) == (
+        "3.0",
+        True,
+        1,
+        True,
+    )
+    assert slow["cpu_time"] >= 0 and slow["max_rss"] > 0
+
+    report = tmp_path / "usage.csv"
+    pytester.runpytest("--fmus", *fmus, "--fmu-report", str(report))
+    with open(report, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["model_name"] for row in rows] == ["Slow", "Fast"]
+    assert rows[0]["n_variables"] == "2"
+
+    # Nothing without the options
+    result = pytester.runpytest("--fmus", *fmus)
+    result.stdout.no_fnmatch_line("*fmu usage*")
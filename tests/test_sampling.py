@@ -0,0 +1,78 @@
+from pytest_fmu_filter.plugin import parse_sample
+from pytest_fmu_filter.sampling import sample_entries, stratum
+from pytest_fmu_filter.session import FmuSession
+
+from .utils import make_fmu, make_model_description
+
+
+def make_population(root):
+    paths = []
+    # One large stratum and three small ones
+    for i in range(20):
+        paths.append(
+            make_fmu(root / f"Common{i}.fmu", make_model_description(f"Common{i}"))
+        )
+    paths.append(
+        make_fmu(
+            root / "Se.fmu",
+            make_model_description("Se", "3.0", ("ScheduledExecution",)),
+        )
+    )
+    paths.append(
+        make_fmu(
+            root / "Io.fmu",
+            make_model_description("Io", variables=[("u", "input"), ("y", "output")]),
+        )
+    )
+    paths.append(
+        make_fmu(
+            root / "Cs3.fmu", make_model_description("Cs3", "3.0", ("CoSimulation",))
+        )
+    )
+    return [str(p) for p in paths]
+
+
+def test_every_stratum_is_represented(tmp_path):
+    session = FmuSession(make_population(tmp_path))
+
+    sampled, n_strata = sample_entries(list(session), 5, seed=1)
+    assert n_strata == 4
+    assert len(sampled) == 5
+    assert {stratum(entry) for entry in sampled} == {
+        stratum(entry) for entry in session
+    }
+
+    # Deterministic for a seed, in session order
+    assert sample_entries(list(session), 5, seed=1)[0] == sampled
+    assert sampled == [entry for entry in session if entry in sampled]
+
+    # Fewer requested than strata still keeps one of each
+    assert len(sample_entries(list(session), 0.05)[0]) == 4
+
+    # Fractions up to 100%, unlike a count of 1
+    assert sample_entries(list(session), parse_sample("100%"))[0] == list(session)
+    assert sample_entries(list(session), parse_sample("1.0"))[0] == list(session)
+    assert len(sample_entries(list(session), parse_sample("1"))[0]) == 4
+
+
+def test_sample_option(pytester, tmp_path):
+    fmus = make_population(tmp_path)
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(is_me=True)
+        def test_me(fmu):
+            pass
+
+        @pytest.mark.fmu_filter(is_se=True)
+        def test_se(fmu):
+            pass
+    """)
+
+    result = pytester.runpytest(
+        "--fmus", *fmus, "--fmu-sample", "6", "--fmu-sample-seed", "3", "-v"
+    )
+    # 6 sampled: 3 from the common stratum, Io, Se and Cs3
+    result.assert_outcomes(passed=5)
+    result.stdout.fnmatch_lines(["*fmu sample*", "6 of 23 FMUs from 4 strata (seed 3)"])
@@ -0,0 +1,266 @@
+import pytest
+
+from pytest_fmu_filter import session as session_module
+from pytest_fmu_filter.engine import apply_filters, select_entries
+from pytest_fmu_filter.session import FmuSession, estimate_size
+from pytest_fmu_filter.sizes import parse_size
+
+from .utils import make_fmu, make_model_description
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1048576", 1048576),
+        ("512K", 512 * 1024),
+        ("64MB", 64 * 1024**2),
+        ("1.5GiB", 3 * 1024**3 // 2),
+    ],
+)
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "-5M", "0.1", "inf", "lots"])
+def test_parse_size_invalid(value):
+    with pytest.raises(ValueError):
+        parse_size(value)
+
+
+def test_model_cache_budget(tmp_path):
+    paths = [
+        str(
+            make_fmu(
+                tmp_path / f"M{i}.fmu",
+                make_model_description(f"M{i}", variables=[("x", "local")]),
+            )
+        )
+        for i in range(3)
+    ]
+    session = FmuSession(paths)
+    size = estimate_size(session.entries[paths[0]].model())
+
+    # Room for two models: the least recently used one is evicted
+    session = FmuSession(paths, memory_budget=2 * size)
+    a, b, c = session
+    a.model(), b.model(), a.model(), c.model()
+    assert (session.models.loads, session.models.evictions, len(session.models)) == (
+        3,
+        1,
+        2,
+    )
+
+    # Summaries stay resident, evicted models are parsed again on demand
+    assert b.summary().model_name == "M1"
+    assert session.models.reloads == 1
+    assert session.models.size <= session.models.budget
+
+
+def test_memory_budget_option(pytester, tmp_path):
+    fmus = [
+        str(make_fmu(tmp_path / f"M{i}.fmu", make_model_description(f"M{i}")))
+        for i in range(3)
+    ]
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(custom=lambda md: md.is_me())
+        def test_first(fmu):
+            pass
+
+        @pytest.mark.fmu_filter(custom=lambda md: md.is_cs())
+        def test_second(fmu):
+            pass
+    """)
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-memory-budget", "1", "-v")
+    result.assert_outcomes(passed=6)
+    result.stdout.fnmatch_lines(
+        ["*fmu model cache*", "6 loaded, 5 evicted, 3 reloaded; peak *"]
+    )
+
+
+def test_variable_index(tmp_path):
+    paths = [
+        str(
+            make_fmu(
+                tmp_path / "A.fmu",
+                make_model_description(
+                    "A", variables=[("bus.voltage", "output"), ("k", "parameter")]
+                ),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "B.fmu",
+                make_model_description(
+                    "B", "3.0", variables=[("bus.voltage", "input")]
+                ),
+            )
+        ),
+        str(
+            make_fmu(
+                tmp_path / "C.fmu",
+                make_model_description("C", variables=[("x", "local")]),
+            )
+        ),
+        str(tmp_path / "Missing.fmu"),
+    ]
+    session = FmuSession(paths)
+    a, b, c, missing = session
+    errors = []
+
+    def select(**filter_kwargs):
+        return select_entries(
+            session, filter_kwargs, lambda entry, e: errors.append(entry)
+        )
+
+    assert select(with_variables="bus.voltage") == [a, b]
+    assert select(with_outputs=["bus.voltage"]) == [a]
+    assert select(with_inputs="bus.voltage", is_cs=True) == [b]
+    assert select(with_parameters="k", with_variables=["x", "bus.voltage"]) == [a]
+    # An output of that name is no input
+    assert select(with_inputs="k") == []
+    # The same keys checked per FMU
+    assert apply_filters(a, {"with_outputs": "bus.voltage"})
+    assert not apply_filters(b, {"with_outputs": "bus.voltage"})
+
+    # Answered without loading any model, unreadable FMUs are reported once per selection
+    assert session.models.loads == 0
+    assert errors == [missing] * 5
+
+
+def test_refresh_reads_changed_fmu_only(tmp_path, monkeypatch):
+    paths = [
+        str(
+            make_fmu(
+                tmp_path / f"M{n}.fmu",
+                make_model_description(f"M{n}", variables=[("u", "input")]),
+            )
+        )
+        for n in range(5)
+    ]
+    session = FmuSession(paths)
+    errors = []
+
+    def select(**filter_kwargs):
+        return [
+            entry.path
+            for entry in select_entries(
+                session, filter_kwargs, lambda entry, e: errors.append(entry.path)
+            )
+        ]
+
+    assert select(with_inputs="u", where="is_cs") == paths
+    assert select(has_terminal="bus") == []
+
+    read = []
+    real_read = session_module.read_model_variables
+    monkeypatch.setattr(
+        session_module,
+        "read_model_variables",
+        lambda path, is_dir=None: read.append(path) or real_read(path, is_dir),
+    )
+    make_fmu(
+        tmp_path / "M2.fmu",
+        make_model_description("M2", "2.0", ("ModelExchange",), [("y", "output")]),
+    )
+    session.refresh(paths[2])
+    others = paths[:2] + paths[3:]
+    assert select(with_inputs="u") == others
+    assert select(where="is_cs") == others
+    assert select(with_outputs="y", where="not is_cs") == [paths[2]]
+    assert read == [paths[2]]
+
+    # Unreadable after the change: reported, the others stay indexed
+    (tmp_path / "M2.fmu").write_bytes(b"")
+    session.refresh(paths[2])
+    assert select(with_inputs="u", where="is_cs") == others
+    assert errors == [paths[2]]
+
+
+def test_platforms_without_parsing(tmp_path):
+    paths = [
+        str(
+            make_fmu(
+                tmp_path / "Linux.fmu",
+                make_model_description("Linux", variables=[("x", "local")]),
+                {"binaries/linux64/Linux.so": b""},
+            )
+        ),
+        str(make_fmu(tmp_path / "None.fmu", make_model_description("None"))),
+    ]
+    session = FmuSession(paths)
+
+    selected = select_entries(session, {"has_platform": "linux64"}, print)
+    assert [entry.path for entry in selected] == paths[:1]
+    # Header and central directory only, no model was parsed
+    assert session.models.loads == 0
+    assert session.entries[paths[0]].platforms() == ["linux64"]
+
+
+def test_mixed_keys_read_once(tmp_path, monkeypatch):
+    path = str(
+        make_fmu(
+            tmp_path / "M.fmu",
+            make_model_description("M", variables=[("u", "input")]),
+            {"binaries/linux64/M.so": b""},
+        )
+    )
+    session = FmuSession([path])
+    headers = []
+    monkeypatch.setattr(
+        "pytest_fmu_filter.session.read_model_header",
+        lambda *args: headers.append(args),
+    )
+
+    (entry,) = session
+    assert apply_filters(
+        entry, {"is_cs": True, "has_platform": "linux64", "has_input": True}
+    )
+    # The header and platforms come from the one parse of the summary
+    assert (session.models.loads, headers) == (1, [])
+
+
+def test_broken_terminals_only_fail_terminal_keys(tmp_path):
+    from pytest_fmu_filter.catalog import build_catalog
+    from pytest_fmu_filter.shared_cache import SharedCache
+
+    from .test_md import FMI3_UNITS
+
+    path = str(
+        make_fmu(
+            tmp_path / "lib" / "Tank.fmu",
+            FMI3_UNITS,
+            {"terminalsAndIcons/terminalsAndIcons.xml": "<fmiTerminalsAndIcons"},
+        )
+    )
+    catalog_path = tmp_path / "fmus.db"
+    stats = build_catalog(catalog_path, [tmp_path / "lib"])
+    assert (stats.added, stats.failed) == (1, 0)
+
+    catalog_session = FmuSession()
+    catalog_session.add_catalog(str(catalog_path))
+    for session in (
+        FmuSession([path]),
+        FmuSession([path], shared=SharedCache(tmp_path / "cache")),
+        catalog_session,
+    ):
+        errors = []
+
+        def select(**filter_kwargs):
+            return [
+                entry.path
+                for entry in select_entries(
+                    session, filter_kwargs, lambda entry, e: errors.append(entry.path)
+                )
+            ]
+
+        assert select(has_input=True, with_units="K") == [path]
+        assert errors == []
+        assert select(has_terminal="bus") == [] and errors == [path]
+        # The entry is still readable afterwards
+        assert select(has_output=True, with_declared_types="Pressure") == [path]
+        assert errors == [path]
+        session.close()
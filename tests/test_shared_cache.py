@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import time
+import zipfile
+
+from pytest_fmu_filter.session import FmuSession
+from pytest_fmu_filter.shared_cache import SharedCache
+
+from .utils import make_fmu, make_model_description
+
+
+def _worker(directory, keys, max_size):
+    cache = SharedCache(directory, max_size)
+
+    def create(key):
+        # Count how often each key is created across processes
+        with open(os.path.join(directory, "created.log"), "a") as f:
+            f.write(key + "\n")
+        time.sleep(0.01)
+        return {"key": key, "payload": "x" * 1000}
+
+    return [cache.get(key, lambda: create(key))["key"] for key in keys]
+
+
+def test_concurrent_processes(tmp_path):
+    keys = [f"{i:04d}" for i in range(40)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(8) as pool:
+        results = pool.starmap(
+            _worker,
+            [(str(tmp_path), keys[i:] + keys[:i], None) for i in range(0, 40, 5)],
+        )
+
+    # Every process sees every entry, and every entry is created exactly once
+    assert all(sorted(result) == keys for result in results)
+    created = (tmp_path / "created.log").read_text().split()
+    assert sorted(created) == keys
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_concurrent_eviction(tmp_path):
+    keys = [f"{i:04d}" for i in range(40)]
+    max_size = 10 * 1100
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(8) as pool:
+        results = pool.starmap(
+            _worker,
+            [(str(tmp_path), keys[i:] + keys[:i], max_size) for i in range(0, 40, 5)],
+        )
+
+    assert all(sorted(result) == keys for result in results)
+    SharedCache(tmp_path, max_size).evict()
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.json")) <= max_size
+
+
+def test_shared_summaries(tmp_path):
+    fmu = str(
+        make_fmu(
+            tmp_path / "M.fmu", make_model_description("M", variables=[("u", "input")])
+        )
+    )
+    cache_dir = tmp_path / "cache"
+
+    first = FmuSession([fmu], shared=SharedCache(cache_dir))
+    assert first.entries[fmu].summary().has_input()
+    assert (first.shared.hits, first.shared.misses, first.models.loads) == (0, 1, 1)
+
+    # Another job reads the summary instead of parsing the FMU
+    second = FmuSession([fmu], shared=SharedCache(cache_dir))
+    assert second.entries[fmu].summary() == first.entries[fmu].summary()
+    assert (second.shared.hits, second.models.loads) == (1, 0)
+    # Names for the session indexes are stored in the same entry
+    assert second.with_names("units", "Pa") == []
+    assert second.entries[fmu].details().variables == (("u", "input"),)
+    assert second.models.loads == 0
+
+    # A changed FMU is parsed again
+    make_fmu(
+        tmp_path / "M.fmu", make_model_description("M", variables=[("y", "output")])
+    )
+    os.utime(fmu, ns=(0, 0))
+    third = FmuSession([fmu], shared=SharedCache(cache_dir))
+    assert third.entries[fmu].summary().has_output()
+    assert third.shared.misses == 1
+
+
+def test_shared_extracted_fmu(tmp_path):
+    """Any file of an extracted FMU counts, not only modelDescription.xml."""
+    with zipfile.ZipFile(
+        make_fmu(tmp_path / "M.fmu", make_model_description("M"))
+    ) as zip_ref:
+        zip_ref.extractall(tmp_path / "M")
+    fmu = str(tmp_path / "M")
+    cache_dir = tmp_path / "cache"
+
+    first = FmuSession([fmu], shared=SharedCache(cache_dir))
+    assert first.entries[fmu].summary().platforms == ()
+
+    binaries = tmp_path / "M" / "binaries" / "linux64"
+    binaries.mkdir(parents=True)
+    (binaries / "M.so").write_bytes(b"")
+    second = FmuSession([fmu], shared=SharedCache(cache_dir))
+    assert second.entries[fmu].summary().platforms == ("linux64",)
+    assert second.shared.misses == 1
+
+
+def test_shared_cache_option(pytester, tmp_path):
+    fmus = [
+        str(make_fmu(tmp_path / f"M{i}.fmu", make_model_description(f"M{i}")))
+        for i in range(3)
+    ]
+    cache_dir = tmp_path / "cache"
+
+    pytester.makepyfile("""
+        import pytest
+
+        @pytest.mark.fmu_filter(has_input=False)
+        def test_no_inputs(fmu):
+            pass
+    """)
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-shared-cache", str(cache_dir))
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        ["*fmu shared cache*", f"0 read from {cache_dir}, 3 parsed"]
+    )
+
+    result = pytester.runpytest("--fmus", *fmus, "--fmu-shared-cache", str(cache_dir))
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines([f"3 read from {cache_dir}, 0 parsed"])
@@ -0,0 +1,129 @@
+import os
+from pathlib import Path
+
+from pytest_fmu_filter.watch import FmuWatcher
+
+from .utils import make_fmu, make_model_description
+
+
+def test_poll(tmp_path):
+    fmu = make_fmu(tmp_path / "M.fmu", make_model_description("M"))
+    watcher = FmuWatcher([str(fmu)])
+    assert watcher.poll() == []
+
+    # Reported once the stat stays the same for one poll
+    make_fmu(fmu, make_model_description("M", variables=[("u", "input")]))
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(fmu)]
+    assert watcher.poll() == []
+
+    # Still being written: not reported until it settles
+    make_fmu(fmu, make_model_description("M"))
+    assert watcher.poll() == []
+    make_fmu(fmu, make_model_description("M", variables=[("y", "output")]))
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(fmu)]
+
+    # Deleted, then back
+    os.unlink(fmu)
+    watcher.poll()
+    assert watcher.poll() == [str(fmu)]
+    make_fmu(fmu, make_model_description("M"))
+    watcher.poll()
+    assert watcher.poll() == [str(fmu)]
+
+
+def test_poll_extracted_fmu(tmp_path):
+    fmu = tmp_path / "M"
+    (fmu / "binaries" / "linux64").mkdir(parents=True)
+    (fmu / "modelDescription.xml").write_text(make_model_description("M"))
+    binary = fmu / "binaries" / "linux64" / "M.so"
+    binary.write_bytes(b"")
+    watcher = FmuWatcher([str(fmu)])
+
+    # Any file counts, not only modelDescription.xml
+    binary.write_bytes(b"rebuilt")
+    watcher.poll()
+    assert watcher.poll() == [str(fmu)]
+    binary.unlink()
+    watcher.poll()
+    assert watcher.poll() == [str(fmu)]
+
+
+def test_watch_reruns_changed_fmus(pytester, tmp_path, monkeypatch):
+    def write(name, interfaces=("CoSimulation",), variables=None):
+        return str(
+            make_fmu(
+                tmp_path / f"{name}.fmu",
+                make_model_description(name, "2.0", interfaces, variables),
+            )
+        )
+
+    fmus = [
+        write("A", variables=[("u", "input")]),
+        write("B"),
+        write("C", variables=[("u", "input")]),
+    ]
+    changes = [
+        # B gains an input, so it now matches the markers
+        lambda: write("B", variables=[("u", "input")]),
+        # A drops co-simulation, so it no longer passes --fmu-select
+        lambda: write("A", ("ModelExchange",), [("u", "input")]),
+        # and is back
+        lambda: write("A", variables=[("u", "input")]),
+    ]
+
+    def wait(self):
+        if not changes:
+            raise KeyboardInterrupt
+        return [changes.pop(0)()]
+
+    monkeypatch.setattr(FmuWatcher, "wait", wait)
+
+    pytester.makepyfile("""
+        import pytest
+
+        def test_plain():
+            pass
+
+        @pytest.mark.fmu_filter(has_input=True)
+        def test_inputs(fmu):
+            pass
+
+        class TestInputs:
+            @pytest.mark.fmu_filter(has_input=True)
+            def test_method(self, fmu):
+                pass
+    """)
+
+    reprec = pytester.inline_run(
+        "--fmus", *fmus, "--fmu-select", "is_cs=True", "--fmu-watch"
+    )
+    run = [
+        (report.nodeid.split("::", 1)[1].split("[")[0], Path(item_fmu_id(report)).stem)
+        for report in reprec.getreports("pytest_runtest_logreport")
+        if report.when == "call" and "[" in report.nodeid
+    ]
+    assert run == [
+        ("test_inputs", "A"),
+        ("test_inputs", "C"),
+        ("TestInputs::test_method", "A"),
+        ("TestInputs::test_method", "C"),
+        # Only the items of the changed FMUs, and nothing while A is left out
+        ("test_inputs", "B"),
+        ("TestInputs::test_method", "B"),
+        ("test_inputs", "A"),
+        ("TestInputs::test_method", "A"),
+    ]
+    # test_plain is not run again, and nothing is collected again
+    reprec.assertoutcome(passed=9)
+    assert len(reprec.getcalls("pytest_itemcollected")) == 5
+
+
+def item_fmu_id(report) -> str:
+    return report.nodeid.split("[", 1)[1].rstrip("]")
+
+
+def test_watch_needs_fmus(pytester):
+    result = pytester.runpytest("--fmu-watch")
+    result.stderr.fnmatch_lines(["*--fmu-watch needs --fmus*"])
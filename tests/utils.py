@@ -54,3 +54,69 @@ def download_reference_fmu(name: str, tmpdir: pathlib.Path) -> pathlib.Path:
 
     # Return the path to the extracted FMU files
     return (tmpdir / name).absolute()
+
+
+def make_model_description(
+    model_name: str,
+    fmi_version: str = "2.0",
+    interfaces: tuple[str, ...] = ("ModelExchange", "CoSimulation"),
+    variables: list[tuple[str, str]] | None = None,
+    extra: str = "",
+    attributes: str = "",
+) -> str:
+    """
+    Build a minimal modelDescription.xml.
+
+    Args:
+        model_name: Model name, also used as model identifier.
+        fmi_version: "2.0" or "3.0".
+        interfaces: Interface elements to declare.
+        variables: Pairs of (name, causality) of Real/Float64 variables.
+        extra: XML appended to the root element.
+        attributes: Additional attributes of the root element.
+
+    Returns:
+        The modelDescription.xml content.
+    """
+    interface_xml = "".join(
+        f'<{interface} modelIdentifier="{model_name}"/>' for interface in interfaces
+    )
+    if fmi_version.startswith("2."):
+        header = f'<fmiModelDescription fmiVersion="{fmi_version}" modelName="{model_name}" guid="{{0}}" {attributes}>'
+        variable_xml = "".join(
+            f'<ScalarVariable name="{name}" valueReference="{vr}" causality="{causality}"><Real/></ScalarVariable>'
+            for vr, (name, causality) in enumerate(variables or [])
+        )
+    else:
+        header = f'<fmiModelDescription fmiVersion="{fmi_version}" modelName="{model_name}" instantiationToken="{{0}}" {attributes}>'
+        variable_xml = "".join(
+            f'<Float64 name="{name}" valueReference="{vr}" causality="{causality}"/>'
+            for vr, (name, causality) in enumerate(variables or [])
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f"{header}{interface_xml}<ModelVariables>{variable_xml}</ModelVariables>"
+        f"{extra}</fmiModelDescription>"
+    )
+
+
+def make_fmu(
+    path: pathlib.Path, model_description: str, files: dict[str, bytes] | None = None
+) -> pathlib.Path:
+    """
+    Write a synthetic FMU archive.
+
+    Args:
+        path: Path of the FMU to write.
+        model_description: Content of modelDescription.xml.
+        files: Additional archive members by name.
+
+    Returns:
+        The absolute path of the FMU.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr("modelDescription.xml", model_description)
+        for name, content in (files or {}).items():
+            zip_ref.writestr(name, content)
+    return path.absolute()